@@ -1,60 +1,262 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from valuation import value_PE_min_max, value_PE_avg, score_debt_to_equity, score_peg
-from finance_plots import load_manual_eps, _get_price_history, _get_manual_eps_series
-from scraper import fetch_eps_data, append_to_file, fetch_balance_sheet
-import pandas as pd
+from score_cache import (cached, version, cached_value_PE_avg, cached_score_debt_to_equity, cached_score_peg,
+                         cached_value_PE_avg_batch, cached_score_debt_to_equity_batch, cached_score_peg_batch,
+                         value_PE_avg_version, score_debt_to_equity_version, score_peg_version)
+from finance_plots import _get_price_history, _get_manual_eps_series
+from fundamentals import get_eps_data
+from price_fetch import prefetch_prices, map_concurrent, imap_completed, yahoo_chart
 import numpy as np
-from datetime import datetime, timedelta
-import os
-import json
+from datetime import datetime
+import hashlib
+import chart_encoding
+import fetch_jobs
+import bulk_scrape
+from downsample import chart_indices
+from compression import compress_response, etag_variants
+from atomic_files import SETS_DIR, SETS_FILE, UserShards
+from snapshot_store import MAX_PAGE_SIZE, PAGE_SIZE, SNAPSHOTS_DIR, SNAPSHOTS_FILE, FileSnapshots
+import sqlite_store
 
 
 app = Flask(__name__)
 # Force reload
 CORS(app)  # Enable CORS for React frontend
+app.after_request(compress_response)
+
+MAX_BULK_IN_FLIGHT = 16
+MAX_BULK_RETRIES = 5
+
+
+def _job_accepted(state):
+    """202 response for a newly submitted fetch job."""
+    response = jsonify({'success': True, 'job_id': state['job_id'], 'job': state})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/fetch_jobs/{state['job_id']}"
+    return response
 
 @app.route('/api/fetch_eps/<ticker>', methods=['POST'])
 def fetch_eps_route(ticker):
     """
     Endpoint to trigger manual fetch of EPS data.
+    Queues the scrape and returns a job to poll at /api/fetch_jobs/<job_id>.
     """
-    try:
-        data, warning = fetch_eps_data(ticker)
-        if data is None:
-            return jsonify({'success': False, 'error': warning}), 400
-        
-        # Append to file
-        success, msg = append_to_file(ticker, data, filename="DATA/EPS_manual.txt")
-        if not success:
-            return jsonify({'success': False, 'error': msg}), 500
-        
-        response = {'success': True, 'message': f'Successfully fetched EPS for {ticker}'}
-        if warning:
-            response['warning'] = warning
-            
-        return jsonify(response)
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return _job_accepted(fetch_jobs.submit([ticker], kinds=['eps']))
 
 @app.route('/api/fetch_balance/<ticker>', methods=['POST'])
 def fetch_balance_route(ticker):
     """
     Endpoint to trigger manual fetch of Balance Sheet data.
+    Queues the scrape and returns a job to poll at /api/fetch_jobs/<job_id>.
+    """
+    return _job_accepted(fetch_jobs.submit([ticker], kinds=['balance']))
+
+@app.route('/api/fetch/bulk', methods=['POST'])
+@app.route('/api/fetch_jobs', methods=['POST'])
+def submit_fetch_job():
+    """
+    Queue EPS and/or balance sheet scrapes for many tickers as one bulk job.
+    Body: {"tickers": [...], "kinds": ["eps", "balance"], "max_in_flight": 6, "retries": 2}
+    (kinds defaults to both; see bulk_scrape.py for the limits).
     """
+    data = request.get_json(silent=True) or {}
+    tickers = data.get('tickers', [])
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({'success': False, 'error': 'tickers must be a non-empty list'}), 400
     try:
-        data, error = fetch_balance_sheet(ticker)
-        if data is None:
-            return jsonify({'success': False, 'error': error}), 400
-        
-        # Append to Balance_manual.txt
-        success, msg = append_to_file(ticker, data, filename="DATA/Balance_manual.txt")
-        if not success:
-            return jsonify({'success': False, 'error': msg}), 500
-            
-        return jsonify({'success': True, 'message': f'Successfully fetched Balance Sheet for {ticker}'})
+        options = {
+            'max_in_flight': min(max(int(data.get('max_in_flight', bulk_scrape.MAX_IN_FLIGHT)), 1), MAX_BULK_IN_FLIGHT),
+            'retries': min(max(int(data.get('retries', bulk_scrape.RETRIES)), 0), MAX_BULK_RETRIES),
+        }
+        state = fetch_jobs.submit(tickers, kinds=data.get('kinds') or ['eps', 'balance'], **options)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return _job_accepted(state)
+
+@app.route('/api/fetch_jobs/<job_id>', methods=['GET'])
+def fetch_job_status(job_id):
+    """
+    Progress of a fetch job. With Accept: application/x-ndjson (or
+    text/event-stream) the job's state is streamed, one line per change, until
+    every fetch has finished.
+    """
+    state = fetch_jobs.job(job_id)
+    if state is None:
+        return jsonify({'success': False, 'error': f'Unknown job {job_id}'}), 404
+
+    mimetype = _stream_mimetype()
+    if mimetype is None:
+        return jsonify(dict(state, success=True))
+
+    def generate():
+        current = state
+        while current is not None:
+            body = app.json.dumps(dict(current, success=True))
+            yield f"data: {body}\n\n" if mimetype == 'text/event-stream' else body + "\n"
+            if current['status'] == 'done':
+                return
+            current = fetch_jobs.wait_for_change(job_id, current)
+
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _error_result(ticker, e, missing_markers=("not found in",)):
+    err_msg = str(e)
+    code = 'MISSING_DATA' if any(m in err_msg for m in missing_markers) else 'UNKNOWN'
+    return {
+        'ticker': ticker,
+        'success': False,
+        'error': err_msg,
+        'error_code': code
+    }
+
+
+STREAM_MIMETYPES = ('application/x-ndjson', 'text/event-stream')
+
+
+def _stream_mimetype():
+    """The streaming format named explicitly in the Accept header, or None for plain JSON."""
+    accepted = {value for value, _ in request.accept_mimetypes}
+    for mimetype in STREAM_MIMETYPES:
+        if mimetype in accepted:
+            return mimetype
+    return None
+
+
+def _scored(scorer, ticker, **kwargs):
+    """(score, details) from a single-ticker scorer, or the exception it raised."""
+    try:
+        return scorer(ticker, **kwargs)
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return e
+
+
+def _not_modified(etag):
+    """A 304 response if the request's If-None-Match already names etag, else None."""
+    # Also matches the ETag of a compressed copy of the same body
+    if etag is not None and any(request.if_none_match.contains(tag) for tag in etag_variants(etag)):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def _with_etag(response, etag):
+    """Tag a 200 response so browsers revalidate it with If-None-Match."""
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _succeeded(result):
+    """Whether a per-ticker batch result succeeded (for the dashboard: every part of it)."""
+    if 'success' in result:
+        return result['success']
+    return all(part.get('success') for part in result.values() if isinstance(part, dict))
+
+
+def _batch_response(result_fn, tickers, prefetch_years=None, batch_fn=None, version_fn=None):
+    """
+    Respond to a batch request with result_fn(ticker) for every ticker.
+
+    By default the prices are prefetched concurrently, then every ticker is
+    scored (all at once through batch_fn(tickers), which must return the same
+    list of results, when given) and the results come back as one
+    {"success", "results"} body in request order. If the client sends
+    Accept: application/x-ndjson (or text/event-stream), each ticker is fetched
+    and scored on the shared pool instead and its result is written as one JSON
+    line (or SSE "data:" event) as soon as it is ready, in completion order.
+
+    With version_fn(ticker) -> token (None when unknown), successful results
+    carry a 'version'. Tickers whose token in the body's "versions" object is
+    still current are not scored; they come back as
+    {"ticker", "unchanged": true, "version"}.
+    """
+    known = (request.get_json(silent=True) or {}).get('versions')
+    if not isinstance(known, dict) or version_fn is None:
+        known = {}
+
+    def unchanged(ticker, token):
+        return {'ticker': ticker, 'unchanged': True, 'version': token}
+
+    def versioned(ticker, result, token):
+        if version_fn is None or not _succeeded(result):
+            return result
+        token = token or version_fn(ticker)
+        return dict(result, version=token) if token is not None else result
+
+    mimetype = _stream_mimetype()
+    if mimetype is None:
+        if prefetch_years is not None:
+            prefetch_prices(tickers, years=prefetch_years)
+        tokens = {ticker: version_fn(ticker) for ticker in tickers} if version_fn is not None else {}
+        current = {t for t, token in tokens.items() if token is not None and known.get(t) == token}
+        changed = [t for t in tickers if t not in current]
+        if not changed:
+            computed = []
+        elif batch_fn is not None:
+            computed = batch_fn(changed)
+        else:
+            computed = [result_fn(ticker) for ticker in changed]
+        computed = iter(computed)
+        results = [unchanged(t, tokens[t]) if t in current else versioned(t, next(computed), tokens.get(t))
+                   for t in tickers]
+        return jsonify({
+            'success': True,
+            'results': results
+        })
+
+    def run(ticker):
+        if prefetch_years is not None:
+            prefetch_prices([ticker], years=prefetch_years)
+        token = version_fn(ticker) if version_fn is not None else None
+        if token is not None and known.get(ticker) == token:
+            return unchanged(ticker, token)
+        return versioned(ticker, result_fn(ticker), token)
+
+    def generate():
+        for result in imap_completed(run, tickers):
+            body = app.json.dumps(result)
+            yield f"data: {body}\n\n" if mimetype == 'text/event-stream' else body + "\n"
+
+    # X-Accel-Buffering stops nginx from holding the lines back until the end
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _debt_to_equity_json(ticker, scored):
+    """Per-ticker result object of /api/batch/debt_to_equity from (score, details) or an exception."""
+    try:
+        if isinstance(scored, Exception):
+            raise scored
+        score, details = scored
+        return {
+            'ticker': ticker,
+            'success': True,
+            'score': score,
+            'score_100': score * 100,
+            'details': {
+                'current_ratio': float(details['current_ratio']),
+                'total_debt': float(details['total_debt']),
+                'total_equity': float(details['total_equity']),
+                'date': details['date'],
+                'score': float(details['score']),
+                'data_gaps': details.get('data_gaps', [])
+            }
+        }
+    except Exception as e:
+        return _error_result(ticker, e)
+
+
+def _debt_to_equity_result(ticker, years, filename):
+    return _debt_to_equity_json(ticker, _scored(cached_score_debt_to_equity, ticker, filename=filename))
+
+
+def _debt_to_equity_results(tickers, years, filename):
+    scored = cached_score_debt_to_equity_batch(tickers, filename=filename)
+    return [_debt_to_equity_json(ticker, scored[ticker]) for ticker in tickers]
+
 
 @app.route('/api/batch/debt_to_equity', methods=['POST'])
 def batch_debt_to_equity():
@@ -66,38 +268,9 @@ def batch_debt_to_equity():
     years = int(data.get('years', 2))
     filename = data.get('filename', 'DATA/Balance_manual.txt')
     
-    results = []
-    for ticker in tickers:
-        try:
-            score, details = score_debt_to_equity(ticker, filename=filename)
-            results.append({
-                'ticker': ticker,
-                'success': True,
-                'score': score,
-                'score_100': score * 100,
-                'details': {
-                    'current_ratio': float(details['current_ratio']),
-                    'total_debt': float(details['total_debt']),
-                    'total_equity': float(details['total_equity']),
-                    'date': details['date'],
-                    'score': float(details['score']),
-                    'data_gaps': details.get('data_gaps', [])
-                }
-            })
-        except Exception as e:
-            err_msg = str(e)
-            code = 'MISSING_DATA' if "not found in" in err_msg else 'UNKNOWN'
-            results.append({
-                'ticker': ticker,
-                'success': False,
-                'error': err_msg,
-                'error_code': code
-            })
-    
-    return jsonify({
-        'success': True,
-        'results': results
-    })
+    return _batch_response(lambda ticker: _debt_to_equity_result(ticker, years, filename), tickers,
+                           batch_fn=lambda tickers: _debt_to_equity_results(tickers, years, filename),
+                           version_fn=lambda ticker: score_debt_to_equity_version(ticker, filename=filename))
 
 
 @app.route('/api/value_pe_avg/<ticker>', methods=['GET'])
@@ -109,12 +282,18 @@ def get_value_pe_avg(ticker):
     years = int(request.args.get('years', 2))
     filename = request.args.get('filename', 'DATA/EPS_manual.txt')
     
+    # Answer a revalidation before scoring anything
+    etag = value_PE_avg_version(ticker, years, filename)
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    
     try:
-        score, details = value_PE_avg(ticker, years=years, filename=filename)
+        score, details = cached_value_PE_avg(ticker, years=years, filename=filename)
         # Convert score (0-1) to 0-100 for display
         score_100 = score * 100
         
-        return jsonify({
+        return _with_etag(jsonify({
             'success': True,
             'ticker': ticker,
             'score': score,
@@ -128,7 +307,7 @@ def get_value_pe_avg(ticker):
                 'score_range': float(details['score_range']),
                 'data_gaps': details.get('data_gaps', [])
             }
-        })
+        }), etag or value_PE_avg_version(ticker, years, filename))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -142,13 +321,18 @@ def get_pe_ratios(ticker):
     Get P/E ratio time series data for a ticker.
     Query params: years (default 5), source (default "manual"), 
                   include_forward (default false), smoothing (default 0),
-                  filename (default "DATA/EPS_manual.txt")
+                  filename (default "DATA/EPS_manual.txt"),
+                  format ("columnar" for the compact encoding in chart_encoding.py),
+                  max_points (downsample to about this many points), downsample ("lttb" or "minmax")
     """
     years = int(request.args.get('years', 5))
     source = request.args.get('source', 'manual')
     include_forward = request.args.get('include_forward', 'false').lower() == 'true'
     smoothing = int(request.args.get('smoothing', 0))
     filename = request.args.get('filename', 'DATA/EPS_manual.txt')
+    fmt = request.args.get('format')
+    max_points = request.args.get('max_points', type=int)
+    method = request.args.get('downsample', 'lttb')
     
     try:
         # Auto source not available with Stooq
@@ -158,65 +342,35 @@ def get_pe_ratios(ticker):
                 'error': 'Auto EPS source not available with Stooq. Use "manual" source.'
             }), 400
         
-        hist = _get_price_history(ticker, years)
-        
-        if hist.empty:
-            return jsonify({
-                'success': False,
-                'error': f'No price data for {ticker}'
-            }), 400
-        
         # Get EPS data (manual only)
-        if source == 'manual':
-            manual_eps_by_ticker = load_manual_eps(filename)
-            ttm_eps_series = _get_manual_eps_series(ticker, hist.index, manual_eps_by_ticker, compute_ttm=True)
-        else:
+        if source != 'manual':
             return jsonify({
                 'success': False,
                 'error': f'Unknown source: {source}'
             }), 400
         
-        # Calculate P/E ratios
-        pe_ttm = hist['Close'] / ttm_eps_series
-        pe_ttm.replace([np.inf, -np.inf], np.nan, inplace=True)
-        
-        pe_forward = None
-        if include_forward:
-            # Forward P/E not available with Stooq
-            pass
+        # Answer a revalidation before building the series
+        etag = _pe_ratios_etag(_pe_ratio_series_version(ticker, years, include_forward, smoothing, filename),
+                               fmt, max_points, method)
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
         
-        # Apply smoothing if requested
-        if smoothing and smoothing > 1:
-            pe_ttm = pe_ttm.rolling(window=smoothing, min_periods=1).mean()
-            price_series = hist['Close'].rolling(window=smoothing, min_periods=1).mean()
-            if pe_forward is not None:
-                pe_forward = pe_forward.rolling(window=smoothing, min_periods=1).mean()
-        else:
-            price_series = hist['Close']
-        
-        # Prepare data for JSON response
-        dates = [d.isoformat() for d in hist.index]
-        
-        pe_ttm_data = []
-        for date, value in zip(dates, pe_ttm.values):
-            if pd.notna(value):
-                pe_ttm_data.append({'date': date, 'value': float(value)})
-        
-        pe_forward_data = []
-        if pe_forward is not None:
-            for date, value in zip(dates, pe_forward.values):
-                if pd.notna(value):
-                    pe_forward_data.append({'date': date, 'value': float(value)})
-        
-        price_data = [{'date': date, 'value': float(val)} for date, val in zip(dates, price_series.values)]
+        series = _cached_pe_ratio_series(ticker, years, include_forward, smoothing, filename)
+        if series is None:
+            return jsonify({
+                'success': False,
+                'error': f'No price data for {ticker}'
+            }), 400
         
-        return jsonify({
+        if etag is None:
+            etag = _pe_ratios_etag(_pe_ratio_series_version(ticker, years, include_forward, smoothing, filename),
+                                   fmt, max_points, method)
+        return _with_etag(jsonify({
             'success': True,
             'ticker': ticker,
-            'pe_ttm': pe_ttm_data,
-            'pe_forward': pe_forward_data if pe_forward_data else None,
-            'price': price_data
-        })
+            **_encode_pe_series(_downsampled(series, max_points, method), fmt)
+        }), etag)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -224,6 +378,134 @@ def get_pe_ratios(ticker):
         }), 400
 
 
+def _pe_ratios_etag(token, fmt, max_points=None, method='lttb'):
+    """ETag of a /api/pe_ratios response: the series version plus the encoding and downsampling."""
+    if token is None:
+        return None
+    if fmt == chart_encoding.COLUMNAR:
+        token += f"-{chart_encoding.COLUMNAR}"
+    if max_points:
+        token += f"-{method}{max_points}"
+    return token
+
+
+def _pe_ratio_series(ticker, years, include_forward, smoothing, filename):
+    """
+    Arrays of a ticker's P/E chart (manual EPS source) on its price dates:
+    {'dates', 'price', 'pe_ttm', 'pe_forward'}, NaN where there is no P/E,
+    or None if there is no price data.
+    """
+    hist = _get_price_history(ticker, years)
+    if hist.empty:
+        return None
+    
+    manual_eps_by_ticker = get_eps_data(filename)
+    ttm_eps_series = _get_manual_eps_series(ticker, hist.index, manual_eps_by_ticker, compute_ttm=True)
+    
+    # Calculate P/E ratios
+    pe_ttm = hist['Close'] / ttm_eps_series
+    pe_ttm.replace([np.inf, -np.inf], np.nan, inplace=True)
+    
+    pe_forward = None
+    if include_forward:
+        # Forward P/E not available with Stooq
+        pass
+    
+    # Apply smoothing if requested
+    if smoothing and smoothing > 1:
+        pe_ttm = pe_ttm.rolling(window=smoothing, min_periods=1).mean()
+        price_series = hist['Close'].rolling(window=smoothing, min_periods=1).mean()
+        if pe_forward is not None:
+            pe_forward = pe_forward.rolling(window=smoothing, min_periods=1).mean()
+    else:
+        price_series = hist['Close']
+    
+    series = {
+        'dates': hist.index.to_numpy(dtype='datetime64[ns]'),
+        'price': price_series.to_numpy(dtype=np.float64, copy=True),
+        'pe_ttm': pe_ttm.to_numpy(dtype=np.float64, copy=True),
+        'pe_forward': pe_forward.to_numpy(dtype=np.float64, copy=True) if pe_forward is not None else None,
+    }
+    # Shared through the score cache
+    for values in series.values():
+        if values is not None:
+            values.flags.writeable = False
+    return series
+
+
+def _downsampled(series, max_points, method='lttb'):
+    """A _pe_ratio_series result reduced to about max_points bars (see downsample.chart_indices)."""
+    dates = series['dates']
+    keep = chart_indices(dates.astype('datetime64[D]').astype(np.int64),
+                         (series['price'], series['pe_ttm'], series['pe_forward']), max_points, method)
+    if keep is None:
+        return series
+    return {name: values[keep] if values is not None else None for name, values in series.items()}
+
+
+def _encode_pe_series(series, fmt):
+    """The response fields of a _pe_ratio_series result, in the requested format (see chart_encoding)."""
+    dates = series['dates']
+    if fmt == chart_encoding.COLUMNAR:
+        return chart_encoding.columnar(dates, series['price'], pe_ttm=series['pe_ttm'],
+                                       pe_forward=series['pe_forward'])
+    pe_forward = series['pe_forward']
+    pe_forward_data = chart_encoding.points(dates, pe_forward) if pe_forward is not None else []
+    return {
+        'pe_ttm': chart_encoding.points(dates, series['pe_ttm']),
+        'pe_forward': pe_forward_data if pe_forward_data else None,
+        'price': [{'date': date, 'value': value} for date, value in
+                  zip(np.datetime_as_string(dates, unit='s').tolist(), series['price'].tolist())]
+    }
+
+
+def _cached_pe_ratio_series(ticker, years, include_forward, smoothing, filename):
+    """_pe_ratio_series, memoized per ticker, parameters, EPS block and latest price bar."""
+    return cached('pe_series', lambda: _pe_ratio_series(ticker, years, include_forward, smoothing, filename),
+                  ticker, (years, bool(include_forward), smoothing), (filename, None))
+
+
+def _pe_ratio_series_version(ticker, years, include_forward, smoothing, filename):
+    """Version token of _cached_pe_ratio_series for these arguments (None while prices are stale)."""
+    return version('pe_series', ticker, (years, bool(include_forward), smoothing), (filename, None))
+
+
+def _value_pe_avg_json(ticker, scored):
+    """Per-ticker result object of /api/batch/value_pe_avg from (score, details) or an exception."""
+    try:
+        if isinstance(scored, Exception):
+            raise scored
+        score, details = scored
+        score_100 = score * 100
+        return {
+            'ticker': ticker,
+            'success': True,
+            'score': score,
+            'score_100': score_100,
+            'details': {
+                'current_pe': float(details['current_pe']),
+                'avg_pe': float(details['avg_pe']),
+                'min_pe': float(details['min_pe']),
+                'max_pe': float(details['max_pe']),
+                'score_avg': float(details['score_avg']),
+                'score_range': float(details['score_range']),
+                'data_points': int(details['data_points']),
+                'data_gaps': details.get('data_gaps', [])
+            }
+        }
+    except Exception as e:
+        return _error_result(ticker, e)
+
+
+def _value_pe_avg_result(ticker, years, filename):
+    return _value_pe_avg_json(ticker, _scored(cached_value_PE_avg, ticker, years=years, filename=filename))
+
+
+def _value_pe_avg_results(tickers, years, filename):
+    scored = cached_value_PE_avg_batch(tickers, years=years, filename=filename)
+    return [_value_pe_avg_json(ticker, scored[ticker]) for ticker in tickers]
+
+
 @app.route('/api/batch/value_pe_avg', methods=['POST'])
 def batch_value_pe_avg():
     """
@@ -235,48 +517,57 @@ def batch_value_pe_avg():
     years = data.get('years', 2)
     filename = data.get('filename', 'DATA/EPS_manual.txt')
     
-    results = []
-    for ticker in tickers:
-        try:
-            score, details = value_PE_avg(ticker, years=years, filename=filename)
-            score_100 = score * 100
-            results.append({
+    # Cold tickers are downloaded concurrently so scoring runs on warm data
+    return _batch_response(lambda ticker: _value_pe_avg_result(ticker, years, filename), tickers,
+                           prefetch_years=years,
+                           batch_fn=lambda tickers: _value_pe_avg_results(tickers, years, filename),
+                           version_fn=lambda ticker: value_PE_avg_version(ticker, years, filename))
+
+
+def _pe_ratios_result(ticker, years, source, include_forward, smoothing, filename, fmt=None,
+                      max_points=None, method='lttb'):
+    """Per-ticker result object of /api/batch/pe_ratios."""
+    try:
+        # Auto source not available with Stooq
+        if source == 'auto':
+            return {
                 'ticker': ticker,
-                'success': True,
-                'score': score,
-                'score_100': score_100,
-                'details': {
-                    'current_pe': float(details['current_pe']),
-                    'avg_pe': float(details['avg_pe']),
-                    'min_pe': float(details['min_pe']),
-                    'max_pe': float(details['max_pe']),
-                    'score_avg': float(details['score_avg']),
-                    'score_range': float(details['score_range']),
-                    'data_points': int(details['data_points']),
-                    'data_gaps': details.get('data_gaps', [])
-                }
-            })
-        except Exception as e:
-            err_msg = str(e)
-            code = 'MISSING_DATA' if "not found in" in err_msg else 'UNKNOWN'
-            results.append({
+                'success': False,
+                'error': 'Auto EPS source not available with Stooq. Use "manual" source.'
+            }
+        
+        if source != 'manual':
+            return {
                 'ticker': ticker,
                 'success': False,
-                'error': err_msg,
-                'error_code': code
-            })
-    
-    return jsonify({
-        'success': True,
-        'results': results
-    })
+                'error': f'Unknown source: {source}'
+            }
+        
+        series = _cached_pe_ratio_series(ticker, years, include_forward, smoothing, filename)
+        if series is None:
+            return {
+                'ticker': ticker,
+                'success': False,
+                'error': f'No price data for {ticker}'
+            }
+        
+        return {
+            'ticker': ticker,
+            'success': True,
+            **_encode_pe_series(_downsampled(series, max_points, method), fmt),
+            'data_points': int(np.count_nonzero(~np.isnan(series['pe_ttm'])))
+        }
+    except Exception as e:
+        return _error_result(ticker, e)
 
 
 @app.route('/api/batch/pe_ratios', methods=['POST'])
 def batch_pe_ratios():
     """
     Get P/E ratio data for multiple tickers.
-    Body: {"tickers": ["AAPL", "NVDA"], "years": 5, "source": "manual", ...}
+    Body: {"tickers": ["AAPL", "NVDA"], "years": 5, "source": "manual", ...,
+           "format": "columnar" (optional, see chart_encoding.py),
+           "max_points": 300, "downsample": "lttb" | "minmax" (optional, see downsample.py)}
     """
     data = request.get_json()
     tickers = data.get('tickers', [])
@@ -285,93 +576,18 @@ def batch_pe_ratios():
     include_forward = data.get('include_forward', False)
     smoothing = data.get('smoothing', 0)
     filename = data.get('filename', 'DATA/EPS_manual.txt')
+    fmt = data.get('format')
+    max_points = data.get('max_points')
+    method = data.get('downsample', 'lttb')
     
-    results = []
-    for ticker in tickers:
-        try:
-            # Auto source not available with Stooq
-            if source == 'auto':
-                results.append({
-                    'ticker': ticker,
-                    'success': False,
-                    'error': 'Auto EPS source not available with Stooq. Use "manual" source.'
-                })
-                continue
-            
-            hist = _get_price_history(ticker, years)
-            
-            if hist.empty:
-                results.append({
-                    'ticker': ticker,
-                    'success': False,
-                    'error': f'No price data for {ticker}'
-                })
-                continue
-            
-            if source == 'manual':
-                manual_eps_by_ticker = load_manual_eps(filename)
-                ttm_eps_series = _get_manual_eps_series(ticker, hist.index, manual_eps_by_ticker, compute_ttm=True)
-            else:
-                results.append({
-                    'ticker': ticker,
-                    'success': False,
-                    'error': f'Unknown source: {source}'
-                })
-                continue
-            
-            pe_ttm = hist['Close'] / ttm_eps_series
-            pe_ttm.replace([np.inf, -np.inf], np.nan, inplace=True)
-            
-            pe_forward = None
-            if include_forward:
-                # Forward P/E not available with Stooq
-                pass
-            
-            if smoothing and smoothing > 1:
-                pe_ttm = pe_ttm.rolling(window=smoothing, min_periods=1).mean()
-                price_series = hist['Close'].rolling(window=smoothing, min_periods=1).mean()
-                if pe_forward is not None:
-                    pe_forward = pe_forward.rolling(window=smoothing, min_periods=1).mean()
-            else:
-                price_series = hist['Close']
-            
-            dates = [d.isoformat() for d in hist.index]
-            
-            pe_ttm_data = []
-            for date, value in zip(dates, pe_ttm.values):
-                if pd.notna(value):
-                    pe_ttm_data.append({'date': date, 'value': float(value)})
-            
-            pe_forward_data = []
-            if pe_forward is not None:
-                for date, value in zip(dates, pe_forward.values):
-                    if pd.notna(value):
-                        pe_forward_data.append({'date': date, 'value': float(value)})
-            
-            price_data = [{'date': date, 'value': float(val)} for date, val in zip(dates, price_series.values)]
-            
-            results.append({
-                'ticker': ticker,
-                'success': True,
-                'pe_ttm': pe_ttm_data,
-                'pe_forward': pe_forward_data if pe_forward_data else None,
-                'price': price_data,
-                'data_points': len(pe_ttm_data)
-            })
-        except Exception as e:
-            err_msg = str(e)
-            code = 'MISSING_DATA' if "not found in" in err_msg else 'UNKNOWN'
-            results.append({
-                'ticker': ticker,
-                'success': False,
-                'error': err_msg,
-                'error_code': code
-            })
-    
-    return jsonify({
-        'success': True,
-        'results': results
-    })
+    return _batch_response(
+        lambda ticker: _pe_ratios_result(ticker, years, source, include_forward, smoothing, filename, fmt,
+                                         max_points, method),
+        tickers,
+        prefetch_years=years if source == 'manual' else None,
+        version_fn=(lambda ticker: _pe_ratio_series_version(ticker, years, include_forward, smoothing, filename))
+        if source == 'manual' else None
+    )
 
 
 @app.route('/api/health', methods=['GET'])
@@ -379,6 +595,41 @@ def health_check():
     return jsonify({'status': 'ok'})
 
 
+def _peg_json(ticker, scored):
+    """Per-ticker result object of /api/batch/peg_ratio from (score, details) or an exception."""
+    try:
+        if isinstance(scored, Exception):
+            raise scored
+        score, details = scored
+        return {
+            'ticker': ticker,
+            'success': True,
+            'score': score,
+            'score_100': score * 100,
+            'details': {
+                'peg': float(details.get('peg', 999.0)),
+                'pe': float(details.get('pe', 999.0)),
+                'growth_rate': float(details.get('growth_rate', 0.0)),
+                'r_squared': float(details.get('r_squared', 0.0)),
+                'data_points': int(details.get('data_points', 0)),
+                'score': float(details.get('score', 0.0)),
+                'data_gaps': details.get('data_gaps', []),
+                'error': details.get('error')
+            }
+        }
+    except Exception as e:
+        return _error_result(ticker, e, ("not found in", "No price data", "No EPS data"))
+
+
+def _peg_result(ticker, years, filename):
+    return _peg_json(ticker, _scored(cached_score_peg, ticker, years=years, filename=filename))
+
+
+def _peg_results(tickers, years, filename):
+    scored = cached_score_peg_batch(tickers, years=years, filename=filename)
+    return [_peg_json(ticker, scored[ticker]) for ticker in tickers]
+
+
 @app.route('/api/batch/peg_ratio', methods=['POST'])
 def batch_peg_ratio():
     """
@@ -390,40 +641,73 @@ def batch_peg_ratio():
     filename = data.get('filename', 'DATA/EPS_manual.txt')
     years = int(data.get('years', 3)) # Default to 3 years for growth calc
     
-    results = []
-    for ticker in tickers:
-        try:
-            score, details = score_peg(ticker, years=years, filename=filename)
-            results.append({
-                'ticker': ticker,
-                'success': True,
-                'score': score,
-                'score_100': score * 100,
-                'details': {
-                    'peg': float(details.get('peg', 999.0)),
-                    'pe': float(details.get('pe', 999.0)),
-                    'growth_rate': float(details.get('growth_rate', 0.0)),
-                    'r_squared': float(details.get('r_squared', 0.0)),
-                    'data_points': int(details.get('data_points', 0)),
-                    'score': float(details.get('score', 0.0)),
-                    'data_gaps': details.get('data_gaps', []),
-                    'error': details.get('error')
-                }
-            })
-        except Exception as e:
-            err_msg = str(e)
-            code = 'MISSING_DATA' if "not found in" in err_msg or "No price data" in err_msg or "No EPS data" in err_msg else 'UNKNOWN'
-            results.append({
+    # score_peg only needs the latest close
+    return _batch_response(lambda ticker: _peg_result(ticker, years, filename), tickers, prefetch_years=1,
+                           batch_fn=lambda tickers: _peg_results(tickers, years, filename),
+                           version_fn=lambda ticker: score_peg_version(ticker, years, filename))
+
+
+@app.route('/api/batch/dashboard', methods=['POST'])
+def batch_dashboard():
+    """
+    Everything the Home page shows for a set of tickers in one call:
+    the value_pe_avg, debt_to_equity, peg_ratio and pe_ratios results per ticker.
+    Body: {"tickers": [...], "years": 2, "chart_years": 5, "include_forward": true, "smoothing": 0,
+           "eps_filename": "DATA/EPS_manual.txt", "balance_filename": "DATA/Balance_manual.txt",
+           "format": "columnar", "max_points": 250 (optional, encoding and downsampling of the pe_ratios series)}
+    """
+    data = request.get_json()
+    tickers = data.get('tickers', [])
+    years = int(data.get('years', 2))
+    chart_years = int(data.get('chart_years', 5))
+    include_forward = data.get('include_forward', False)
+    smoothing = data.get('smoothing', 0)
+    eps_filename = data.get('eps_filename', 'DATA/EPS_manual.txt')
+    balance_filename = data.get('balance_filename', 'DATA/Balance_manual.txt')
+    chart_format = data.get('format')
+    chart_max_points = data.get('max_points')
+    
+    def dashboard_result(ticker):
+        return {
+            'ticker': ticker,
+            'value_pe_avg': _value_pe_avg_result(ticker, years, eps_filename),
+            'debt_to_equity': _debt_to_equity_result(ticker, years, balance_filename),
+            'peg_ratio': _peg_result(ticker, years, eps_filename),
+            'pe_ratios': _pe_ratios_result(ticker, chart_years, 'manual', include_forward, smoothing,
+                                           eps_filename, chart_format, chart_max_points),
+        }
+    
+    def dashboard_results(tickers):
+        value_pe_avg = _value_pe_avg_results(tickers, years, eps_filename)
+        debt_to_equity = _debt_to_equity_results(tickers, years, balance_filename)
+        peg_ratio = _peg_results(tickers, years, eps_filename)
+        return [
+            {
                 'ticker': ticker,
-                'success': False,
-                'error': err_msg,
-                'error_code': code
-            })
+                'value_pe_avg': value_pe_avg[i],
+                'debt_to_equity': debt_to_equity[i],
+                'peg_ratio': peg_ratio[i],
+                'pe_ratios': _pe_ratios_result(ticker, chart_years, 'manual', include_forward, smoothing,
+                                               eps_filename, chart_format, chart_max_points),
+            }
+            for i, ticker in enumerate(tickers)
+        ]
+    
+    # One price download per cold ticker covering every window above; the scorers
+    # then share the in-process price frames and the parsed fundamentals.
+    def dashboard_version(ticker):
+        tokens = [
+            value_PE_avg_version(ticker, years, eps_filename),
+            score_debt_to_equity_version(ticker, filename=balance_filename),
+            score_peg_version(ticker, years, eps_filename),
+            _pe_ratio_series_version(ticker, chart_years, include_forward, smoothing, eps_filename),
+        ]
+        if None in tokens:
+            return None
+        return hashlib.blake2b(' '.join(tokens).encode(), digest_size=16).hexdigest()
     
-    return jsonify({
-        'success': True,
-        'results': results
-    })
+    return _batch_response(dashboard_result, tickers, prefetch_years=max(years, chart_years, 1),
+                           batch_fn=dashboard_results, version_fn=dashboard_version)
 
 
 @app.route('/api/batch/live_price', methods=['POST'])
@@ -431,19 +715,12 @@ def batch_live_price():
     """
     Fetch current price and daily change for multiple tickers via Yahoo Finance.
     """
-    import urllib.request, json
     data = request.get_json()
     tickers = data.get('tickers', [])
-    results = []
 
-    for ticker in tickers:
+    def live_quote(ticker):
         try:
-            url = f"https://query2.finance.yahoo.com/v8/finance/chart/{ticker}?range=5d&interval=1d"
-            hdr = {'User-Agent': 'Mozilla/5.0'}
-            req = urllib.request.Request(url, headers=hdr)
-
-            with urllib.request.urlopen(req, timeout=10) as response:
-                resp_data = json.loads(response.read().decode('utf-8'))
+            resp_data = yahoo_chart(ticker, "range=5d&interval=1d")
 
             chart_res = resp_data.get('chart', {}).get('result', [])
             if not chart_res:
@@ -464,46 +741,44 @@ def batch_live_price():
             change = current_price - previous_close
             change_pct = (change / previous_close * 100) if previous_close else 0
 
-            results.append({
+            return {
                 'ticker': ticker,
                 'success': True,
                 'price': round(current_price, 2),
                 'previous_close': round(previous_close, 2),
                 'change': round(change, 2),
                 'change_pct': round(change_pct, 2)
-            })
+            }
         except Exception as e:
-            results.append({
+            return {
                 'ticker': ticker,
                 'success': False,
                 'error': str(e)
-            })
+            }
 
-    return jsonify({'success': True, 'results': results})
+    # Quotes are fetched concurrently over the shared keep-alive session
+    results = map_concurrent(live_quote, tickers)
 
+    return jsonify({'success': True, 'results': results})
 
-SETS_FILE = 'DATA/sets.json'
 
-def load_sets():
-    if not os.path.exists(SETS_FILE):
-        return {}
-    try:
-        with open(SETS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+if sqlite_store.enabled():
+    user_sets_store = sqlite_store.UserSets()
+else:
+    user_sets_store = UserShards(SETS_DIR, legacy_file=SETS_FILE, indent=4)
 
-def save_sets(data):
-    os.makedirs('DATA', exist_ok=True)
-    with open(SETS_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+def _sets_unreadable(user_id, e):
+    """500 response for a user whose saved sets can't be read; nothing is written over them."""
+    print(f"Saved sets of {user_id} are unreadable: {e}")
+    return jsonify({'success': False, 'error': 'Saved sets could not be read'}), 500
 
 @app.route('/api/sets', methods=['GET'])
 def get_sets():
     user_id = request.args.get('userId', 'default_user')
-    sets = load_sets()
-    user_sets = sets.get(user_id, {})
-    return jsonify({'success': True, 'sets': user_sets})
+    try:
+        return jsonify({'success': True, 'sets': user_sets_store.load(user_id)})
+    except (OSError, ValueError) as e:
+        return _sets_unreadable(user_id, e)
 
 @app.route('/api/sets', methods=['POST'])
 def save_set():
@@ -515,47 +790,36 @@ def save_set():
     if not set_name:
         return jsonify({'success': False, 'error': 'Set name is required'}), 400
         
-    sets = load_sets()
-    if user_id not in sets:
-        sets[user_id] = {}
-        
-    sets[user_id][set_name] = tickers
-    save_sets(sets)
-    
-    return jsonify({'success': True, 'sets': sets[user_id]})
+    try:
+        _, user_sets = user_sets_store.update(user_id, lambda sets: sets.update({set_name: tickers}))
+    except (OSError, ValueError) as e:
+        return _sets_unreadable(user_id, e)
+    return jsonify({'success': True, 'sets': user_sets})
 
 @app.route('/api/sets/<set_name>', methods=['DELETE'])
 def delete_set(set_name):
     user_id = request.args.get('userId', 'default_user')
     
-    sets = load_sets()
-    if user_id in sets and set_name in sets[user_id]:
-        del sets[user_id][set_name]
-        save_sets(sets)
-        return jsonify({'success': True, 'sets': sets[user_id]})
-    
-    return jsonify({'success': False, 'error': 'Set not found'}), 404
+    def remove(sets):
+        del sets[set_name]
+
+    try:
+        _, user_sets = user_sets_store.update(user_id, remove)
+    except KeyError:
+        return jsonify({'success': False, 'error': 'Set not found'}), 404
+    except (OSError, ValueError) as e:
+        return _sets_unreadable(user_id, e)
+    return jsonify({'success': True, 'sets': user_sets})
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Backtest Endpoints
 # ──────────────────────────────────────────────────────────────────────────────
 
-SNAPSHOTS_FILE = 'DATA/backtest_snapshots.json'
-
-def load_snapshots():
-    if not os.path.exists(SNAPSHOTS_FILE):
-        return []
-    try:
-        with open(SNAPSHOTS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return []
-
-def save_snapshots(data):
-    os.makedirs('DATA', exist_ok=True)
-    with open(SNAPSHOTS_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+if sqlite_store.enabled():
+    snapshot_store = sqlite_store.Snapshots()
+else:
+    snapshot_store = FileSnapshots(SNAPSHOTS_DIR, legacy_file=SNAPSHOTS_FILE)
 
 
 @app.route('/api/backtest/run', methods=['POST'])
@@ -595,14 +859,40 @@ def backtest_run():
 
         return jsonify({'success': True, **result})
 
+    except ValueError as e:
+        # Bad start date, numbers or weight sets
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/backtest/snapshots', methods=['GET'])
 def get_snapshots():
-    snapshots = load_snapshots()
-    return jsonify({'success': True, 'snapshots': snapshots})
+    """
+    Saved snapshots' metadata, newest first, one page at a time.
+    Query: limit (default 20, at most 100), cursor (next_cursor of the previous page).
+    Payloads (results, summary) come from GET /api/backtest/snapshots/<id>.
+    """
+    limit = max(1, min(request.args.get('limit', PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    try:
+        snapshots, next_cursor = snapshot_store.list(limit=limit, cursor=request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    return jsonify({'success': True, 'snapshots': snapshots, 'next_cursor': next_cursor,
+                    'total': snapshot_store.count()})
+
+
+@app.route('/api/backtest/snapshots/<snapshot_id>', methods=['GET'])
+def get_snapshot(snapshot_id):
+    """One snapshot with its results and summary. Snapshots never change, so the id is its ETag."""
+    snapshot = snapshot_store.get(snapshot_id)
+    if snapshot is None:
+        return jsonify({'success': False, 'error': 'Snapshot not found'}), 404
+    etag = f'snapshot-{snapshot_id}'
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    return _with_etag(jsonify({'success': True, 'snapshot': snapshot}), etag)
 
 
 @app.route('/api/backtest/snapshots', methods=['POST'])
@@ -615,7 +905,6 @@ def save_snapshot():
         data = request.get_json()
         name = data.get('name', 'Untitled')
 
-        snapshots = load_snapshots()
         snapshot_id = str(int(datetime.now().timestamp() * 1000))
 
         snapshot = {
@@ -631,20 +920,17 @@ def save_snapshot():
             'summary': data.get('summary', []),
         }
 
-        snapshots.append(snapshot)
-        save_snapshots(snapshots)
-
-        return jsonify({'success': True, 'snapshot': snapshot, 'snapshots': snapshots})
+        return jsonify({'success': True, 'snapshot': snapshot_store.add(snapshot)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/backtest/snapshots/<snapshot_id>', methods=['DELETE'])
 def delete_snapshot(snapshot_id):
-    snapshots = load_snapshots()
-    snapshots = [s for s in snapshots if s['id'] != snapshot_id]
-    save_snapshots(snapshots)
-    return jsonify({'success': True, 'snapshots': snapshots})
+    snapshot = snapshot_store.delete(snapshot_id)
+    if snapshot is None:
+        return jsonify({'success': False, 'error': 'Snapshot not found'}), 404
+    return jsonify({'success': True, 'snapshot': snapshot})
 
 
 if __name__ == '__main__':
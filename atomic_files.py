@@ -0,0 +1,242 @@
+"""
+Safe read-modify-write of small data files shared by threads and processes.
+
+- file_lock(path): exclusive lock on path + ".lock" (fcntl.flock on POSIX,
+  msvcrt.locking on Windows) plus a per-path thread lock, so waitress threads
+  and separate worker processes take turns.
+- write_bytes / write_json: write a temp file in the same directory, fsync
+  it, then os.replace it over the target, so a crash or a concurrent reader
+  never sees a truncated file.
+- update_json(path, mutate): lock, load, mutate, write back atomically.
+- UserShards: one JSON file per user under a directory, so saving one user's
+  data rewrites only that user's shard.
+
+SETS_FILE / SETS_DIR are where the app keeps saved sets with UserShards.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+LOCK_TIMEOUT = 30.0      # Seconds to wait for another process's lock
+REPLACE_RETRIES = 10     # Windows refuses os.replace while a reader has the file open
+
+SETS_FILE = "DATA/sets.json"   # Legacy single file, read for users not yet in a shard
+SETS_DIR = "DATA/sets"         # One <userId>.json per user
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.Lock()
+        return lock
+
+
+def _try_lock(f) -> bool:
+    try:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = LOCK_TIMEOUT):
+    """Hold an exclusive lock on `path` (through a sidecar .lock file) across threads and processes."""
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _thread_lock(path):
+        with open(path + ".lock", "a+b") as f:
+            deadline = time.monotonic() + timeout
+            while not _try_lock(f):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for the lock on {path}")
+                time.sleep(0.02)
+            try:
+                yield
+            finally:
+                _unlock(f)
+
+
+def _replace(tmp: str, path: str):
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def write_bytes(path: str, pieces) -> None:
+    """Atomically replace path with the concatenated byte strings in `pieces`."""
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for piece in pieces:
+                f.write(piece)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def read_json(path: str, default=None, strict: bool = False):
+    """
+    Parsed JSON at path, or `default` if the file is missing or unreadable.
+    With strict=True only a missing file gives `default`; one that can't be
+    read or parsed raises (OSError / ValueError), so a caller never writes
+    over data it failed to read.
+    """
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+        except PermissionError:
+            # Windows: the file is being swapped in by os.replace right now
+            if strict and attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.02 * (attempt + 1))
+        except (OSError, ValueError):
+            if strict:
+                raise
+            return default
+    return default
+
+
+def write_json(path: str, data, indent=None) -> None:
+    """Atomically replace path with data as JSON."""
+    write_bytes(path, [json.dumps(data, indent=indent).encode()])
+
+
+def update_json(path: str, mutate, default, indent=None, strict: bool = False):
+    """
+    Under the file's lock, load path (or a copy of `default`), call mutate(data)
+    and write data back atomically. Returns (mutate's return value, data).
+    If mutate raises, nothing is written; with strict=True neither is anything
+    when the file exists but can't be parsed (see read_json).
+    """
+    with file_lock(path):
+        data = read_json(path, None, strict=strict)
+        if data is None:
+            data = json.loads(json.dumps(default))
+        result = mutate(data)
+        write_json(path, data, indent=indent)
+        return result, data
+
+
+_SAFE_KEY = re.compile(r"[A-Za-z0-9_-]{1,64}")
+_HASHED_NAME = re.compile(r"u_[0-9a-f]{40}")
+_RESERVED = re.compile(r"(CON|PRN|AUX|NUL|COM\d|LPT\d)", re.IGNORECASE)  # Not usable as Windows file names
+
+
+def safe_name(key: str) -> str:
+    """key itself if it is usable as a file name on every platform, else "u_" + its SHA-1."""
+    if _SAFE_KEY.fullmatch(key) and not _RESERVED.fullmatch(key):
+        return key
+    return "u_" + hashlib.sha1(key.encode()).hexdigest()
+
+
+class UserShards:
+    """
+    {user id: JSON object} kept as one file per user in `directory`.
+
+    Users not yet in a shard are read from `legacy_file` (the old single file
+    keyed by user id), until their first save moves them into their own shard.
+    Shards named by a hash of the user id (see safe_name) have the id recorded
+    in IDS_FILE, so users() can map every shard back to its user.
+    """
+
+    IDS_FILE = ".user_ids.json"  # {shard name: user id}; never a safe_name, so never a user's shard
+
+    def __init__(self, directory: str, legacy_file: str = None, indent=None):
+        self.directory = directory
+        self.legacy_file = legacy_file
+        self.indent = indent
+
+    def path(self, user_id: str) -> str:
+        return os.path.join(self.directory, safe_name(user_id) + ".json")
+
+    def _legacy(self, user_id: str) -> dict:
+        if self.legacy_file is None:
+            return {}
+        data = read_json(self.legacy_file, {})
+        return data.get(user_id, {}) if isinstance(data, dict) else {}
+
+    def load(self, user_id: str) -> dict:
+        """The user's data; the legacy file's only if the user has no shard. Raises if the shard is corrupt."""
+        data = read_json(self.path(user_id), None, strict=True)
+        return data if data is not None else self._legacy(user_id)
+
+    def users(self) -> dict:
+        """
+        {shard name: user id} of every shard in the directory. A hashed name
+        whose id was never recorded is matched against the legacy file's user
+        ids, and maps to None if that fails too.
+        """
+        if not os.path.isdir(self.directory):
+            return {}
+        names = sorted(name[:-5] for name in os.listdir(self.directory)
+                       if name.endswith(".json") and name != self.IDS_FILE)
+        ids = read_json(os.path.join(self.directory, self.IDS_FILE), {}, strict=True)
+        legacy = read_json(self.legacy_file, {}) if self.legacy_file is not None else {}
+        if isinstance(legacy, dict):
+            ids = {**{safe_name(user_id): user_id for user_id in legacy}, **ids}
+        return {name: ids.get(name) if _HASHED_NAME.fullmatch(name) else name for name in names}
+
+    def _record_id(self, user_id: str):
+        name = safe_name(user_id)
+        ids_path = os.path.join(self.directory, self.IDS_FILE)
+        if name != user_id and read_json(ids_path, {}, strict=True).get(name) != user_id:
+            update_json(ids_path, lambda ids: ids.update({name: user_id}), {}, strict=True)
+
+    def update(self, user_id: str, mutate) -> tuple:
+        """
+        update_json on the user's shard, seeded from the legacy file. Returns
+        (result, data). Raises, writing nothing, if the shard is corrupt.
+        """
+        path = self.path(user_id)
+        self._record_id(user_id)
+        with file_lock(path):
+            data = read_json(path, None, strict=True)
+            if data is None:
+                data = self._legacy(user_id)
+            result = mutate(data)
+            write_json(path, data, indent=self.indent)
+            return result, data
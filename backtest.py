@@ -0,0 +1,279 @@
+"""
+Point-in-time backtest of the dashboard's valuation scores.
+
+run_backtest scores every ticker as of a start date the way the dashboard
+would have on that day: P/E against its own history (value_PE_avg), PEG
+(score_peg) and debt-to-equity (score_debt_to_equity), from EPS and balance
+sheet rows dated before the start date and closes up to the day before it.
+Each weight set combines the three scores like the Home page does, and the
+rankings are compared with every ticker's return over the next months.
+
+Nothing is scored one ticker at a time: the fundamentals are the tickers'
+rows cut at the start date, the closes are one (days, tickers) matrix, and the
+batch formulas from valuation.py evaluate every ticker at once.
+"""
+import numpy as np
+import pandas as pd
+
+from eps_series import classify_quarterly, ttm_eps_rows
+from fundamentals import BALANCE_FILE, EPS_FILE, get_balance_data, get_eps_data
+from manual_parser import ManualTable, group_ids
+from valuation import (_align_ttm_eps_panel, _debt_to_equity_scores, _growth_rates_batch, _last_rows,
+                       _pe_avg_scores, _peg_scores, _price_panel)
+
+DEFAULT_WEIGHT_SETS = [{'name': 'Default', 'pe': 70, 'peg': 20, 'debt': 10}]
+MISSING_SCORES = {'pe': 0.0, 'peg': 0.0, 'debt': 50.0}   # What the Home page uses for a missing score
+TOP_FRACTION = 1 / 3        # Share of the ranked tickers in the top (and in the bottom) group
+EXIT_TOLERANCE_DAYS = 10    # Latest close before the exit date must be at most this old
+
+
+def _get_price_data(ticker, start_date, end_date):
+    """
+    Daily closes of a ticker between two dates (inclusive), from the price cache.
+
+    A fresh cache is used for whatever dates it holds. Yahoo isn't asked again
+    because end_date is a weekend, a holiday or a day whose bar doesn't exist
+    yet, or because start_date is older than the range=10y download reaches;
+    closes the cache doesn't have are reported missing. A stale or missing
+    cache is refreshed with one request (see _get_price_data_yahoo).
+    """
+    from cache_utils import get_fresh_prices
+    from finance_plots import _get_price_data_yahoo
+    from price_store import slice_frame
+
+    df = get_fresh_prices(ticker)
+    if df is None:
+        df = _get_price_data_yahoo(ticker)
+    return slice_frame(df, start_date=start_date, end_date=end_date)
+
+
+def rows_before(rows: ManualTable, cutoff) -> ManualTable:
+    """The rows of a ManualTable dated before cutoff, per ticker as before."""
+    keep = rows.dates < cutoff
+    counts = np.bincount(group_ids(rows.offsets)[keep], minlength=len(rows.tickers))
+    offsets = np.zeros(len(rows.tickers) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return ManualTable(rows.tickers, offsets, rows.dates[keep], rows.values[keep], rows.columns)
+
+
+def _number(value):
+    """A float for JSON, None for NaN / missing."""
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def _pe_component(eps_rows, ttm, axis, close, present, years):
+    """value_PE_avg as of each ticker's last close: (score or NaN, current P/E, error or None per ticker)."""
+    pe = _pe_avg_scores(axis, close, present, _align_ttm_eps_panel(axis, eps_rows, ttm), years)
+    loaded = present.any(axis=0)
+    has_eps = np.diff(eps_rows.offsets) > 0
+
+    # Non-profitable companies score 0, like value_PE_avg
+    unprofitable = (pe["counts"] == 0) | (pe["latest_eps"] <= 0)
+    score = np.where(unprofitable, 0.0, pe["score"])
+    errors = [None] * len(score)
+    for i in range(len(score)):
+        if not loaded[i]:
+            errors[i] = "No price data before start_date"
+        elif not has_eps[i]:
+            errors[i] = "No EPS data before start_date"
+        elif np.isnan(pe["latest_eps"][i]):
+            errors[i] = "Not enough valid P/E data"
+        if errors[i] is not None:
+            score[i] = np.nan
+        elif unprofitable[i]:
+            errors[i] = "Negative Earnings (Not Profitable)"
+    return score, pe["current_pe"], errors
+
+
+def _peg_component(eps_rows, ttm, price, years):
+    """score_peg from the rows before the start date: (score or NaN, PEG or NaN) per ticker."""
+    sizes = np.diff(eps_rows.offsets)
+    latest_ttm = np.full(len(sizes), np.nan)
+    latest_ttm[sizes > 0] = ttm[eps_rows.offsets[1:][sizes > 0] - 1]
+    growth, _, _ = _growth_rates_batch(eps_rows, years)
+    growth = np.array([np.nan if g is None else g for g in growth], dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peg = price / latest_ttm / (growth * 100)
+    # No TTM EPS yet, losses or no growth score 0, like score_peg
+    scorable = (latest_ttm > 0) & (growth > 0)
+    peg = np.where(scorable, peg, np.nan)
+    score = np.where(scorable, _peg_scores(peg), 0.0)
+    score[(sizes == 0) | np.isnan(price)] = np.nan
+    return score, peg
+
+
+def _de_component(balance_rows):
+    """score_debt_to_equity from the latest balance sheet before the start date: (score or NaN, ratio or NaN)."""
+    found = np.diff(balance_rows.offsets) > 0
+    last = np.maximum(balance_rows.offsets[1:] - 1, 0)
+    values = balance_rows.values[last] if len(balance_rows.values) else np.zeros((len(found), 2))
+    ratio, score = _debt_to_equity_scores(values[:, 0], values[:, 1])
+    return np.where(found, score, np.nan), np.where(found, ratio, np.nan)
+
+
+def _rank_ic(scores, returns):
+    """Spearman correlation between scores and returns, None if undefined."""
+    if len(scores) < 3:
+        return None
+    a = pd.Series(scores).rank().to_numpy()
+    b = pd.Series(returns).rank().to_numpy()
+    if a.std() == 0 or b.std() == 0:
+        return None
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+def _summarize(weight_set, tickers, totals, returns):
+    """How one weight set's ranking lined up with the forward returns."""
+    known = ~np.isnan(returns)
+    order = np.argsort(-totals[known], kind="stable")
+    ranked_returns = returns[known][order]
+    n = len(ranked_returns)
+    group = max(1, int(round(n * TOP_FRACTION))) if n else 0
+    top, bottom = ranked_returns[:group], ranked_returns[n - group:]
+    return {
+        'name': weight_set['name'],
+        'weights': {key: weight_set[key] for key in ('pe', 'peg', 'debt')},
+        'tickers': n,
+        'rank_ic': _rank_ic(totals[known], returns[known]),
+        'avg_return_pct': _number(ranked_returns.mean()) if n else None,
+        'top_return_pct': _number(top.mean()) if n else None,
+        'bottom_return_pct': _number(bottom.mean()) if n else None,
+        'spread_pct': _number(top.mean() - bottom.mean()) if n else None,
+        'top_tickers': [tickers[i] for i in np.flatnonzero(known)[order[:group]]],
+    }
+
+
+def _weight_sets(weight_sets):
+    cleaned = []
+    for n, weight_set in enumerate(weight_sets or DEFAULT_WEIGHT_SETS):
+        try:
+            weights = {key: float(weight_set.get(key, 0) or 0) for key in ('pe', 'peg', 'debt')}
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError(f"Invalid weight set: {weight_set}")
+        if any(w < 0 for w in weights.values()):
+            raise ValueError(f"Weights must not be negative: {weight_set}")
+        cleaned.append({'name': str(weight_set.get('name') or f"Set {n + 1}"), **weights})
+    return cleaned
+
+
+def run_backtest(tickers, start_date, lookback_years=2, forward_months=12, weight_sets=None,
+                 eps_filename=EPS_FILE, balance_filename=BALANCE_FILE):
+    """
+    Score tickers as of start_date and measure how the scores ranked their forward returns.
+
+    Parameters
+    ----------
+    tickers : list of str
+        Tickers to score; duplicates are scored once.
+    start_date : str
+        Day the scores are computed for ("YYYY-MM-DD"). Only EPS and balance
+        sheet rows dated before it and closes before it are used.
+    lookback_years : int
+        Lookback for the P/E history, the PEG growth fit and the data checks.
+    forward_months : int
+        Holding period the returns are measured over.
+    weight_sets : list of dict
+        [{name, pe, peg, debt}, ...] weights of the three scores (any scale).
+    eps_filename, balance_filename : str
+        Manual fundamentals files.
+
+    Returns
+    -------
+    result : dict
+        "results": per ticker, the three scores (0-100), the metrics behind
+        them, every weight set's total score, and entry/exit closes with the
+        forward return in percent (None where it can't be measured).
+        "summary": per weight set, the rank correlation between total score
+        and return, and the average return of all, top and bottom tickers.
+        Plus the as_of_date, exit_date, lookback_years and forward_months used.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    if not tickers:
+        raise ValueError("No tickers provided")
+    start = pd.Timestamp(start_date).normalize()
+    lookback_years, forward_months = int(lookback_years), int(forward_months)
+    if lookback_years < 1 or forward_months < 1:
+        raise ValueError("lookback_years and forward_months must be at least 1")
+    weight_sets = _weight_sets(weight_sets)
+
+    exit_target = start + pd.DateOffset(months=forward_months)
+    today = pd.Timestamp.now().normalize()
+    if start > today:
+        raise ValueError("start_date is in the future")
+    price_from = (start - pd.DateOffset(years=lookback_years) - pd.Timedelta(days=7)).strftime("%Y-%m-%d")
+    price_to = min(exit_target, today).strftime("%Y-%m-%d")
+
+    # --- Fundamentals known before the start date ---
+    cutoff = start.to_datetime64()
+    eps_rows = rows_before(get_eps_data(eps_filename).rows_for(tickers), cutoff)
+    # Frequency and TTM sums from these rows only, so later reports can't leak in
+    ttm = ttm_eps_rows(eps_rows, classify_quarterly(eps_rows))
+    balance_rows = rows_before(get_balance_data(balance_filename).rows_for(tickers), cutoff)
+
+    # --- Closes around the start date, one matrix (loaded concurrently, one request per stale ticker) ---
+    axis, close, present, price_errors = _price_panel(
+        tickers, None, load=lambda ticker: _get_price_data(ticker, price_from, price_to))
+    before = axis < cutoff
+    cols = np.arange(len(tickers))
+    axis_pre, close_pre, present_pre = axis[before], close[before], present[before]
+    entry_row = _last_rows(present_pre)
+    has_entry = present_pre.any(axis=0)
+    entry_price = np.where(has_entry, close_pre[entry_row, cols] if len(axis_pre) else np.nan, np.nan)
+
+    # --- The three scores, every ticker at once ---
+    pe_score, current_pe, pe_errors = _pe_component(eps_rows, ttm, axis_pre, close_pre, present_pre, lookback_years)
+    peg_score, peg = _peg_component(eps_rows, ttm, entry_price, lookback_years)
+    de_score, de_ratio = _de_component(balance_rows)
+    components = np.column_stack([pe_score, peg_score, de_score]) * 100
+
+    filled = np.where(np.isnan(components), [MISSING_SCORES[k] for k in ('pe', 'peg', 'debt')], components)
+    weights = np.array([[s['pe'], s['peg'], s['debt']] for s in weight_sets]).T
+    totals = filled @ weights / np.where(weights.sum(axis=0) > 0, weights.sum(axis=0), 1)
+
+    # --- Forward returns: last close on or before the exit date ---
+    held = present & (axis <= exit_target.to_datetime64())[:, None] & ~before[:, None]
+    exit_row = _last_rows(held)
+    has_exit = held.any(axis=0) & (exit_target <= today)
+    exit_dates = axis[exit_row] if len(axis) else np.zeros(len(tickers), dtype="datetime64[ns]")
+    has_exit &= exit_dates >= (exit_target - pd.Timedelta(days=EXIT_TOLERANCE_DAYS)).to_datetime64()
+    exit_price = np.where(has_exit, close[exit_row, cols] if len(axis) else np.nan, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(has_entry & has_exit & (entry_price > 0), (exit_price / entry_price - 1) * 100, np.nan)
+
+    results = []
+    for i, ticker in enumerate(tickers):
+        item = {
+            'ticker': ticker,
+            'pe_score': _number(components[i, 0]),
+            'peg_score': _number(components[i, 1]),
+            'de_score': _number(components[i, 2]),
+            'pe': _number(current_pe[i]) if not np.isnan(pe_score[i]) else None,
+            'peg': _number(peg[i]),
+            'de_ratio': _number(de_ratio[i]),
+            'scores': {s['name']: float(totals[i, k]) for k, s in enumerate(weight_sets)},
+            'entry_date': pd.Timestamp(axis_pre[entry_row[i]]).strftime("%Y-%m-%d") if has_entry[i] else None,
+            'entry_price': _number(entry_price[i]),
+            'exit_date': pd.Timestamp(exit_dates[i]).strftime("%Y-%m-%d") if has_exit[i] else None,
+            'exit_price': _number(exit_price[i]),
+            'return_pct': _number(returns[i]),
+        }
+        errors = [str(price_errors[ticker])] if ticker in price_errors else []
+        if not has_entry[i] and ticker not in price_errors:
+            errors.append("No price data before the start date")
+        if pe_errors[i]:
+            errors.append(pe_errors[i])
+        if np.isnan(returns[i]) and has_entry[i]:
+            errors.append("No close near the exit date" if exit_target <= today else "Holding period not over yet")
+        if errors:
+            item['errors'] = errors
+        results.append(item)
+
+    return {
+        'as_of_date': start.strftime("%Y-%m-%d"),
+        'exit_date': exit_target.strftime("%Y-%m-%d"),
+        'lookback_years': lookback_years,
+        'forward_months': forward_months,
+        'results': results,
+        'summary': [_summarize(s, tickers, totals[:, k], returns) for k, s in enumerate(weight_sets)],
+    }
@@ -0,0 +1,188 @@
+"""
+Regression check and benchmark for backtest.run_backtest.
+
+Builds synthetic EPS and balance sheet files for n tickers (quarterly and
+annual reporters, some loss-making) and synthetic prices (bench_value_pe),
+runs a backtest, then scores every ticker again with the single-ticker
+value_PE_avg, score_peg and score_debt_to_equity on copies of the files cut at
+the start date, with prices cut the day before it. The scores must match, and
+the returns must match the closes around the start and exit dates.
+
+Then runs backtests through the real price cache, against a stub of the Yahoo
+download, and checks each ticker is requested at most once per cold cache and
+never again while the cache is fresh: not for a holding period that hasn't
+ended (so no bar exists at its end yet), and not for a start date older than
+the cached history, which is reported as missing prices instead.
+
+Usage: python bench_backtest.py [n_tickers] [start_date]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backtest
+import cache_utils
+import finance_plots
+import valuation
+from bench_value_pe import synthetic_prices
+
+WEIGHT_SETS = [
+    {'name': 'Default', 'pe': 70, 'peg': 20, 'debt': 10},
+    {'name': 'Growth', 'pe': 20, 'peg': 70, 'debt': 10},
+    {'name': 'Balance sheet', 'pe': 30, 'peg': 20, 'debt': 50},
+]
+
+
+def write_files(directory, tickers, before=None):
+    """Synthetic EPS / balance files (only rows dated before `before`, if given). Returns their paths."""
+    quarters = pd.date_range(end="2025-12-31", periods=40, freq="QE")
+    years = pd.date_range(end="2025-12-31", periods=10, freq="YE")
+    eps_path, balance_path = os.path.join(directory, "EPS.txt"), os.path.join(directory, "Balance.txt")
+    with open(eps_path, "w") as eps_file, open(balance_path, "w") as balance_file:
+        for n, ticker in enumerate(tickers):
+            t_rng = np.random.default_rng(n)
+            annual = n % 10 == 0
+            dates = years if annual else quarters
+            growth = t_rng.normal(0.03, 0.03)
+            eps = np.exp(np.log(1 + t_rng.random()) + growth * np.arange(len(dates))) * (4 if annual else 1)
+            eps = eps + t_rng.normal(0, 0.3 if n % 7 == 0 else 0.05, len(dates))
+            eps_file.write(f"{ticker}\n")
+            for d, v in zip(dates[::-1], eps[::-1]):
+                if before is None or d < before:
+                    eps_file.write(f"{d:%Y-%m-%d}\t${v:.2f}\n")
+            eps_file.write("END\n\n")
+            if n % 13 == 5:
+                continue  # No balance sheet
+            # Drawn up front so the cut file keeps the same values as the full one
+            debt, equity = t_rng.integers(0, 40000, len(years)), t_rng.integers(-2000, 50000, len(years))
+            balance_file.write(f"{ticker}\n")
+            for d, b, e in zip(years[::-1], debt, equity):
+                if before is None or d < before:
+                    balance_file.write(f"{d:%Y-%m-%d}\tDebt:{b}\tEquity:{e}\n")
+            balance_file.write("END\n\n")
+    return eps_path, balance_path
+
+
+def check_price_requests(tickers, prices, eps_file, balance_file):
+    """Yahoo requests made by cold and warm backtests over the real price cache. Returns the cold count."""
+    requests = []
+
+    def fake_fetch(ticker, query):
+        requests.append(ticker)
+        return prices.get(ticker, pd.DataFrame())
+
+    fetch, cwd = finance_plots._fetch_yahoo_closes, os.getcwd()
+    finance_plots._fetch_yahoo_closes = fake_fetch
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)  # The price cache lives under ./cache
+            cache_utils.clear_cache()
+            last_bar = max(df.index[-1] for df in prices.values())
+            recent = (last_bar - pd.DateOffset(months=1)).strftime("%Y-%m-%d")  # Holding period not over
+            backtest.run_backtest(tickers, recent, 2, 12, eps_filename=eps_file, balance_filename=balance_file)
+            assert sorted(requests) == sorted(tickers), "each ticker must be requested exactly once"
+            cold = len(requests)
+
+            old_start = (min(df.index[0] for df in prices.values()) - pd.DateOffset(years=1)).strftime("%Y-%m-%d")
+            result = backtest.run_backtest(tickers, old_start, 2, 12, eps_filename=eps_file, balance_filename=balance_file)
+            backtest.run_backtest(tickers, recent, 2, 12, eps_filename=eps_file, balance_filename=balance_file)
+            assert len(requests) == cold, "a fresh cache must not be downloaded again"
+            assert all("No price data before the start date" in item["errors"] for item in result["results"])
+            cache_utils.clear_cache()
+    finally:
+        finance_plots._fetch_yahoo_closes = fetch
+        os.chdir(cwd)
+    return cold
+
+
+def close_on_or_before(df, day):
+    df = df[df.index <= day]
+    return (df.index[-1], float(df["Close"].iloc[-1])) if not df.empty else (None, None)
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    start = pd.Timestamp(sys.argv[2] if len(sys.argv) > 2 else "2023-06-15")
+    lookback, forward = 2, 12
+    # Manual-file tickers are alphabetic
+    tickers = ["".join(chr(65 + n // 26 ** k % 26) for k in range(3)) for n in range(n_tickers)]
+    prices = synthetic_prices(tickers[:-3])  # The last tickers have no prices
+
+    def price_range(ticker, start_date, end_date):
+        df = prices.get(ticker)
+        return pd.DataFrame() if df is None else df.loc[start_date:end_date]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        eps_file, balance_file = write_files(tmp, tickers[:50])
+        cold = check_price_requests(tickers[:50], prices, eps_file, balance_file)
+
+    backtest._get_price_data = price_range
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.mkdir(os.path.join(tmp, "full"))
+        os.mkdir(os.path.join(tmp, "cut"))
+        eps_file, balance_file = write_files(os.path.join(tmp, "full"), tickers)
+        cut_eps, cut_balance = write_files(os.path.join(tmp, "cut"), tickers, before=start)
+
+        backtest.run_backtest(tickers[:5], start, lookback, forward, WEIGHT_SETS, eps_file, balance_file)  # Warm the parse
+        began = time.perf_counter()
+        result = backtest.run_backtest(tickers, start.strftime("%Y-%m-%d"), lookback, forward, WEIGHT_SETS,
+                                       eps_filename=eps_file, balance_filename=balance_file)
+        t_batch = time.perf_counter() - began
+
+        # --- Reference: the single-ticker scorers on the data known before the start ---
+        def price_before(ticker, years):
+            df = prices.get(ticker)
+            if df is None:
+                return pd.DataFrame()
+            df = df[df.index < start]
+            return df[df.index >= df.index[-1] - pd.DateOffset(years=years)]
+
+        valuation._get_price_data = price_before
+        began = time.perf_counter()
+        checked = 0
+        for item in result["results"]:
+            ticker = item["ticker"]
+            try:
+                pe = valuation.value_PE_avg(ticker, years=lookback, filename=cut_eps)[0] * 100
+            except ValueError:
+                pe = None
+            peg, peg_details = valuation.score_peg(ticker, years=lookback, filename=cut_eps)
+            peg = None if peg_details.get("error") in ("No price data", "No EPS data") else peg * 100
+            try:
+                de = valuation.score_debt_to_equity(ticker, years=lookback, filename=cut_balance)[0] * 100
+            except ValueError:
+                de = None
+            for name, expected, got in (("pe", pe, item["pe_score"]), ("peg", peg, item["peg_score"]),
+                                         ("de", de, item["de_score"])):
+                assert (expected is None) == (got is None), (ticker, name, expected, got)
+                assert expected is None or np.isclose(expected, got, rtol=1e-12, atol=1e-12), (ticker, name, expected, got)
+
+            if ticker in prices:
+                entry_date, entry = close_on_or_before(prices[ticker], start - pd.Timedelta(days=1))
+                exit_date, exit_ = close_on_or_before(prices[ticker], start + pd.DateOffset(months=forward))
+                assert item["entry_date"] == f"{entry_date:%Y-%m-%d}" and item["exit_date"] == f"{exit_date:%Y-%m-%d}"
+                assert np.isclose(item["return_pct"], (exit_ / entry - 1) * 100)
+            else:
+                assert item["return_pct"] is None
+            checked += 1
+        t_single = time.perf_counter() - began
+
+    scored = sum(item["pe_score"] is not None for item in result["results"])
+    print(f"Price cache: {cold} Yahoo requests for 50 cold tickers, none for warm reruns")
+    print(f"Identical scores and returns for {checked} tickers ({scored} with a P/E score) as of {start:%Y-%m-%d}")
+    print(f"run_backtest, {len(WEIGHT_SETS)} weight sets: {t_batch:6.2f} s   "
+          f"single-ticker scorers alone: {t_single:6.2f} s   ({t_single / t_batch:.1f}x)")
+    for summary in result["summary"]:
+        print(f"  {summary['name']:<14} rank IC {summary['rank_ic']:+.3f}   top {summary['top_return_pct']:+6.2f}%   "
+              f"bottom {summary['bottom_return_pct']:+6.2f}%   all {summary['avg_return_pct']:+6.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Regression check and benchmark for the batch scorers in valuation.py.
+
+Scores every ticker of DATA/EPS_manual.txt and DATA/Balance_manual.txt (plus
+one unknown ticker) with value_PE_avg, score_debt_to_equity and score_peg one
+at a time and with their *_batch counterparts, asserts the results are
+identical, then times both. Prices are synthetic random walks with ragged
+start/end dates and missing days per ticker, so no network access is needed.
+
+Usage: python bench_batch_scoring.py [eps_filename] [balance_filename]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import valuation
+from bench_value_pe import synthetic_prices
+from fundamentals import get_balance_data, get_eps_data
+
+LOOKBACKS = (1, 2, 3, 5)
+
+
+def ragged(prices, seed=7):
+    """Give every ticker its own first/last trading day and ~10% missing days."""
+    rng = np.random.default_rng(seed)
+    out = {}
+    for ticker, df in prices.items():
+        keep = rng.random(len(df)) > 0.1
+        keep[:rng.integers(0, 2000)] = False
+        keep[len(df) - rng.integers(0, 300):] = False
+        out[ticker] = df[keep]
+    return out
+
+
+def _outcome(fn, ticker, **kwargs):
+    try:
+        return fn(ticker, **kwargs)
+    except Exception as e:
+        return e
+
+
+def _same(a, b):
+    if isinstance(a, Exception) or isinstance(b, Exception):
+        return type(a) is type(b) and str(a) == str(b)
+    if isinstance(a, tuple):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    return a == b
+
+
+def main():
+    eps_filename = sys.argv[1] if len(sys.argv) > 1 else "DATA/EPS_manual.txt"
+    balance_filename = sys.argv[2] if len(sys.argv) > 2 else "DATA/Balance_manual.txt"
+    known = list(dict.fromkeys(list(get_eps_data(eps_filename)) + list(get_balance_data(balance_filename))))
+    tickers = known + ["NOSUCHTICKER"]
+    prices = ragged(synthetic_prices(known))
+
+    def price_data(ticker, years):
+        df = prices.get(ticker)
+        if df is None:
+            return pd.DataFrame()
+        return df[df.index >= df.index[-1] - pd.DateOffset(years=years)]
+
+    valuation._get_price_data = price_data
+
+    scorers = [
+        ("value_PE_avg", valuation.value_PE_avg, valuation.value_PE_avg_batch, eps_filename),
+        ("score_debt_to_equity", valuation.score_debt_to_equity, valuation.score_debt_to_equity_batch, balance_filename),
+        ("score_peg", valuation.score_peg, valuation.score_peg_batch, eps_filename),
+    ]
+
+    for name, single, batch, filename in scorers:
+        for years in LOOKBACKS:
+            results = batch(tickers, years=years, filename=filename)
+            for ticker in tickers:
+                expected = _outcome(single, ticker, years=years, filename=filename)
+                assert _same(expected, results[ticker]), (name, years, ticker, expected, results[ticker])
+    print(f"Identical results for {len(tickers)} tickers x {len(LOOKBACKS)} lookbacks x {len(scorers)} scorers")
+
+    for name, single, batch, filename in scorers:
+        best_single = best_batch = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            for ticker in tickers:
+                _outcome(single, ticker, years=2, filename=filename)
+            best_single = min(best_single, time.perf_counter() - start)
+            start = time.perf_counter()
+            batch(tickers, years=2, filename=filename)
+            best_batch = min(best_batch, time.perf_counter() - start)
+        print(f"{name:22s} per-ticker {best_single * 1000:7.1f} ms   batch {best_batch * 1000:7.1f} ms"
+              f"   ({best_single / best_batch:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
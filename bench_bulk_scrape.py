@@ -0,0 +1,89 @@
+"""
+Benchmark populating a set's fundamentals: per-ticker scrapes and appends (what
+the browser used to drive) vs one bulk_scrape.fetch_bulk call.
+
+Runs against the fixture pages in fixtures/stockanalysis, served locally with a
+fixed latency per request, writing to throwaway files, so no network access is
+needed. Both runs must write the same blocks. A second bulk run has the server
+fail the first request for every few URLs with 503 to check that retries recover
+them all.
+
+Usage: python bench_bulk_scrape.py [latency_ms] [max_in_flight]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bulk_scrape
+import scraper
+
+
+def blocks(filename):
+    """{ticker: [lines]} of a manual data file."""
+    result, ticker = {}, None
+    for line in Path(filename).read_text().splitlines():
+        if not line.strip():
+            continue
+        if line == "END":
+            ticker = None
+        elif ticker is None:
+            ticker = line
+            result[ticker] = []
+        else:
+            result[ticker].append(line)
+    return result
+
+
+def main():
+    latency = (int(sys.argv[1]) if len(sys.argv) > 1 else 100) / 1000
+    max_in_flight = int(sys.argv[2]) if len(sys.argv) > 2 else bulk_scrape.MAX_IN_FLIGHT
+    # The stub has no rate limit to respect; the site keeps MIN_REQUEST_INTERVAL
+    scraper.MIN_REQUEST_INTERVAL = 0
+
+    tickers = sorted(p.name.upper() for p in (bulk_scrape.FIXTURES_DIR / "stocks").iterdir()) + ["MISSING"]
+    server, base_url = bulk_scrape.serve_fixtures(latency=latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {name: os.path.join(tmp, f"{name}.txt") for name in
+                 ("serial_eps", "serial_balance", "bulk_eps", "bulk_balance", "retry_eps", "retry_balance")}
+
+        start = time.perf_counter()
+        for ticker in tickers:
+            lines, _ = scraper.fetch_eps_data(ticker, base_url=base_url)
+            if lines is not None:
+                scraper.append_to_file(ticker, lines, filename=files["serial_eps"])
+            lines, _ = scraper.fetch_balance_sheet(ticker, base_url=base_url)
+            if lines is not None:
+                scraper.append_to_file(ticker, lines, filename=files["serial_balance"])
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = bulk_scrape.fetch_bulk(tickers, eps_filename=files["bulk_eps"], balance_filename=files["bulk_balance"],
+                                         base_url=base_url, max_in_flight=max_in_flight)
+        bulk = time.perf_counter() - start
+        server.shutdown()
+
+        assert blocks(files["serial_eps"]) == blocks(files["bulk_eps"])
+        assert blocks(files["serial_balance"]) == blocks(files["bulk_balance"])
+
+        server, base_url = bulk_scrape.serve_fixtures(latency=latency, fail_every=4)
+        retried = bulk_scrape.fetch_bulk(tickers, eps_filename=files["retry_eps"], balance_filename=files["retry_balance"],
+                                         base_url=base_url, max_in_flight=max_in_flight, backoff=0.01)
+        server.shutdown()
+        assert [r["success"] for r in retried] == [r["success"] for r in summary]
+        assert blocks(files["retry_eps"]) == blocks(files["bulk_eps"])
+
+    ok = sum(r["success"] for r in summary)
+    print(f"{len(tickers)} tickers x 2 statements ({ok} found), {latency * 1000:.0f} ms stub latency, "
+          f"max {max_in_flight} in flight")
+    print(f"serial     {serial * 1000:8.1f} ms")
+    print(f"bulk       {bulk * 1000:8.1f} ms   ({serial / bulk:4.1f}x)")
+    print("same blocks written; first request of every 4th URL failing with 503 recovered by retries")
+
+
+if __name__ == "__main__":
+    main()
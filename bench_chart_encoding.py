@@ -0,0 +1,75 @@
+"""
+Payload size and encode time of the P/E chart encodings in chart_encoding.py.
+
+Encodes a synthetic 5-year daily P/E chart per ticker (with a few gaps, like
+a ticker's first quarters without TTM EPS) as point lists and as columnar
+arrays, checks the columnar form decodes back to the same points, and prints
+JSON size raw and gzipped, plus serialization time, for a 25-ticker batch.
+
+Usage: python bench_chart_encoding.py [n_tickers]
+"""
+import gzip
+import json
+import sys
+import time
+
+import numpy as np
+
+import chart_encoding
+from bench_value_pe import synthetic_prices
+
+
+def chart(df, rng):
+    dates = df.index[-1260:].to_numpy(dtype="datetime64[ns]")
+    price = df["Close"].to_numpy()[-1260:]
+    pe = price / rng.uniform(1, 5)
+    pe[:rng.integers(0, 200)] = np.nan
+    pe[rng.integers(300, 900):][:rng.integers(0, 60)] = np.nan
+    return dates, price, pe
+
+
+def encode_points(dates, price, pe):
+    return {
+        'pe_ttm': chart_encoding.points(dates, pe),
+        'pe_forward': None,
+        'price': chart_encoding.points(dates, price),
+    }
+
+
+def decode_columnar(encoded):
+    """Point lists back from the columnar encoding (what the frontend decoder does)."""
+    days = np.datetime64(encoded['start'], 'ns') + np.array(encoded['days']) * np.timedelta64(1, 'D')
+    pe = np.full(len(days), np.nan)
+    missing = np.zeros(len(days), dtype=bool)
+    for start, length in encoded['pe_ttm']['gaps']:
+        missing[start:start + length] = True
+    pe[~missing] = encoded['pe_ttm']['values']
+    return encode_points(days, np.array(encoded['price']), pe)
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    rng = np.random.default_rng(3)
+    charts = [chart(df, rng) for df in synthetic_prices([f"T{i:03d}" for i in range(n_tickers)]).values()]
+
+    for dates, price, pe in charts:
+        assert decode_columnar(chart_encoding.columnar(dates, price, pe_ttm=pe, pe_forward=None)) == \
+            encode_points(dates, price, pe)
+    print(f"Columnar round-trips to the same points for {n_tickers} charts")
+
+    encoders = [
+        ("points", lambda d, p, e: encode_points(d, p, e)),
+        ("columnar", lambda d, p, e: chart_encoding.columnar(d, p, pe_ttm=e, pe_forward=None)),
+    ]
+    for name, encode in encoders:
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            body = json.dumps([encode(*c) for c in charts]).encode()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:9s} {len(body) / 1024:8.1f} KiB   gzip {len(gzip.compress(body, 6)) / 1024:7.1f} KiB"
+              f"   encode+dumps {best * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Regression check and benchmark for downsample.py.
+
+Checks lttb_indices against a straightforward point-by-point LTTB, checks that
+chart_indices keeps every series' extremes and gap edges, then times both
+methods on 10-year daily series and reports the point reduction.
+
+Usage: python bench_downsample.py [max_points]
+"""
+import sys
+import time
+
+import numpy as np
+
+from downsample import chart_indices, lttb_indices, minmax_indices
+
+
+def reference_lttb(x, y, n):
+    """Textbook LTTB, one bucket at a time."""
+    size = len(y)
+    every = (size - 2) / (n - 2)
+    a = 0
+    selected = [0]
+    for i in range(n - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        if i == n - 3:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            next_end = min(int(np.floor((i + 2) * every)) + 1, size)
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        selected.append(a)
+    selected.append(size - 1)
+    return np.array(selected)
+
+
+def main():
+    max_points = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    rng = np.random.default_rng(11)
+
+    for size, n in [(100, 10), (977, 53), (2520, 250), (5000, 1000)]:
+        x = np.cumsum(rng.integers(1, 4, size)).astype(np.float64)
+        y = np.cumsum(rng.normal(size=size))
+        assert np.array_equal(reference_lttb(x, y, n), lttb_indices(x, y, n)), (size, n)
+    print("lttb_indices matches the reference LTTB")
+
+    days = np.cumsum(rng.integers(1, 4, 2520))
+    price = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(days))))
+    pe = price / np.repeat(rng.uniform(0.5, 3, len(days) // 63 + 1), 63)[:len(days)]
+    pe[:190] = np.nan
+    pe[1400:1460] = np.nan
+
+    for method in ("lttb", "minmax"):
+        keep = chart_indices(days, (price, pe), max_points, method)
+        for values in (price, pe):
+            valid = ~np.isnan(values)
+            assert np.nanmax(values[keep]) == np.nanmax(values) and np.nanmin(values[keep]) == np.nanmin(values)
+            edges = np.flatnonzero(np.diff(valid.astype(np.int8)))
+            assert np.isin(edges, keep).all() and np.isin(edges + 1, keep).all()
+
+        best = float("inf")
+        for _ in range(20):
+            start = time.perf_counter()
+            chart_indices(days, (price, pe), max_points, method)
+            best = min(best, time.perf_counter() - start)
+        print(f"{method:6s} {len(days)} -> {len(keep)} bars ({len(days) / len(keep):4.1f}x fewer)"
+              f"   {best * 1000:6.2f} ms per chart")
+
+    y = np.cumsum(rng.normal(size=100000))
+    for name, fn in (("lttb", lambda: lttb_indices(np.arange(len(y), dtype=np.float64), y, 1000)),
+                     ("minmax", lambda: minmax_indices(y, 1000))):
+        start = time.perf_counter()
+        fn()
+        print(f"{name:6s} 100000 -> 1000 points   {(time.perf_counter() - start) * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
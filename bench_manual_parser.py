@@ -0,0 +1,183 @@
+"""
+Benchmark the single-pass manual file parser against the old line-by-line parsers.
+
+Generates synthetic EPS_manual.txt / Balance_manual.txt files with 5,000 tickers
+(40 quarters each) in a temp directory, checks both parsers agree, then times them.
+For EPS, "single-pass" includes building every per-ticker frame, like the legacy
+parser did; the legacy balance parser produced plain dicts, so there it is the
+parse plus the lazy TickerFrames mapping the fundamentals store serves. "arrays
+only" is the columnar parse the fundamentals store pays up front. The new parser
+must beat the legacy one on both files.
+
+Usage: python bench_manual_parser.py [n_tickers] [quarters]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from manual_parser import TickerFrames, parse_balance_file, parse_eps_file, to_frames
+
+
+def legacy_load_manual_eps(filename):
+    """The per-block parser that used to live in valuation.py."""
+    eps_data = {}
+    current_ticker = None
+    rows = []
+
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line == "END":
+                if current_ticker and rows:
+                    df = pd.DataFrame(rows, columns=["Date", "EPS"])
+                    df["Date"] = pd.to_datetime(df["Date"])
+                    df["EPS"] = df["EPS"].replace(r"[\$,]", "", regex=True).astype(float)
+                    df = df.sort_values("Date").drop_duplicates("Date", keep="last")
+                    df = df.set_index("Date").sort_index()
+                    eps_data[current_ticker] = df
+                current_ticker, rows = None, []
+                continue
+            if line.isalpha():
+                current_ticker = line.strip()
+                rows = []
+            else:
+                parts = line.split()
+                if len(parts) >= 2:
+                    rows.append([parts[0], parts[1]])
+    return eps_data
+
+
+def legacy_load_manual_balance_sheet(filename):
+    """The dict-of-dicts balance parser that used to live in valuation.py."""
+    data = {}
+    current_ticker = None
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line == "END":
+                current_ticker = None
+                continue
+            if line.isalpha():
+                current_ticker = line
+                data[current_ticker] = {}
+            else:
+                parts = line.split()
+                if current_ticker and len(parts) >= 2:
+                    debt = 0
+                    equity = 0
+                    for p in parts[1:]:
+                        if p.startswith("Debt:"):
+                            debt = float(p.replace("Debt:", "").replace(",", ""))
+                        if p.startswith("Equity:"):
+                            equity = float(p.replace("Equity:", "").replace(",", ""))
+                    data[current_ticker][parts[0]] = {"debt": debt, "equity": equity}
+    return data
+
+
+def _ticker_name(i):
+    name = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        name = chr(65 + r) + name
+    return name
+
+
+def write_synthetic_files(directory, n_tickers, quarters):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(end="2025-12-31", periods=quarters, freq="QE")[::-1].strftime("%Y-%m-%d")
+    eps_path = os.path.join(directory, "EPS_manual.txt")
+    bal_path = os.path.join(directory, "Balance_manual.txt")
+
+    with open(eps_path, "w") as eps_f, open(bal_path, "w") as bal_f:
+        for i in range(n_tickers):
+            ticker = _ticker_name(i)
+            eps = rng.normal(0.5, 0.8, quarters)
+            eps_f.write(f"{ticker}\n")
+            for d, v in zip(dates, eps):
+                eps_f.write(f"{d}\t${v:.2f}\n" if v >= 0 else f"{d}\t-${-v:.2f}\n")
+            eps_f.write("END\n\n")
+
+            bal_f.write(f"{ticker}\n")
+            for n, d in enumerate(dates[: quarters // 4]):
+                debt, equity = rng.integers(100, 100000, 2)
+                if i % 97 == 3 and n == 0:
+                    bal_f.write(f"{d}  Equity:{equity}   Debt:{debt}\n")  # Other order, extra spaces
+                elif i % 89 == 5 and n == 1:
+                    bal_f.write(f"{d}\tDebt:{debt:,}\n")  # No equity
+                else:
+                    bal_f.write(f"{d}\tDebt:{debt:,}\tEquity:{equity}\n")
+            bal_f.write("END\n\n")
+    return eps_path, bal_path
+
+
+def check_long_lines(directory):
+    """Data lines with more tokens than the tokenizer keeps must not be dropped."""
+    path = os.path.join(directory, "long.txt")
+    with open(path, "w") as f:
+        f.write("AAA\n2024-06-30\t$1,234.50 a b c d e f g h\n2024-03-31\t$1.00\nEND\n")
+    old, new = legacy_load_manual_eps(path), to_frames(parse_eps_file(path))
+    pd.testing.assert_frame_equal(old["AAA"], new["AAA"])
+    assert len(new["AAA"]) == 2
+
+    with open(path, "w") as f:
+        f.write("AAA\n2024-06-30\tEquity:7 a Debt:1,005 b c d e f g h\nEND\n")
+    df = to_frames(parse_balance_file(path))["AAA"]
+    assert legacy_load_manual_balance_sheet(path)["AAA"] == {"2024-06-30": {"debt": 1005.0, "equity": 7.0}}
+    assert df.to_numpy().tolist() == [[1005.0, 7.0]]
+
+
+def _time(fn, *args, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    quarters = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    with tempfile.TemporaryDirectory() as tmp:
+        eps_path, bal_path = write_synthetic_files(tmp, n_tickers, quarters)
+        print(f"Synthetic files: {n_tickers} tickers, {quarters} quarters "
+              f"({os.path.getsize(eps_path) / 1e6:.1f} MB EPS, {os.path.getsize(bal_path) / 1e6:.1f} MB balance)")
+
+        check_long_lines(tmp)
+
+        t_old, old = _time(legacy_load_manual_eps, eps_path, repeat=1)
+        t_new, new = _time(lambda p: to_frames(parse_eps_file(p)), eps_path)
+        t_parse, _ = _time(parse_eps_file, eps_path)
+        assert old.keys() == new.keys()
+        for ticker in old:
+            pd.testing.assert_frame_equal(old[ticker], new[ticker])
+        print(f"EPS      legacy {t_old * 1000:9.1f} ms   single-pass {t_new * 1000:8.1f} ms   ({t_old / t_new:5.1f}x)"
+              f"   arrays only {t_parse * 1000:8.1f} ms")
+        assert t_new < t_old, "EPS parse is slower than the legacy parser"
+
+        t_old, old = _time(legacy_load_manual_balance_sheet, bal_path)
+        t_new, new = _time(lambda p: TickerFrames(parse_balance_file(p)), bal_path)
+        t_parse, _ = _time(parse_balance_file, bal_path)
+        assert old.keys() == set(new)
+        for ticker, df in new.items():
+            rows = {d.strftime("%Y-%m-%d"): {"debt": debt, "equity": eq}
+                    for d, debt, eq in zip(df.index, df["Debt"], df["Equity"])}
+            assert rows == old[ticker], ticker
+        print(f"Balance  legacy {t_old * 1000:9.1f} ms   single-pass {t_new * 1000:8.1f} ms   ({t_old / t_new:5.1f}x)"
+              f"   arrays only {t_parse * 1000:8.1f} ms")
+        assert t_new < t_old, "Balance parse is slower than the legacy parser"
+
+
+if __name__ == "__main__":
+    main()
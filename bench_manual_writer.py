@@ -0,0 +1,105 @@
+"""
+Benchmark the manual data files after repeated fetches: append-only blocks (the
+old scraper.append_to_file) vs manual_writer.upsert_blocks.
+
+Starting from a synthetic EPS file, runs `rounds` fetch rounds that each
+rewrite a random 20% of the tickers with their latest quarters, once per
+writer, then compares file sizes and parse times. Both files, and the appended
+file after compact(), must parse to the same table; merge=True must also keep
+the older quarters. Every round also writes an empty block for one ticker,
+which must leave its data alone.
+
+Usage: python bench_manual_writer.py [n_tickers] [rounds]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import manual_writer
+from manual_parser import parse_eps_file
+
+
+def legacy_append(ticker, data_lines, filename):
+    with open(filename, "a") as f:
+        f.write(f"\n{ticker.upper()}\n")
+        for line in data_lines:
+            f.write(f"{line}\n")
+        f.write("END\n")
+
+
+def eps_lines(rng, quarters, end="2025-12-31"):
+    dates = pd.date_range(end=end, periods=quarters, freq="QE")[::-1]
+    return [f"{d:%Y-%m-%d}\t${v:.2f}" for d, v in zip(dates, rng.normal(1.5, 1.0, quarters))]
+
+
+def assert_same(a, b):
+    assert list(a.tickers) == list(b.tickers)
+    assert np.array_equal(a.offsets, b.offsets)
+    assert np.array_equal(a.dates, b.dates)
+    assert np.array_equal(a.values, b.values)
+
+
+def time_parse(filename, repeats=3):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        table = parse_eps_file(filename)
+    return (time.perf_counter() - start) / repeats, table
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = np.random.default_rng(0)
+    tickers = ["".join(chr(65 + int(c)) for c in rng.integers(0, 26, 5)) for _ in range(n_tickers)]
+    tickers = list(dict.fromkeys(tickers))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        appended, upserted, merged = (os.path.join(tmp, f"{name}.txt") for name in ("append", "upsert", "merge"))
+        with open(appended, "w") as f:
+            for ticker in tickers:
+                f.write(f"{ticker}\n" + "".join(f"{line}\n" for line in eps_lines(rng, 40)) + "END\n\n")
+        shutil.copy(appended, upserted)
+        shutil.copy(appended, merged)
+
+        append_time = upsert_time = 0.0
+        for _ in range(rounds):
+            batch = {t: eps_lines(rng, 20) for t in rng.choice(tickers, len(tickers) // 5, replace=False)}
+            batch[tickers[0]] = []  # A fetch that found nothing must not wipe the ticker's data
+            start = time.perf_counter()
+            for ticker, lines in batch.items():
+                legacy_append(ticker, lines, appended)
+            append_time += time.perf_counter() - start
+            start = time.perf_counter()
+            ok, error = manual_writer.upsert_blocks(batch, upserted)
+            upsert_time += time.perf_counter() - start
+            assert ok, error
+            manual_writer.upsert_blocks(batch, merged, merge=True)
+
+        append_parse, append_table = time_parse(appended)
+        upsert_parse, upsert_table = time_parse(upserted)
+        assert_same(append_table, upsert_table)
+
+        merged_table = parse_eps_file(merged)
+        assert len(merged_table.dates) == len(tickers) * 40  # Older quarters kept, refetched ones overwritten
+
+        append_size, upsert_size = os.path.getsize(appended), os.path.getsize(upserted)
+        stats = manual_writer.compact(appended)
+        assert_same(parse_eps_file(appended), upsert_table)
+
+    print(f"{len(tickers)} tickers x 40 quarters, {rounds} rounds refetching 20% of them (20 quarters each)")
+    print(f"append-only  {append_size / 1e6:6.2f} MB  parse {append_parse * 1000:7.1f} ms  "
+          f"writes {append_time * 1000:7.1f} ms  ({stats['blocks_before']} blocks)")
+    print(f"upsert       {upsert_size / 1e6:6.2f} MB  parse {upsert_parse * 1000:7.1f} ms  "
+          f"writes {upsert_time * 1000:7.1f} ms  ({len(tickers)} blocks)")
+    print(f"compact      {stats['bytes_before'] / 1e6:6.2f} MB -> {stats['bytes_after'] / 1e6:.2f} MB, same table")
+
+
+if __name__ == "__main__":
+    main()
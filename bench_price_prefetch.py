@@ -0,0 +1,90 @@
+"""
+Benchmark cold batch price loading: serial per-ticker fetches vs prefetch_prices.
+
+Runs against a local stub of the Yahoo chart API that adds a fixed latency per
+request, using a throwaway cache directory, so no network access is needed.
+
+Usage: python bench_price_prefetch.py [n_tickers] [latency_ms]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cache_utils
+import price_fetch
+from finance_plots import _get_price_data_yahoo
+
+
+def make_stub_server(latency):
+    """Threaded stub of /v8/finance/chart/<ticker> returning 10 years of synthetic closes."""
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=2520)
+    timestamps = [int(d.timestamp()) + 14 * 3600 for d in dates]
+    closes = [100.0 + (i % 50) for i in range(len(dates))]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse shows up
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            query = parse_qs(urlparse(self.path).query)
+            n = len(timestamps) if "range" in query else 5
+            body = json.dumps({"chart": {"result": [{
+                "meta": {"regularMarketPrice": closes[-1]},
+                "timestamp": timestamps[-n:],
+                "indicators": {"quote": [{"close": closes[-n:]}]},
+            }]}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    n_tickers = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 150) / 1000
+
+    server = make_stub_server(latency)
+    price_fetch.YAHOO_CHART_URL = f"http://127.0.0.1:{server.server_port}/v8/finance/chart/{{ticker}}"
+    tickers = [f"T{i:03d}" for i in range(n_tickers)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+
+        start = time.perf_counter()
+        for ticker in tickers:
+            _get_price_data_yahoo(ticker, years=2)
+        serial = time.perf_counter() - start
+
+        cache_utils.clear_cache()
+        start = time.perf_counter()
+        stats = price_fetch.prefetch_prices(tickers, years=2)
+        for ticker in tickers:
+            _get_price_data_yahoo(ticker, years=2)
+        concurrent = time.perf_counter() - start
+
+    server.shutdown()
+    print(f"{n_tickers} cold tickers, {latency * 1000:.0f} ms stub latency, "
+          f"{price_fetch.MAX_WORKERS} workers / {price_fetch.MAX_PER_HOST} per host")
+    print(f"serial     {serial * 1000:8.1f} ms")
+    print(f"prefetch   {concurrent * 1000:8.1f} ms   ({serial / concurrent:4.1f}x)   {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Regression check and benchmark for memoized scores, ETags and batch version tokens.
+
+Seeds a throwaway price cache with synthetic closes (bench_value_pe) for every
+ticker of the EPS file, then through the Flask test client:
+
+- times a cold /api/batch/value_pe_avg against a revalidation that sends the
+  returned versions back (every ticker must come back unchanged)
+- revises the last closes of every other ticker the way an incremental
+  refresh does (same last date, same bar count) and checks that exactly those
+  tickers lose their ETag match and batch version, and that their new scores
+  equal an uncached value_PE_avg
+
+Usage: python bench_score_cache.py [eps_filename]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cache_utils
+import valuation
+from app import app
+from bench_value_pe import synthetic_prices
+from fundamentals import get_eps_data
+from price_store import PriceFrameCache, PriceStore
+
+
+def main():
+    eps_filename = sys.argv[1] if len(sys.argv) > 1 else "DATA/EPS_manual.txt"
+    tickers = list(get_eps_data(eps_filename))
+    years = 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_utils._store = PriceStore(Path(tmp))
+        cache_utils._memory = PriceFrameCache(cache_utils.MEMORY_CACHE_MAX_BYTES, cache_utils.CACHE_TTL_HOURS * 3600)
+        prices = synthetic_prices(tickers)
+        for ticker, df in prices.items():
+            cache_utils.save_to_cache(ticker, df)
+
+        client = app.test_client()
+        body = {"tickers": tickers, "years": years, "filename": eps_filename}
+
+        start = time.perf_counter()
+        cold = client.post("/api/batch/value_pe_avg", json=body).get_json()["results"]
+        t_cold = time.perf_counter() - start
+        versions = {r["ticker"]: r["version"] for r in cold if "version" in r}
+
+        start = time.perf_counter()
+        warm = client.post("/api/batch/value_pe_avg", json=dict(body, versions=versions)).get_json()["results"]
+        t_warm = time.perf_counter() - start
+        assert all(r.get("unchanged") for r in warm if r["ticker"] in versions)
+
+        url = f"/api/value_pe_avg/{{}}?years={years}&filename={eps_filename}"
+        etags = {}
+        for ticker in versions:
+            response = client.get(url.format(ticker))
+            etags[ticker] = response.headers["ETag"]
+            assert client.get(url.format(ticker), headers={"If-None-Match": etags[ticker]}).status_code == 304
+
+        # Revise the last closes in place, like an incremental refresh over the overlap window
+        revised = set(list(versions)[::2])
+        for ticker in revised:
+            tail = prices[ticker].iloc[-3:].copy()
+            tail["Close"] *= 1.05
+            cache_utils.update_cache(ticker, tail)
+            assert len(cache_utils.load_from_cache(ticker)) == len(prices[ticker])
+
+        for ticker in versions:
+            response = client.get(url.format(ticker), headers={"If-None-Match": etags[ticker]})
+            assert (response.status_code == 200) == (ticker in revised), (ticker, response.status_code)
+
+        again = client.post("/api/batch/value_pe_avg", json=dict(body, versions=versions)).get_json()["results"]
+        for result in again:
+            ticker = result["ticker"]
+            if ticker not in versions:
+                continue
+            assert bool(result.get("unchanged")) == (ticker not in revised), ticker
+            if ticker in revised:
+                score, _ = valuation.value_PE_avg(ticker, years=years, filename=eps_filename)
+                assert np.isclose(result["score"], score, rtol=0, atol=1e-12), (ticker, result["score"], score)
+
+    print(f"{len(tickers)} tickers, {len(revised)} with revised closes: ETags and versions moved for exactly those")
+    print(f"batch cold {t_cold * 1000:7.1f} ms   revalidate {t_warm * 1000:7.1f} ms   ({t_cold / t_warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark page parsing in scraper.py: the previous BeautifulSoup -> str(soup)
+-> pandas.read_html -> iterrows() path vs find_rows (lxml, and the
+BeautifulSoup fallback used when lxml is missing).
+
+Parses every page in fixtures/stockanalysis and checks that all three give
+the same data lines.
+
+Usage: python bench_scraper_parse.py [repeats]
+"""
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from io import StringIO
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scraper
+from bulk_scrape import FIXTURES_DIR
+
+DATE = re.compile(r'([A-Za-z]{3}\s+\d{1,2},\s+\d{4})')
+
+
+def _legacy_tables(html):
+    for df in pd.read_html(StringIO(str(BeautifulSoup(html, 'html.parser')))):
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = [' '.join(col).strip() for col in df.columns.values]
+        yield df.reset_index(drop=True)
+
+
+def legacy_parse_eps(html):
+    """EPS lines the way parse_eps_page used to find them (quarterly and annual columns)."""
+    for df in _legacy_tables(html):
+        for _, row in df.iterrows():
+            label = str(row.iloc[0]).lower()
+            if "eps (diluted)" in label or "earnings per share" in label:
+                lines = []
+                for col, val in zip(df.columns[1:], row.iloc[1:]):
+                    match = DATE.search(str(col))
+                    val = str(val).strip()
+                    if "TTM" in str(col).upper() or not match or val in ('-', '') or "nan" in val.lower():
+                        continue
+                    dt = datetime.strptime(match.group(1), "%b %d, %Y")
+                    if dt <= datetime.now():
+                        lines.append(f"{dt:%Y-%m-%d}\t${val.replace('$', '').replace(',', '')}")
+                return lines
+    return None
+
+
+def legacy_parse_balance(html):
+    """Debt/equity lines the way parse_balance_page used to find them."""
+    for df in _legacy_tables(html):
+        debt = equity = None
+        for _, row in df.iterrows():
+            label = str(row.iloc[0]).lower().strip()
+            if "total debt" in label:
+                debt = row
+            if "shareholders' equity" in label or label == "total equity":
+                equity = row
+            if debt is not None and equity is not None:
+                lines = []
+                for i, col in enumerate(df.columns[1:], start=1):
+                    match = DATE.search(str(col))
+                    d = str(debt.iloc[i]).strip().replace('$', '').replace(',', '')
+                    e = str(equity.iloc[i]).strip().replace('$', '').replace(',', '')
+                    if match and d != '-' and e != '-':
+                        lines.append(f"{datetime.strptime(match.group(1), '%b %d, %Y'):%Y-%m-%d}\tDebt:{d}\tEquity:{e}")
+                return lines
+    return None
+
+
+def time_parse(pages, eps_fn, balance_fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        out = [(balance_fn if kind == "balance" else eps_fn)(html) for kind, html in pages]
+    return (time.perf_counter() - start) / repeats, out
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    pages = [("balance" if "balance-sheet" in str(p) else "eps", p.read_text(encoding="utf-8"))
+             for p in sorted(FIXTURES_DIR.rglob("index.html"))]
+    size = sum(len(html) for _, html in pages)
+
+    legacy, legacy_out = time_parse(pages, legacy_parse_eps, legacy_parse_balance, repeats)
+    fast, fast_out = time_parse(pages, lambda h: scraper.parse_eps_page(h)[0],
+                                lambda h: scraper.parse_balance_page(h)[0], repeats)
+    lxml_module, scraper.lxml = scraper.lxml, None
+    soup, soup_out = time_parse(pages, lambda h: scraper.parse_eps_page(h)[0],
+                                lambda h: scraper.parse_balance_page(h)[0], repeats)
+    scraper.lxml = lxml_module
+
+    assert fast_out == legacy_out, "find_rows (lxml) differs from the read_html path"
+    assert soup_out == legacy_out, "find_rows (BeautifulSoup) differs from the read_html path"
+
+    print(f"{len(pages)} pages, {size / 1e6:.1f} MB, mean of {repeats} runs")
+    print(f"read_html          {legacy * 1000:8.1f} ms")
+    print(f"find_rows (lxml)   {fast * 1000:8.1f} ms   ({legacy / fast:5.1f}x)")
+    print(f"find_rows (soup)   {soup * 1000:8.1f} ms   ({legacy / soup:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
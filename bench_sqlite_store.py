@@ -0,0 +1,157 @@
+"""
+Benchmark the file backends against sqlite_store on the operations it targets:
+
+- listing a page of backtest snapshots and loading one snapshot, with many
+  large snapshots saved (the old single JSON file vs. snapshot_store's index
+  + gzipped payloads vs. sqlite)
+- saving one set when many users have sets
+- reading one ticker's EPS rows from a cold process (parse the whole text
+  file vs. one index seek)
+- bringing the fundamentals store's EPS table up to date after one ticker
+  is written (reload the whole table vs. re-read the written ticker)
+
+Both backends must return the same snapshots, sets and rows, and the
+refreshed table must match a full reload.
+
+Usage: python bench_sqlite_store.py [n_snapshots] [n_tickers]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fundamentals
+import sqlite_store
+from atomic_files import UserShards, read_json, write_json
+from manual_parser import TickerFrames, parse_eps_file
+from snapshot_store import FileSnapshots, metadata
+
+
+def timed(fn, repeats=5):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def make_snapshot(rng, n, tickers):
+    results = [{"ticker": t, "score": float(rng.random()), "return": float(rng.normal()),
+                "pe": float(rng.random() * 40), "peg": float(rng.random() * 3), "de": float(rng.random())}
+               for t in tickers]
+    return {"id": str(n), "name": f"Run {n}", "created_at": f"2025-01-{n % 28 + 1:02d}T00:00:00",
+            "as_of_date": "2023-01-01", "lookback_years": 2, "forward_months": 12,
+            "tickers": tickers, "weight_sets": [{"name": "Default", "pe": 70, "peg": 20, "debt": 10}],
+            "results": results, "summary": [{"name": "Default", "avg_return": float(rng.normal())}]}
+
+
+def write_eps_file(path, rng, tickers, quarters=40):
+    dates = pd.date_range(end="2025-12-31", periods=quarters, freq="QE")[::-1]
+    with open(path, "w") as f:
+        for ticker in tickers:
+            f.write(f"{ticker}\n")
+            for d, v in zip(dates, rng.normal(1.5, 1.0, quarters)):
+                f.write(f"{d:%Y-%m-%d}\t${v:.2f}\n")
+            f.write("END\n\n")
+
+
+def main():
+    n_snapshots = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_tickers = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = np.random.default_rng(0)
+    # Manual-file tickers are alphabetic
+    universe = ["".join(chr(65 + n // 26 ** k % 26) for k in range(4)) for n in range(n_tickers)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "finance.db")
+        legacy_file = os.path.join(tmp, "backtest_snapshots.json")
+        snapshots = [make_snapshot(rng, n, universe[:500]) for n in range(n_snapshots)]
+        write_json(legacy_file, snapshots, indent=2)
+        files = FileSnapshots(os.path.join(tmp, "backtest_snapshots"), legacy_file=legacy_file)
+        files.count()  # Splits the legacy file
+        rows = sqlite_store.Snapshots(db)
+        for snapshot in snapshots:
+            rows.add(snapshot)
+
+        def legacy_list():
+            # What GET /api/backtest/snapshots used to do: load every snapshot and send them all
+            return read_json(legacy_file, [])
+
+        t_legacy, _ = timed(legacy_list)
+        t_file, listed_file = timed(lambda: files.list(limit=20))
+        t_db, listed_db = timed(lambda: rows.list(limit=20))
+        assert listed_file == listed_db == ([metadata(s) for s in snapshots[::-1][:20]], listed_db[1])
+        print(f"List {n_snapshots} snapshots:  single file {t_legacy * 1e3:7.1f} ms   "
+              f"index {t_file * 1e3:6.2f} ms   sqlite {t_db * 1e3:6.2f} ms (first page of 20)")
+
+        t_file, got_file = timed(lambda: files.get("7"))
+        t_db, got_db = timed(lambda: rows.get("7"))
+        assert got_file == got_db == snapshots[7]
+        payload_bytes = os.path.getsize(files._payload_path("7"))
+        raw_bytes = len(json.dumps({"results": snapshots[7]["results"], "summary": snapshots[7]["summary"]}))
+        print(f"Load one snapshot:           index {t_file * 1e3:6.2f} ms   sqlite {t_db * 1e3:6.2f} ms   "
+              f"payload {raw_bytes / 1024:.0f} KB -> {payload_bytes / 1024:.0f} KB gzipped")
+
+        shards = UserShards(os.path.join(tmp, "sets"))
+        sets = sqlite_store.UserSets(db)
+        for n in range(200):
+            for store in (shards, sets):
+                store.update(f"user{n}", lambda data: data.update({f"set{k}": universe[k:k + 20] for k in range(10)}))
+        add = lambda store: store.update("user7", lambda data: data.update({"new": ["AAPL"]}))[1]
+        t_file, saved_file = timed(lambda: add(shards))
+        t_db, saved_db = timed(lambda: add(sets))
+        assert saved_file == saved_db == sets.load("user7")
+        print(f"Save one set:               files {t_file * 1e3:8.2f} ms   sqlite {t_db * 1e3:8.2f} ms")
+
+        eps_file = os.path.join(tmp, "EPS_manual.txt")
+        write_eps_file(eps_file, rng, universe)
+        missing = os.path.join(tmp, "missing")
+        sqlite_store.migrate(db, missing, missing, os.path.join(tmp, "backtest_snapshots"), legacy_file,
+                             eps_file, missing)
+        ticker = universe[n_tickers // 2]
+        t_file, frame_file = timed(lambda: TickerFrames(parse_eps_file(eps_file))[ticker])
+        t_db, frame_db = timed(lambda: sqlite_store.ticker_rows("eps", ticker, db))
+        assert frame_file.index.equals(frame_db.index) and np.array_equal(frame_file.values, frame_db.values)
+        print(f"One ticker of {n_tickers} (cold): files {t_file * 1e3:8.1f} ms   sqlite {t_db * 1e3:8.2f} ms"
+              f"   ({t_file / t_db:.0f}x)")
+
+        t_db, table = timed(lambda: sqlite_store.load_table("eps", db))
+        assert set(TickerFrames(table)) == set(universe)
+        print(f"Whole EPS table from sqlite: {t_db * 1e3:.1f} ms")
+
+        sqlite_store.DB_FILE = db
+        store = fundamentals.FundamentalsStore()
+        store.eps_data()
+        written = iter(range(1, 1000))
+
+        def write_one():
+            lines = [f"2030-03-31\t${next(written) / 100:.2f}"]
+            ok, error = sqlite_store.write_blocks("eps", {ticker: lines}, merge=True)
+            assert ok, error
+
+        def full_reload():
+            write_one()
+            return TickerFrames(sqlite_store.load_table("eps"))
+
+        def refresh():
+            write_one()
+            return store.eps_data()
+
+        t_full, reloaded = timed(full_reload)
+        t_refresh, refreshed = timed(refresh)
+        reloaded = sqlite_store.load_table("eps")
+        assert list(refreshed) == sorted(universe)
+        for name in ("tickers", "offsets", "dates", "values"):
+            assert np.array_equal(getattr(refreshed.table, name), getattr(reloaded, name)), name
+        assert store.ticker_frame("eps", fundamentals.EPS_FILE, ticker).equals(refreshed[ticker])
+        print(f"Refresh after one write:     reload {t_full * 1e3:7.1f} ms   "
+              f"written tickers only {t_refresh * 1e3:6.1f} ms   ({t_full / t_refresh:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
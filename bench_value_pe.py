@@ -0,0 +1,178 @@
+"""
+Regression check and micro-benchmark for the vectorized value_PE_avg.
+
+Runs the old row-by-row implementation (outer join + ffill + df.apply) and the
+current one for every ticker in DATA/EPS_manual.txt over several lookbacks,
+asserts the scores and details are bit-identical, then times both. Prices are
+a synthetic 10-year random walk per ticker, so no network access is needed.
+
+Usage: python bench_value_pe.py [eps_filename]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import valuation
+from fundamentals import get_eps, get_eps_data
+
+LOOKBACKS = (1, 2, 5)
+
+
+def legacy_value_PE_avg(ticker, years=1, filename="DATA/EPS_manual.txt"):
+    """value_PE_avg as it was before vectorization."""
+    eps = get_eps(ticker, filename)
+    if eps is None:
+        raise ValueError(f"{ticker} not found in {filename}")
+
+    df_eps = eps.copy()
+    if len(df_eps) >= 2:
+        median_gap = pd.Series(df_eps.index).diff().median().days
+        if median_gap > 120:
+            df_eps["TTM_EPS"] = df_eps["EPS"]
+        else:
+            df_eps["TTM_EPS"] = df_eps["EPS"].rolling(4).sum()
+    else:
+        df_eps["TTM_EPS"] = df_eps["EPS"]
+
+    df_price = valuation._get_price_data(ticker, years)
+    if df_price.empty:
+        raise ValueError(f"No price data found for {ticker}")
+
+    df = df_price.join(df_eps["TTM_EPS"], how="outer").ffill()
+    df = df.loc[df_price.index]
+
+    valid_eps_rows = df.dropna(subset=["TTM_EPS", "Close"])
+    if valid_eps_rows.empty:
+        raise ValueError(f"Not enough valid P/E data for {ticker}")
+
+    latest_eps = valid_eps_rows["TTM_EPS"].iloc[-1]
+    latest_price = valid_eps_rows["Close"].iloc[-1]
+    true_current_pe = latest_price / latest_eps if latest_eps != 0 else 999.0
+
+    def calc_pe(row):
+        eps = row["TTM_EPS"]
+        price = row["Close"]
+        if pd.isna(eps) or eps <= 0:
+            return None
+        return price / eps
+
+    df["PE"] = df.apply(calc_pe, axis=1)
+
+    current_date = df.index.max()
+    cutoff = current_date - pd.DateOffset(years=years)
+    df_window = df[df.index >= cutoff].copy()
+    valid_pe_window = df_window.dropna(subset=["PE"])
+
+    if valid_pe_window.empty or latest_eps <= 0:
+        details = {
+            "current_pe": true_current_pe,
+            "avg_pe": 999.0,
+            "min_pe": 999.0,
+            "max_pe": 999.0,
+            "score_avg": 0.0,
+            "score_range": 0.0,
+            "data_points": len(df_window),
+            "data_gaps": valuation.check_data_completeness(ticker, years, filename, "DATA/Balance_manual.txt"),
+            "error": "Negative Earnings (Not Profitable)"
+        }
+        return 0.0, details
+
+    min_pe, max_pe = valid_pe_window["PE"].min(), valid_pe_window["PE"].max()
+    avg_pe = valid_pe_window["PE"].mean()
+
+    if max_pe == min_pe:
+        score_range = 0.5
+    else:
+        score_range = 1 - (true_current_pe - min_pe) / (max_pe - min_pe)
+        score_range = max(0, min(1, score_range))
+
+    if true_current_pe <= avg_pe:
+        score_avg = 0.5 + 0.5 * (avg_pe - true_current_pe) / max(1e-9, avg_pe - min_pe)
+    else:
+        score_avg = 0.5 - 0.5 * (true_current_pe - avg_pe) / max(1e-9, max_pe - avg_pe)
+    score_avg = max(0, min(1, score_avg))
+
+    score = 0.7 * score_avg + 0.3 * score_range
+    details = {
+        "current_pe": true_current_pe,
+        "avg_pe": avg_pe if not pd.isna(avg_pe) else 999.0,
+        "min_pe": min_pe if not pd.isna(min_pe) else 999.0,
+        "max_pe": max_pe if not pd.isna(max_pe) else 999.0,
+        "score_avg": score_avg,
+        "score_range": score_range,
+        "data_points": len(df_window),
+        "data_gaps": valuation.check_data_completeness(ticker, years, filename, "DATA/Balance_manual.txt")
+    }
+    return score, details
+
+
+def synthetic_prices(tickers):
+    """10 years of business-day closes per ticker, seeded by ticker name."""
+    dates = pd.bdate_range(end="2026-01-30", periods=2520, name="Date")
+    prices = {}
+    for ticker in tickers:
+        rng = np.random.default_rng(sum(map(ord, ticker)))
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+        prices[ticker] = pd.DataFrame({"Close": close}, index=dates)
+    return prices
+
+
+def _same(a, b):
+    """Exact equality that also treats NaN == NaN."""
+    if isinstance(a, float) and isinstance(b, float) and np.isnan(a) and np.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+def _run(fn, ticker, years, filename):
+    try:
+        return fn(ticker, years=years, filename=filename)
+    except ValueError as e:
+        return ("error", str(e))
+
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else "DATA/EPS_manual.txt"
+    tickers = list(get_eps_data(filename))
+    prices = synthetic_prices(tickers)
+
+    def price_data(ticker, years):
+        df = prices[ticker]
+        return df[df.index >= df.index[-1] - pd.DateOffset(years=years)]
+
+    valuation._get_price_data = price_data
+
+    checked = 0
+    for ticker in tickers:
+        for years in LOOKBACKS:
+            old = _run(legacy_value_PE_avg, ticker, years, filename)
+            new = _run(valuation.value_PE_avg, ticker, years, filename)
+            assert _same(old[0], new[0]), (ticker, years, old[0], new[0])
+            if isinstance(old[1], dict):
+                assert old[1].keys() == new[1].keys(), (ticker, years)
+                for key in old[1]:
+                    assert _same(old[1][key], new[1][key]), (ticker, years, key, old[1][key], new[1][key])
+            else:
+                assert old == new, (ticker, years, old, new)
+            checked += 1
+    print(f"Identical results for {len(tickers)} tickers x {len(LOOKBACKS)} lookbacks ({checked} calls)")
+
+    for years in LOOKBACKS:
+        timings = []
+        for fn in (legacy_value_PE_avg, valuation.value_PE_avg):
+            best = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                for ticker in tickers:
+                    _run(fn, ticker, years, filename)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best / len(tickers))
+        old_t, new_t = timings
+        print(f"years={years}   legacy {old_t * 1000:7.2f} ms/ticker   vectorized {new_t * 1000:7.2f} ms/ticker"
+              f"   ({old_t / new_t:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
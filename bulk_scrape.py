@@ -0,0 +1,172 @@
+"""
+Bulk EPS / balance sheet scraping for many tickers at once.
+
+    from bulk_scrape import fetch_bulk
+    results = fetch_bulk(["NVDA", "AMD", "MSFT"])              # both statements, written to DATA/
+    results = fetch_bulk(tickers, kinds=["balance"], max_in_flight=4, retries=3)
+
+Pages are downloaded concurrently (at most max_in_flight at a time) over
+scraper.py's shared keep-alive session, which also spaces requests to each host
+min_interval seconds apart. Connection errors, timeouts, 429 and 5xx answers
+are retried with exponential backoff (honouring Retry-After). Parsed results
+are only written once everything is in: one atomic rewrite per data file.
+
+For offline runs, serve the fixture pages in fixtures/stockanalysis with
+serve_fixtures() and pass its base_url (or set SCRAPER_BASE_URL).
+"""
+import functools
+import http.server
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+import scraper
+from fundamentals import BALANCE_FILE, EPS_FILE
+
+SCRAPERS = {"eps": scraper.fetch_eps_data, "balance": scraper.fetch_balance_sheet}
+MAX_IN_FLIGHT = 6
+RETRIES = 2
+BACKOFF = 1.0           # Seconds before the first retry, doubled for each next one
+MAX_BACKOFF = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "stockanalysis"
+
+
+def _retry_delay(response, attempt, backoff):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_BACKOFF)
+    return min(backoff * 2 ** attempt, MAX_BACKOFF)
+
+
+def get_with_retry(url, retries=RETRIES, backoff=BACKOFF, min_interval=None):
+    """
+    scraper.get_page with retries on connection errors, timeouts and retryable
+    statuses. Returns the last response (which may still be an error status);
+    raises the last exception if no attempt got a response.
+    """
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            response = scraper.get_page(url, min_interval=min_interval)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        if attempt == retries:
+            return response
+        time.sleep(_retry_delay(response, attempt, backoff))
+
+
+def scrape_pairs(pairs, base_url=None, max_in_flight=MAX_IN_FLIGHT, retries=RETRIES, backoff=BACKOFF,
+                 min_interval=None, on_result=None) -> list:
+    """
+    Scrape every (kind, ticker) pair concurrently without writing anything.
+    Returns one {"ticker", "kind", "lines", "message"} per pair, in input order
+    ("lines" is None on failure, "message" the error or warning). on_result, if
+    given, is called with each result as it completes.
+    """
+    pairs = list(pairs)
+    get = functools.partial(get_with_retry, retries=retries, backoff=backoff, min_interval=min_interval)
+
+    def run(pair):
+        kind, ticker = pair
+        lines, message = SCRAPERS[kind](ticker, base_url=base_url, get=get)
+        result = {"ticker": ticker, "kind": kind, "lines": lines, "message": message}
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    if not pairs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(pairs))),
+                            thread_name_prefix="bulk-scrape") as executor:
+        return list(executor.map(run, pairs))
+
+
+def commit(results, eps_filename=EPS_FILE, balance_filename=BALANCE_FILE) -> dict:
+    """Write every successful result in one upsert per file. Returns {kind: error or None}."""
+    filenames = {"eps": eps_filename, "balance": balance_filename}
+    errors = {}
+    for kind, filename in filenames.items():
+        blocks = {r["ticker"]: r["lines"] for r in results if r["kind"] == kind and r["lines"] is not None}
+        if blocks:
+            ok, error = scraper.write_blocks(blocks, filename=filename)
+            errors[kind] = None if ok else error
+    return errors
+
+
+def fetch_bulk(tickers, kinds=("eps", "balance"), eps_filename=EPS_FILE, balance_filename=BALANCE_FILE, **options) -> list:
+    """
+    Scrape `kinds` for every ticker (see scrape_pairs for the options) and write
+    the results. Returns one {"ticker", "kind", "success", "error"/"warning",
+    "points"} per ticker and kind.
+    """
+    unknown = [kind for kind in kinds if kind not in SCRAPERS]
+    if unknown:
+        raise ValueError(f"Unknown fetch kind: {', '.join(unknown)}")
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    results = scrape_pairs([(kind, ticker) for ticker in tickers for kind in kinds], **options)
+    write_errors = commit(results, eps_filename=eps_filename, balance_filename=balance_filename)
+
+    summary = []
+    for r in results:
+        item = {"ticker": r["ticker"], "kind": r["kind"]}
+        if r["lines"] is None:
+            item.update(success=False, error=r["message"])
+        elif write_errors.get(r["kind"]):
+            item.update(success=False, error=write_errors[r["kind"]])
+        else:
+            item.update(success=True, points=len(r["lines"]))
+            if r["message"]:
+                item["warning"] = r["message"]
+        summary.append(item)
+    return summary
+
+
+def serve_fixtures(directory=FIXTURES_DIR, latency: float = 0.0, fail_every: int = 0):
+    """
+    Serve saved pages over HTTP on a free local port from a background
+    thread, each response delayed by `latency` seconds to mimic the network.
+    With fail_every=n, the first request for every n-th distinct path is
+    answered 503 to exercise retries; the retry of that path succeeds, so
+    the outcome doesn't depend on how concurrent requests interleave.
+    Returns (server, base_url); call server.shutdown() when done.
+    """
+    seen = {}
+    seen_lock = threading.Lock()
+
+    def first_request(path):
+        """Ordinal of a path among the distinct paths requested, or 0 if it was requested before."""
+        with seen_lock:
+            if path in seen:
+                return 0
+            seen[path] = len(seen) + 1
+            return seen[path]
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real site
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            ordinal = first_request(self.path) if fail_every else 0
+            if ordinal and ordinal % fail_every == 0:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            super().do_GET()
+
+        def log_message(self, format, *args):
+            pass
+
+    handler = functools.partial(Handler, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
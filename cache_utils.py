@@ -1,16 +1,26 @@
 import pandas as pd
-import os
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from price_store import PriceFrameCache, PriceStore
+
 CACHE_DIR = Path("cache")
 CACHE_TTL_HOURS = 24  # Cache expires after 24 hours
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024  # In-process price frames kept in front of the store
+INCREMENTAL_OVERLAP_DAYS = 7  # Days of already-cached bars re-fetched on an incremental refresh, to pick up revisions
+
+_store = PriceStore(CACHE_DIR)
+_memory = PriceFrameCache(MEMORY_CACHE_MAX_BYTES, CACHE_TTL_HOURS * 3600)
+
+
+def get_price_store() -> PriceStore:
+    """The process-wide price store the functions below are adapters over."""
+    return _store
 
 
 def get_cache_path(ticker: str) -> Path:
     """Get the cache file path for a ticker."""
-    CACHE_DIR.mkdir(exist_ok=True)
-    return CACHE_DIR / f"{ticker.upper()}.csv"
+    return _store.path(ticker)
 
 
 def is_cache_valid(ticker: str) -> bool:
@@ -18,32 +28,47 @@ def is_cache_valid(ticker: str) -> bool:
     Check if cache exists and is still valid (within TTL).
     Returns True if cache exists and is fresh, False otherwise.
     """
-    cache_path = get_cache_path(ticker)
-    if not cache_path.exists():
+    synced = _store.last_synced(ticker)
+    if synced is None:
         return False
         
-    # Check file modification time
-    file_time = datetime.fromtimestamp(cache_path.stat().st_mtime)
-    age = datetime.now() - file_time
+    # Check when the series was last synced (falls back to file modification time)
+    sync_time = datetime.fromtimestamp(synced)
+    age = datetime.now() - sync_time
         
     return age < timedelta(hours=CACHE_TTL_HOURS)
 
 
+def get_fresh_prices(ticker: str):
+    """
+    Full cached price frame for a ticker if it is still within the TTL, else None.
+    Served from the in-process LRU when possible; falls back to the store.
+    """
+    df = _memory.get(ticker)
+    if df is not None:
+        return df
+
+    if not is_cache_valid(ticker):
+        return None
+    df = load_from_cache(ticker)
+    if df.empty:
+        return None
+    _memory.put(ticker, df, _store.last_synced(ticker))
+    return df
+
+
+def get_memory_cache_stats() -> dict:
+    """Hit/miss/eviction counters and byte usage of the in-process price LRU."""
+    return _memory.stats()
+
+
 def load_from_cache(ticker: str) -> pd.DataFrame:
     """
     Load price data from cache file.
     Returns empty DataFrame if cache doesn't exist or is invalid.
+    The Close column is a read-only view over the memory-mapped file.
     """
-    cache_path = get_cache_path(ticker)
-    if not cache_path.exists():
-        return pd.DataFrame()
-        
-    try:
-        df = pd.read_csv(cache_path, index_col='Date', parse_dates=True)
-        return df
-    except Exception as e:
-        print(f"Error loading cache for {ticker}: {e}")
-        return pd.DataFrame()
+    return _store.read(ticker)
 
 
 def save_to_cache(ticker: str, df: pd.DataFrame):
@@ -54,25 +79,50 @@ def save_to_cache(ticker: str, df: pd.DataFrame):
     if df.empty:
         return
         
-    cache_path = get_cache_path(ticker)
     try:
-        # Save only Close column to reduce file size
-        df[['Close']].to_csv(cache_path)
+        _store.write(ticker, df)
+        _store.write_meta(ticker, last_synced=datetime.now().timestamp(), last_sync_mode="full")
     except Exception as e:
         print(f"Error saving cache for {ticker}: {e}")
+        _memory.invalidate(ticker)
+        return
+    _memory.put(ticker, _store.read(ticker), _store.last_synced(ticker))
 
 
-def cache_covers_range(ticker: str, years: int = None, start_date: str = None, end_date: str = None) -> bool:
+def update_cache(ticker: str, df: pd.DataFrame) -> int:
+    """
+    Merge freshly fetched recent bars into the cached series (incremental refresh)
+    and mark the ticker as synced. Returns the number of new bars added.
+    """
+    try:
+        added = _store.merge(ticker, df) if not df.empty else 0
+        _store.write_meta(ticker, last_synced=datetime.now().timestamp(), last_sync_mode="incremental")
+    except Exception as e:
+        print(f"Error updating cache for {ticker}: {e}")
+        _memory.invalidate(ticker)
+        return 0
+    _memory.put(ticker, _store.read(ticker), _store.last_synced(ticker))
+    return added
+
+
+def cache_covers_range(ticker: str, years: int = None, start_date: str = None, end_date: str = None,
+                       df: pd.DataFrame = None) -> bool:
     """
     Check if cached data covers the requested date range.
     Returns True if cache has enough data, False otherwise.
+    Pass `df` when the cached frame is already loaded to skip reading the store.
     """
-    cached_df = load_from_cache(ticker)
-    if cached_df.empty:
+    if df is not None:
+        span = (df.index[0], df.index[-1]) if not df.empty else None
+    else:
+        try:
+            span = _store.date_range(ticker)
+        except Exception:
+            return False
+    if span is None:
         return False
         
-    cache_min = cached_df.index.min()
-    cache_max = cached_df.index.max()
+    cache_min, cache_max = span
         
     if years is not None:
         required_start = cache_max - pd.DateOffset(years=years)
@@ -93,32 +143,31 @@ def cache_covers_range(ticker: str, years: int = None, start_date: str = None, e
 
 def clear_cache(ticker: str = None):
     """Clear cache for a specific ticker or all tickers."""
+    _memory.invalidate(ticker)
     if ticker:
-        cache_path = get_cache_path(ticker)
-        if cache_path.exists():
-            cache_path.unlink()
+        _store.delete(ticker)
     else:
         # Clear all
-        CACHE_DIR.mkdir(exist_ok=True)
-        for cache_file in CACHE_DIR.glob("*.csv"):
-            cache_file.unlink()
+        for cached in _store.tickers():
+            _store.delete(cached)
 
 
 def get_cache_info():
     """Get information about cached files."""
     info = []
-    CACHE_DIR.mkdir(exist_ok=True)
-    for cache_file in CACHE_DIR.glob("*.csv"):
-        ticker = cache_file.stem
-        file_time = datetime.fromtimestamp(cache_file.stat().st_mtime)
-        age = datetime.now() - file_time
-        size = cache_file.stat().st_size
+    for ticker in _store.tickers():
+        synced = _store.last_synced(ticker)
+        if synced is None:
+            continue
+        sync_time = datetime.fromtimestamp(synced)
+        age = datetime.now() - sync_time
+        size = _store.path(ticker).stat().st_size
                 
         info.append({
             'ticker': ticker,
             'age_hours': age.total_seconds() / 3600,
             'size_kb': size / 1024,
-            'valid': is_cache_valid(ticker)
+            'valid': is_cache_valid(ticker),
+            'last_sync_mode': _store.read_meta(ticker).get('last_sync_mode')
         })
     return info
-
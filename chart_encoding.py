@@ -0,0 +1,54 @@
+"""
+Encodings of the P/E chart series in API responses.
+
+Every series of a chart is sampled on the price bars' dates. The default
+"points" encoding repeats the date in every point:
+
+    "pe_ttm": [{"date": "2024-01-02T00:00:00", "value": 61.2}, ...]
+
+The "columnar" encoding (request it with format=columnar) sends the dates once,
+as whole days since a start date, and each series as a plain value array:
+
+    "encoding": "columnar", "start": "2024-01-02", "days": [0, 1, 2, 6, ...],
+    "price": [48.1, 47.6, ...],
+    "pe_ttm": {"values": [61.2, ...], "gaps": [[0, 3], [250, 2]]}
+
+Bars a P/E series has no value on are left out of its "values" and listed in
+"gaps" as [first bar index, run length], so long gaps cost a single pair.
+"""
+import numpy as np
+
+COLUMNAR = "columnar"
+
+
+def points(dates: np.ndarray, values: np.ndarray) -> list:
+    """[{"date", "value"}] for every bar with a value (NaN bars are skipped)."""
+    keep = ~np.isnan(values)
+    iso = np.datetime_as_string(dates[keep], unit="s").tolist()
+    return [{'date': date, 'value': value} for date, value in zip(iso, values[keep].tolist())]
+
+
+def gaps(values: np.ndarray) -> list:
+    """Runs of NaN in values as [[first index, length], ...]."""
+    missing = np.isnan(values).astype(np.int8)
+    edges = np.diff(np.concatenate(([0], missing, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return np.column_stack((starts, ends - starts)).tolist()
+
+
+def columnar(dates: np.ndarray, price: np.ndarray, **series) -> dict:
+    """The columnar encoding of a chart; `series` are P/E arrays on the same dates (or None)."""
+    days = dates.astype("datetime64[D]")
+    encoded = {
+        'encoding': COLUMNAR,
+        'start': str(days[0]) if len(days) else None,
+        'days': (days - days[0]).astype(np.int64).tolist() if len(days) else [],
+        'price': price.tolist(),
+    }
+    for name, values in series.items():
+        if values is None:
+            encoded[name] = None
+        else:
+            encoded[name] = {'values': values[~np.isnan(values)].tolist(), 'gaps': gaps(values)}
+    return encoded
@@ -0,0 +1,62 @@
+"""
+Response compression for the JSON API.
+
+nginx proxies /api/ to Flask without gzip, so large JSON bodies (P/E series,
+dashboard batches) are compressed here: brotli when the client accepts it and
+the optional `brotli` package is installed, otherwise gzip. Streamed responses
+are left alone so NDJSON lines still go out as soon as they are produced.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = 1024  # Smaller bodies aren't worth the CPU or the header
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_MIMETYPES = ("application/json",)
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a request's Accept-Encoding."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def etag_variants(etag: str) -> list:
+    """The ETags a representation of `etag` can carry, one per content encoding."""
+    return [etag, f"{etag}-gzip", f"{etag}-br"]
+
+
+def compress_response(response):
+    """after_request hook compressing eligible responses in place."""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    data = response.get_data()
+    if encoding is None or len(data) < MIN_SIZE:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+
+    # A strong ETag names one exact representation, so each encoding gets its own
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+    return response
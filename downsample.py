@@ -0,0 +1,102 @@
+"""
+Downsampling of chart series for small renderings (thumbnails, compact charts).
+
+Two methods, both keeping the first and last point:
+
+- "lttb": Largest-Triangle-Three-Buckets. Splits the points into buckets and
+  keeps, per bucket, the point forming the largest triangle with the point kept
+  in the previous bucket and the average of the next one. Keeps the visual
+  shape of the line.
+- "minmax": keeps the lowest and highest point of each bucket, so every
+  extreme survives. Fully vectorized.
+
+chart_indices picks one set of bars for a whole chart (price plus P/E series
+with NaN gaps), so all series stay on shared dates.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def _bucket_edges(size: int, buckets: int) -> np.ndarray:
+    """buckets + 1 strictly increasing edges splitting points 1..size-2 (the interior)."""
+    return np.linspace(1, size - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n points LTTB keeps out of (x, y), ascending."""
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+
+    buckets = n - 2
+    edges = _bucket_edges(size, buckets)
+    counts = np.diff(edges)
+    # Average point of every bucket; the last bucket's "next" is the final point
+    avg_x = np.add.reduceat(x[:size - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:size - 1], edges[:-1]) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    # Each bucket depends on the point kept in the one before it
+    for i in range(buckets):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each of n // 2 buckets, plus both ends, ascending."""
+    size = len(y)
+    if n >= size or n < 2:
+        return np.arange(size)
+
+    buckets = max(1, n // 2)
+    group = np.arange(size) * buckets // size
+    # Sorted by bucket, then value: each bucket's first entry is its min, its last its max
+    order = np.lexsort((y, group))
+    starts = np.searchsorted(group[order], np.arange(buckets))
+    ends = np.append(starts[1:], size) - 1
+    return np.unique(np.concatenate((order[starts], order[ends], [0, size - 1])))
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, n: int, method: str = "lttb") -> np.ndarray:
+    """Indices of about n points of (x, y) kept by `method` (see METHODS)."""
+    if method == "minmax":
+        return minmax_indices(y, n)
+    if method == "lttb":
+        return lttb_indices(np.asarray(x, dtype=np.float64), y, n)
+    raise ValueError(f"Unknown downsampling method: {method}")
+
+
+def chart_indices(x: np.ndarray, series, max_points: int, method: str = "lttb"):
+    """
+    Bars to keep for a chart whose series (arrays over the bars of x, NaN where
+    missing, or None) should be drawn with about max_points points. Each series
+    gets an equal share, and its overall min and max are always kept, as are the
+    bars on both sides of every NaN gap so the chart still breaks the line there.
+    Returns None when nothing needs to go.
+    """
+    size = len(x)
+    present = [values for values in series if values is not None]
+    if not max_points or size <= max_points or not present:
+        return None
+
+    share = max(3, max_points // len(present))
+    keep = [np.array([0, size - 1])]
+    for values in present:
+        missing = np.isnan(values)
+        valid = np.flatnonzero(~missing)
+        if len(valid):
+            keep.append(valid[downsample_indices(x[valid], values[valid], share, method)])
+            # The overall extremes, which LTTB alone may smooth away
+            keep.append(valid[[np.argmin(values[valid]), np.argmax(values[valid])]])
+        changes = np.flatnonzero(np.diff(missing.astype(np.int8)))
+        keep.extend((changes, changes + 1))
+    return np.unique(np.concatenate(keep))
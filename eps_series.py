@@ -0,0 +1,129 @@
+"""
+TTM EPS derived from the manual EPS file, computed once per file version.
+
+Every consumer of TTM EPS (the valuation scorers, the P/E charts and the P/E
+comparison visualizer) reads it from here, so they all apply the same rules:
+
+- A ticker's reports are quarterly if there are at least two of them and the
+  median gap between them is at most 120 days; otherwise they are annual.
+- Quarterly TTM EPS is the rolling sum of the last four quarters, with no
+  value until four quarters exist. Annual TTM EPS is the reported figure.
+- The TTM series is a step function: every report with a TTM value is a
+  change point whose value stays in effect until the next one.
+
+The derived arrays cover the whole file, are computed with a few vectorized
+passes on first use, and are dropped when the fundamentals store reloads the
+file (see TickerFrames.derived).
+"""
+import numpy as np
+import pandas as pd
+
+from fundamentals import EPS_FILE, get_eps_data
+from manual_parser import group_ids
+
+QUARTERLY_MAX_GAP_DAYS = 120
+
+
+def classify_quarterly(table) -> np.ndarray:
+    """Per ticker of a ManualTable, whether its reports are quarterly (see module docstring)."""
+    group = group_ids(table.offsets)
+    same = group[1:] == group[:-1]
+    gap_days = np.diff(table.dates) // np.timedelta64(1, "D")
+    median_gap = pd.Series(gap_days[same].astype(np.float64)).groupby(group[1:][same]).median()
+
+    # Compared in whole days, like Timedelta.days
+    quarterly = np.zeros(len(table.tickers), dtype=bool)
+    quarterly[median_gap.index.to_numpy()] = np.floor(median_gap.to_numpy()) <= QUARTERLY_MAX_GAP_DAYS
+    return quarterly
+
+
+def ttm_eps_rows(table, quarterly: np.ndarray) -> np.ndarray:
+    """TTM EPS for every row of a ManualTable (NaN until a quarterly ticker has four quarters)."""
+    eps = np.asarray(table.values, dtype=np.float64)
+    if len(eps) == 0:
+        return eps.copy()
+    group = group_ids(table.offsets)
+    # groupby().rolling() restarts the running sum at every ticker
+    rolled = pd.Series(eps).groupby(group).rolling(4).sum().to_numpy()
+    return np.where(quarterly[group], rolled, eps)
+
+
+class EPSSeries:
+    """Frequency classification and TTM EPS step series for every ticker of an EPS file."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        table = frames.table
+        self.quarterly = classify_quarterly(table)
+        self.ttm = ttm_eps_rows(table, self.quarterly)
+
+        # Change points: the rows that carry a TTM value
+        self._steps = np.flatnonzero(~np.isnan(self.ttm))
+        self._step_offsets = np.searchsorted(self._steps, table.offsets)
+        for arr in (self.quarterly, self.ttm, self._steps, self._step_offsets):
+            arr.flags.writeable = False
+
+    def _code(self, ticker: str) -> int:
+        code = self.frames.code(ticker)
+        if code < 0:
+            raise KeyError(ticker)
+        return code
+
+    def __contains__(self, ticker):
+        return ticker in self.frames
+
+    def is_quarterly(self, ticker: str) -> bool:
+        return bool(self.quarterly[self._code(ticker)])
+
+    def ttm_series(self, ticker: str) -> pd.Series:
+        """TTM EPS on every report date of a ticker (NaN where it isn't defined yet)."""
+        code = self._code(ticker)
+        start, end = self.frames.table.offsets[code], self.frames.table.offsets[code + 1]
+        index = pd.DatetimeIndex(self.frames.table.dates[start:end], name="Date")
+        return pd.Series(self.ttm[start:end], index=index, name="TTM_EPS")
+
+    def steps(self, ticker: str):
+        """(dates, values) of a ticker's TTM change points, oldest first."""
+        code = self._code(ticker)
+        rows = self._steps[self._step_offsets[code]:self._step_offsets[code + 1]]
+        return self.frames.table.dates[rows], self.ttm[rows]
+
+    def latest(self, ticker: str) -> float:
+        """TTM EPS as of the ticker's latest report (NaN if it has no TTM value yet)."""
+        code = self._code(ticker)
+        return self.ttm[self.frames.table.offsets[code + 1] - 1]
+
+    def align(self, ticker: str, dates) -> np.ndarray:
+        """
+        TTM EPS in effect on each of `dates` (sorted datetime64[ns]): the latest
+        change point on or before the date, NaN before the first one.
+        """
+        step_dates, step_values = self.steps(ticker)
+        idx = np.searchsorted(step_dates, dates, side="right") - 1
+        aligned = np.full(len(dates), np.nan)
+        known = idx >= 0
+        aligned[known] = step_values[idx[known]]
+        return aligned
+
+    def rows_for(self, tickers):
+        """
+        (rows, ttm, quarterly) for the given tickers, in the order given: their
+        EPS rows as one ManualTable, the TTM EPS of each row, and each ticker's
+        frequency classification (False for tickers not in the file).
+        """
+        tickers = list(tickers)
+        _, index = self.frames.row_index(tickers)
+        codes = np.array([self.frames.code(t) for t in tickers], dtype=np.int64)
+        quarterly = np.zeros(len(tickers), dtype=bool)
+        quarterly[codes >= 0] = self.quarterly[codes[codes >= 0]]
+        return self.frames.rows_for(tickers), self.ttm[index], quarterly
+
+
+def series_for(frames) -> EPSSeries:
+    """The EPSSeries of an EPS mapping from the fundamentals store, built once per file version."""
+    return frames.derived("eps_series", EPSSeries)
+
+
+def get_eps_series(filename: str = EPS_FILE) -> EPSSeries:
+    """The EPSSeries of an EPS file."""
+    return series_for(get_eps_data(filename))
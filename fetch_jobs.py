@@ -0,0 +1,175 @@
+"""
+Background jobs for the stockanalysis.com scrapes behind /api/fetch_eps and
+/api/fetch_balance.
+
+A scrape takes seconds (up to two GETs with 15 s timeouts), so requests only
+submit work here and return a job id at once. Each job's fetches run as one
+bulk_scrape batch (concurrent downloads, retries, one write per data file) on a
+small bounded pool; scraper.py spaces requests to the same host. A fetch
+already queued or running is shared by every job that asks for it, so the same
+ticker is never scraped twice at once. Jobs are kept in memory (the most
+recent MAX_JOBS) and polled with job(), or followed with wait_for_change().
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import bulk_scrape
+from fundamentals import BALANCE_FILE, EPS_FILE
+
+MAX_WORKERS = 2   # Jobs scraping at once (each downloads up to bulk_scrape.MAX_IN_FLIGHT pages)
+MAX_JOBS = 200    # Finished jobs beyond this are forgotten, oldest first
+
+# kind -> file the scraped lines are written to
+FILES = {'eps': EPS_FILE, 'balance': BALANCE_FILE}
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_write_lock = threading.Lock()
+_executor = None
+_running = {}           # (kind, ticker) -> _Fetch queued or running
+_jobs = OrderedDict()   # job id -> _Job
+
+
+class _Fetch:
+    """One scrape of one kind of data for one ticker, shared by the jobs that asked for it."""
+
+    def __init__(self, kind: str, ticker: str):
+        self.kind = kind
+        self.ticker = ticker
+        self.status = 'queued'
+        self.error = None
+        self.warning = None
+
+    def to_json(self) -> dict:
+        item = {'ticker': self.ticker, 'kind': self.kind, 'status': self.status}
+        if self.error:
+            item['error'] = self.error
+        if self.warning:
+            item['warning'] = self.warning
+        return item
+
+
+class _Job:
+    def __init__(self, fetches):
+        self.id = uuid.uuid4().hex
+        self.created = time.time()
+        self.fetches = fetches
+
+    @property
+    def finished(self) -> bool:
+        return all(f.status in ('done', 'failed') for f in self.fetches)
+
+    def to_json(self) -> dict:
+        items = [f.to_json() for f in self.fetches]
+        completed = sum(item['status'] in ('done', 'failed') for item in items)
+        return {
+            'job_id': self.id,
+            'status': 'done' if completed == len(items) else 'running',
+            'total': len(items),
+            'completed': completed,
+            'failed': sum(item['status'] == 'failed' for item in items),
+            'items': items,
+        }
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="scrape")
+        return _executor
+
+
+def _set_status(fetch: _Fetch, status: str, error=None, warning=None):
+    with _changed:
+        fetch.status, fetch.error, fetch.warning = status, error, warning
+        if status in ('done', 'failed'):
+            _running.pop((fetch.kind, fetch.ticker), None)
+        _changed.notify_all()
+
+
+def _run(fetches, options):
+    """Scrape a job's new fetches as one batch, then write them all at once."""
+    by_pair = {(f.kind, f.ticker): f for f in fetches}
+    for fetch in fetches:
+        _set_status(fetch, 'running')
+
+    def scraped(result):
+        # Downloaded and parsed, waiting for the rest of the batch to be written
+        _set_status(by_pair[(result['kind'], result['ticker'])], 'fetched')
+
+    try:
+        results = bulk_scrape.scrape_pairs(list(by_pair), on_result=scraped, **options)
+        # Appends from different jobs must not interleave
+        with _write_lock:
+            write_errors = bulk_scrape.commit(results, eps_filename=FILES['eps'],
+                                              balance_filename=FILES['balance'])
+        for fetch, result in zip(fetches, results):
+            if result['lines'] is None:
+                _set_status(fetch, 'failed', error=result['message'])
+            elif write_errors.get(fetch.kind):
+                _set_status(fetch, 'failed', error=write_errors[fetch.kind])
+            else:
+                _set_status(fetch, 'done', warning=result['message'])
+    except Exception as e:
+        for fetch in fetches:
+            _set_status(fetch, 'failed', error=str(e))
+
+
+def submit(tickers, kinds=('eps', 'balance'), **options) -> dict:
+    """
+    Queue a fetch of every kind for every ticker and return the new job's state.
+    options (max_in_flight, retries, ...) go to bulk_scrape.scrape_pairs.
+    """
+    unknown = [kind for kind in kinds if kind not in FILES]
+    if unknown:
+        raise ValueError(f"Unknown fetch kind: {', '.join(unknown)}")
+
+    fetches, new = [], []
+    with _lock:
+        for ticker in dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()):
+            for kind in kinds:
+                fetch = _running.get((kind, ticker))
+                if fetch is None:
+                    fetch = _running[(kind, ticker)] = _Fetch(kind, ticker)
+                    new.append(fetch)
+                fetches.append(fetch)
+        job = _Job(fetches)
+        _jobs[job.id] = job
+        _forget_old_jobs()
+        state = job.to_json()
+    if new:
+        _get_executor().submit(_run, new, options)
+    return state
+
+
+def _forget_old_jobs():
+    excess = len(_jobs) - MAX_JOBS
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished][:max(excess, 0)]:
+        del _jobs[job_id]
+
+
+def job(job_id: str):
+    """The current state of a job, or None if it is unknown (or long forgotten)."""
+    with _lock:
+        found = _jobs.get(job_id)
+        return found.to_json() if found is not None else None
+
+
+def wait_for_change(job_id: str, seen: dict, timeout: float = 15.0):
+    """
+    Block until a job's state differs from `seen` (a previous job() result, or
+    None) or timeout seconds pass, then return the current state.
+    """
+    deadline = time.monotonic() + timeout
+    with _changed:
+        while True:
+            found = _jobs.get(job_id)
+            state = found.to_json() if found is not None else None
+            remaining = deadline - time.monotonic()
+            if state != seen or state is None or remaining <= 0:
+                return state
+            _changed.wait(remaining)
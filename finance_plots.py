@@ -4,111 +4,93 @@ import matplotlib.pyplot as plt
 import urllib.request
 import io
 from datetime import datetime, timedelta
+from fundamentals import get_eps_data
+from eps_series import series_for
+from cache_utils import INCREMENTAL_OVERLAP_DAYS
 
 
 def load_manual_eps(filename: str = "DATA/EPS_manual.txt") -> dict:
     """
     Parse EPS_manual.txt into a dict of {ticker: DataFrame(index=Date, columns=[EPS])}.
+    Backed by the shared fundamentals store; frames are read-only.
     """
-    eps_data = {}
-    current_ticker = None
-    rows = []
-
-    with open(filename, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line == "END":
-                if current_ticker and rows:
-                    df = pd.DataFrame(rows, columns=["Date", "EPS"])
-                    df["Date"] = pd.to_datetime(df["Date"])
-                    df["EPS"] = df["EPS"].replace(r"[\$,]", "", regex=True).astype(float)
-                    df = df.set_index("Date").sort_index()
-                    eps_data[current_ticker] = df
-                current_ticker, rows = None, []
-                continue
-            if line.isalpha():
-                current_ticker = line.strip()
-                rows = []
-            else:
-                parts = line.split()
-                if len(parts) >= 2:
-                    date = parts[0]
-                    eps = parts[1]
-                    rows.append([date, eps])
-    return eps_data
+    return get_eps_data(filename)
+
+
+def _fetch_yahoo_closes(ticker: str, query: str) -> pd.DataFrame:
+    """
+    Fetch daily closes from the Yahoo Finance chart API over the shared keep-alive session.
+    `query` is the range part of the query string, e.g. "range=10y" or "period1=...&period2=...".
+    Returns a tz-naive, date-normalized Close frame (possibly empty if Yahoo has no bars).
+    """
+    from price_fetch import yahoo_chart
+
+    data = yahoo_chart(ticker, f"{query}&interval=1d")
+
+    chart_res = data.get('chart', {}).get('result', [])
+    if not chart_res:
+        raise ValueError("No result found in Yahoo Finance response.")
+
+    timestamps = chart_res[0].get('timestamp', [])
+    close_prices = chart_res[0]['indicators']['quote'][0].get('close', [])
+
+    if not timestamps or not close_prices:
+        return pd.DataFrame()
+
+    df = pd.DataFrame({'Close': close_prices}, index=pd.to_datetime(timestamps, unit='s')).dropna()
+    df.index.name = 'Date'
+    # Remove timezone information from the index so it behaves like Stooq
+    df.index = df.index.tz_localize(None).normalize()
+    return df
 
 
 def _get_price_data_yahoo(ticker: str, years: int = None, start_date: str = None, end_date: str = None) -> pd.DataFrame:
     """
     Get price data from Yahoo Finance API with caching.
     Can filter by years or by start_date/end_date.
+
+    An expired cache that already reaches back far enough is refreshed
+    incrementally (only bars since the last cached date, plus a short overlap);
+    otherwise the full 10 years are downloaded.
     """
-    from cache_utils import is_cache_valid, load_from_cache, save_to_cache, cache_covers_range
-    import urllib.request, json
+    from cache_utils import get_fresh_prices, load_from_cache, save_to_cache, update_cache, cache_covers_range
+    from price_store import slice_frame
     
-    # Check if we have valid cached data
-    cached_df = pd.DataFrame()
-    needs_refresh = True
-    if is_cache_valid(ticker):
+    # Check if we have valid cached data (in-process LRU first, then the on-disk store)
+    cached_df = get_fresh_prices(ticker)
+    if cached_df is not None and cache_covers_range(ticker, years=years, start_date=start_date, end_date=end_date, df=cached_df):
+        return slice_frame(cached_df, years=years, start_date=start_date, end_date=end_date)
+
+    # Expired (or too short) - decide between an incremental and a full refresh
+    if cached_df is None:
         cached_df = load_from_cache(ticker)
-        # Check if cache covers the requested range
-        if not cached_df.empty and cache_covers_range(ticker, years=years, start_date=start_date, end_date=end_date):
-            needs_refresh = False
-    
-    # Fetch from Yahoo if cache is invalid or empty
-    if needs_refresh:
-        try:
+    incremental = not cached_df.empty and cache_covers_range(ticker, years=years, start_date=start_date, df=cached_df)
+
+    try:
+        if incremental:
+            since = cached_df.index[-1] - pd.Timedelta(days=INCREMENTAL_OVERLAP_DAYS)
+            period1 = int(since.timestamp())
+            period2 = int(datetime.now().timestamp())
+            update_cache(ticker, _fetch_yahoo_closes(ticker, f"period1={period1}&period2={period2}"))
+        else:
             # Query maximum amount to populate cache comprehensively
-            url = f"https://query2.finance.yahoo.com/v8/finance/chart/{ticker}?range=10y&interval=1d"
-            hdr = {'User-Agent': 'Mozilla/5.0'}
-            req = urllib.request.Request(url, headers=hdr)
-            
-            with urllib.request.urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode('utf-8'))
-                
-            chart_res = data.get('chart', {}).get('result', [])
-            if not chart_res:
-                raise ValueError("No result found in Yahoo Finance response.")
-                
-            timestamps = chart_res[0].get('timestamp', [])
-            close_prices = chart_res[0]['indicators']['quote'][0].get('close', [])
-            
-            if not timestamps or not close_prices:
+            df = _fetch_yahoo_closes(ticker, "range=10y")
+            if df.empty:
                 raise ValueError("Missing timestamps or close prices.")
-                
-            df = pd.DataFrame({'Close': close_prices}, index=pd.to_datetime(timestamps, unit='s')).dropna()
-            df.index.name = 'Date'
-            # Remove timezone information from the index so it behaves like Stooq
-            df.index = df.index.tz_localize(None).normalize()
-            
-            # Save full dataset to cache
             save_to_cache(ticker, df)
-            cached_df = df
-        except Exception as e:
-            print(f"Yahoo failed for {ticker}: {e}")
-            # If Yahoo fails but we have cached data, use that
-            if not cached_df.empty:
-                print(f"Using cached data for {ticker}")
-            else:
-                return pd.DataFrame()
-    
-    # Filter cached data by requested date range
-    df = cached_df.copy()
-    
-    if start_date is not None or end_date is not None:
-        if start_date:
-            start = pd.to_datetime(start_date)
-            df = df[df.index >= start]
-        if end_date:
-            end = pd.to_datetime(end_date)
-            df = df[df.index <= end]
-    elif years is not None:
-        cutoff_date = df.index.max() - pd.DateOffset(years=years)
-        df = df[df.index >= cutoff_date]
+        refreshed = get_fresh_prices(ticker)
+        if refreshed is not None:
+            cached_df = refreshed
+    except Exception as e:
+        print(f"Yahoo failed for {ticker}: {e}")
+        # If Yahoo fails but we have cached data, use that
+        if not cached_df.empty:
+            print(f"Using cached data for {ticker}")
+        else:
+            return pd.DataFrame()
     
-    return df
+    # Filter cached data by requested date range (a view, not a copy of the full history)
+    return slice_frame(cached_df, years=years, start_date=start_date, end_date=end_date)
 
 
 def _get_price_history(ticker: str, years: int) -> pd.DataFrame:
@@ -131,20 +113,13 @@ def _get_auto_ttm_eps_series(ticker: str, price_index: pd.DatetimeIndex) -> pd.S
 def _get_manual_eps_series(ticker: str, price_index: pd.DatetimeIndex, manual_eps_by_ticker: dict, compute_ttm: bool) -> pd.Series:
     if ticker not in manual_eps_by_ticker:
         return pd.Series(index=price_index, dtype=float)
-    eps_df = manual_eps_by_ticker[ticker].copy()
     if compute_ttm:
-        if len(eps_df) >= 2:
-            median_gap = pd.Series(eps_df.index).diff().median().days
-            if median_gap > 120: # 120 days is roughly > 1 quarter gap
-                eps_df["TTM_EPS"] = eps_df["EPS"]
-            else:
-                eps_df["TTM_EPS"] = eps_df["EPS"].rolling(4, min_periods=1).sum()
-        else:
-            eps_df["TTM_EPS"] = eps_df["EPS"]
-        series = eps_df["TTM_EPS"].reindex(price_index, method="ffill")
-    else:
-        series = eps_df["EPS"].reindex(price_index, method="ffill")
-    return series
+        # Same TTM EPS step series the valuation scorers use
+        dates = pd.DatetimeIndex(price_index).tz_localize(None) if price_index.tz is not None else price_index
+        ttm = series_for(manual_eps_by_ticker).align(ticker, dates.to_numpy(dtype="datetime64[ns]"))
+        return pd.Series(ttm, index=price_index, name="TTM_EPS")
+    eps_df = manual_eps_by_ticker[ticker]
+    return eps_df["EPS"].reindex(price_index, method="ffill")
 
 
 def plot_price_vs_eps(
@@ -0,0 +1,151 @@
+"""
+Writes the stockanalysis.com-style pages under fixtures/stockanalysis/ that
+bulk_scrape.serve_fixtures serves for offline scraper tests and benchmarks.
+
+The pages follow the layout scraper.py parses (a financials table with a
+"Fiscal Quarter" / "Period Ending" header pair and a TTM column, surrounded by
+navigation markup), with EPS and debt/equity figures taken from the DATA files.
+They are generated rather than recorded: pages saved from the live site can be
+dropped in at the same paths (stocks/<ticker>/financials/[balance-sheet/]
+[quarterly/]index.html) and are served the same way.
+Run from the repository root: python fixtures/make_stockanalysis_fixtures.py
+"""
+import random
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).parent / "stockanalysis"
+QUARTERLY = ["AMD", "NFLX", "MSFT", "NVDA", "GOOG", "AMZN", "TSLA", "INTC", "ADBE", "COST"]
+ANNUAL_ONLY = ["IBM"]  # No quarterly page: the scraper falls back to the annual one
+COLUMNS = 20
+
+INCOME_ROWS = ["Revenue", "Revenue Growth (YoY)", "Cost of Revenue", "Gross Profit",
+               "Selling, General & Admin", "Research & Development", "Operating Expenses",
+               "Operating Income", "Interest Expense", "Pretax Income", "Income Tax",
+               "Net Income", "Net Income Growth", "Shares Outstanding (Basic)",
+               "Shares Outstanding (Diluted)", "Shares Change (YoY)", "EPS (Basic)", "EPS (Diluted)",
+               "EPS Growth", "Free Cash Flow", "Free Cash Flow Per Share", "Dividend Per Share",
+               "Gross Margin", "Operating Margin", "Profit Margin", "Free Cash Flow Margin",
+               "EBITDA", "EBITDA Margin", "D&A For EBITDA", "EBIT", "EBIT Margin", "Effective Tax Rate"]
+BALANCE_ROWS = ["Cash & Equivalents", "Short-Term Investments", "Cash & Short-Term Investments",
+                "Receivables", "Inventory", "Other Current Assets", "Total Current Assets",
+                "Property, Plant & Equipment", "Long-Term Investments", "Goodwill and Intangibles",
+                "Other Long-Term Assets", "Total Long-Term Assets", "Total Assets", "Accounts Payable",
+                "Deferred Revenue", "Current Debt", "Other Current Liabilities",
+                "Total Current Liabilities", "Long-Term Debt", "Other Long-Term Liabilities",
+                "Total Long-Term Liabilities", "Total Liabilities", "Total Debt",
+                "Common Stock", "Retained Earnings", "Comprehensive Income", "Shareholders' Equity",
+                "Total Liabilities & Equity", "Net Cash / Debt", "Working Capital", "Book Value Per Share"]
+
+
+def _blocks(filename):
+    blocks, ticker = {}, None
+    for line in Path(filename).read_text().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line == "END":
+            ticker = None
+        elif ticker is None:
+            ticker = line
+            blocks[ticker] = []
+        elif len(line.split()) > 1:
+            blocks[ticker].append(line.split())
+    return blocks
+
+
+def _chrome(ticker, rng):
+    """Site navigation and scripts around the table, for realistic page sizes."""
+    links = "".join(f'<li><a href="/stocks/{t.lower()}/" class="nav-link text-sm">{t} stock</a></li>'
+                    for t in rng.choices(QUARTERLY + ["META", "ORCL", "AAPL"], k=600))
+    script = "var __data=" + ",".join(str(rng.random()) for _ in range(3000)) + ";"
+    head = (f"<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\"><title>{ticker} Financials</title>"
+            f"<script>{script}</script></head><body><header><nav><ul>{links}</ul></nav></header>")
+    return head, "<footer><p>Financial data fixture.</p></footer></body></html>"
+
+
+def _cell(value):
+    return "-" if value is None else value
+
+
+def _page(ticker, headers, rows, rng):
+    head, foot = _chrome(ticker, rng)
+    top = "".join(f"<th>{fiscal}</th>" for fiscal, _ in headers)
+    bottom = "".join(f"<th>{period}</th>" for _, period in headers)
+    body = "".join(f'<tr><td class="sticky-column">{label}</td>' + "".join(f"<td>{_cell(v)}</td>" for v in values)
+                   + "</tr>" for label, values in rows)
+    table = (f'<table id="main-table" class="financials"><thead><tr><th>Fiscal Quarter</th>{top}</tr>'
+             f"<tr><th>Period Ending</th>{bottom}</tr></thead><tbody>{body}</tbody></table>")
+    return f"{head}<main><h1>{ticker} Income Statement</h1>{table}</main>{foot}"
+
+
+def _headers(dates, annual):
+    headers = [("TTM", "Current")]
+    for date in dates:
+        stamp = pd.Timestamp(date)
+        fiscal = f"FY {stamp.year}" if annual else f"Q{stamp.quarter} {stamp.year}"
+        headers.append((fiscal, f"{stamp:%b} {stamp.day}, {stamp.year}"))
+    return headers
+
+
+def _filler(label, count, rng):
+    if "Margin" in label or "Growth" in label or "Change" in label or "Rate" in label:
+        return [f"{rng.uniform(-20, 60):.2f}%" for _ in range(count)]
+    return [f"{rng.uniform(10, 90000):,.0f}" for _ in range(count)]
+
+
+def _income_page(ticker, eps_rows, annual, rng):
+    eps_rows = eps_rows[:COLUMNS]
+    dates = [date for date, _ in eps_rows]
+    eps = {date: value.replace("$", "") for date, value in eps_rows}
+    rows = []
+    for label in INCOME_ROWS:
+        if label.startswith("EPS ("):
+            values = [f"{sum(float(v) for v in list(eps.values())[:4]):.2f}"] + [eps[d] for d in dates]
+        else:
+            values = _filler(label, len(dates) + 1, rng)
+        rows.append((label, values))
+    return _page(ticker, _headers(dates, annual), rows, rng)
+
+
+def _balance_page(ticker, balance_rows, rng):
+    balance_rows = balance_rows[:COLUMNS]
+    dates = [row[0] for row in balance_rows]
+    debt = [f"{float(row[1].split(':')[1]):,.0f}" for row in balance_rows]
+    equity = [f"{float(row[2].split(':')[1]):,.0f}" for row in balance_rows]
+    rows = []
+    for label in BALANCE_ROWS:
+        if label == "Total Debt":
+            values = [debt[0]] + debt
+        elif label == "Shareholders' Equity":
+            values = [equity[0]] + equity
+        else:
+            values = _filler(label, len(dates) + 1, rng)
+        rows.append((label, values))
+    return _page(ticker, _headers(dates, annual=False), rows, rng)
+
+
+def _write(path, html):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "index.html").write_text(html, encoding="utf-8")
+
+
+def main():
+    rng = random.Random(7)
+    eps, balance = _blocks("DATA/EPS_manual.txt"), _blocks("DATA/Balance_manual.txt")
+    shutil.rmtree(ROOT, ignore_errors=True)
+    for ticker in QUARTERLY + ANNUAL_ONLY:
+        pages = ROOT / "stocks" / ticker.lower() / "financials"
+        if ticker in ANNUAL_ONLY:
+            _write(pages, _income_page(ticker, eps[ticker], True, rng))
+        else:
+            _write(pages / "quarterly", _income_page(ticker, eps[ticker], False, rng))
+        if ticker in balance:
+            _write(pages / "balance-sheet" / "quarterly", _balance_page(ticker, balance[ticker], rng))
+    print(f"Wrote fixtures for {len(QUARTERLY + ANNUAL_ONLY)} tickers under {ROOT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import './LoadingBar.css';
 
-function LoadingBar({ isLoading, totalChunks = 0, currentChunk = 0 }) {
+function LoadingBar({ isLoading, totalChunks = 0, currentChunk = 0, unit = 'pages' }) {
   const [hidden, setHidden] = useState(false);
 
   // Reset hidden state whenever it starts loading again
@@ -21,7 +21,7 @@ function LoadingBar({ isLoading, totalChunks = 0, currentChunk = 0 }) {
           <span className="loading-message">Loading data...</span>
           {totalChunks > 1 && (
             <span className="loading-progress">
-              ({currentChunk} of {totalChunks} pages)
+              ({currentChunk} of {totalChunks} {unit})
             </span>
           )}
         </div>
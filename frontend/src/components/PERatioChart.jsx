@@ -10,9 +10,10 @@ import {
   ResponsiveContainer
 } from 'recharts'
 import './PERatioChart.css'
+import { decodeChartRows } from '../lib/series'
 
-function PERatioChart({ ticker, peTtm, peForward, price, compact = false }) {
-  // Combine the data, grouping by date
+// Chart rows from the {date, value} point lists
+function mergePoints(peTtm, peForward, price) {
   const dateMap = new Map()
   
   // Add P/E TTM data
@@ -46,12 +47,21 @@ function PERatioChart({ ticker, peTtm, peForward, price, compact = false }) {
   }
   
   // Convert to array and sort by date
-  const chartData = Array.from(dateMap.values())
+  return Array.from(dateMap.values())
     .map(item => ({
       ...item,
       date: item.date.split('T')[0] // Format date for display
     }))
     .sort((a, b) => new Date(a.date) - new Date(b.date))
+}
+
+// Takes the {date, value} point lists (peTtm, peForward, price), or `series`: a
+// result in the columnar encoding, decoded straight into chart rows.
+function PERatioChart({ ticker, peTtm, peForward, price, series, compact = false }) {
+  const chartData = series ? decodeChartRows(series) : mergePoints(peTtm, peForward, price)
+  const hasTtm = series ? Boolean(series.pe_ttm) : Boolean(peTtm)
+  const hasForward = series ? Boolean(series.pe_forward) : Boolean(peForward)
+  const hasPrice = series ? Boolean(series.price) : Boolean(price)
   
   // Format date for display
   const formatDate = (dateStr) => {
@@ -114,7 +124,7 @@ function PERatioChart({ ticker, peTtm, peForward, price, compact = false }) {
           {compact && <YAxis yAxisId="price" hide />}
           {!compact && <Tooltip content={<CustomTooltip />} />}
           {!compact && <Legend />}
-          {peTtm && (
+          {hasTtm && (
             <Line
               yAxisId="pe"
               type="monotone"
@@ -125,7 +135,7 @@ function PERatioChart({ ticker, peTtm, peForward, price, compact = false }) {
               dot={false}
             />
           )}
-          {peForward && (
+          {hasForward && (
             <Line
               yAxisId="pe"
               type="monotone"
@@ -137,7 +147,7 @@ function PERatioChart({ ticker, peTtm, peForward, price, compact = false }) {
               dot={false}
             />
           )}
-          {price && (
+          {hasPrice && (
             <Line
               yAxisId="price"
               type="monotone"
@@ -0,0 +1,49 @@
+// Batch results remembered across page switches, per endpoint and request
+// parameters, with the version token the server attached to each ticker. The
+// tokens are sent back as `versions`, and tickers the server reports as
+// unchanged are answered from here instead of being scored and resent.
+const remembered = new Map()
+
+function bucketFor(url, body) {
+  const { tickers, versions, ...params } = body
+  const key = `${url} ${JSON.stringify(params)}`
+  if (!remembered.has(key)) remembered.set(key, new Map())
+  return remembered.get(key)
+}
+
+// The request body plus the version tokens of the tickers we already hold
+export function withVersions(url, body) {
+  const bucket = bucketFor(url, body)
+  const versions = {}
+  for (const ticker of body.tickers || []) {
+    const entry = bucket.get(ticker)
+    if (entry) versions[ticker] = entry.version
+  }
+  return { ...body, versions }
+}
+
+// The full result for one entry of a response to withVersions(url, body)
+export function resolveResult(url, body, result) {
+  const bucket = bucketFor(url, body)
+  if (result.unchanged) {
+    const entry = bucket.get(result.ticker)
+    return entry && entry.version === result.version ? entry.result : result
+  }
+  if (result.version) bucket.set(result.ticker, { version: result.version, result })
+  else bucket.delete(result.ticker)
+  return result
+}
+
+// POST a batch request and return its JSON with unchanged tickers filled in
+export async function postBatch(url, body) {
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(withVersions(url, body))
+  })
+  const json = await response.json()
+  if (json.success && Array.isArray(json.results)) {
+    json.results = json.results.map(result => resolveResult(url, body, result))
+  }
+  return json
+}
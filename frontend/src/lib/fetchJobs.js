@@ -0,0 +1,29 @@
+// Scrapes of EPS / balance sheet data run as server-side jobs: submitting
+// returns a job id at once, and the job is polled until every fetch finished.
+const POLL_INTERVAL_MS = 1000
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms))
+
+// Fetch `kinds` ('eps', 'balance') for every ticker and resolve with the final
+// job state: { status, total, completed, failed, items: [{ ticker, kind, status, error, warning }] }.
+// onProgress, when given, is called with every state seen along the way.
+export async function runFetchJob(tickers, kinds = ['eps', 'balance'], onProgress) {
+  const response = await fetch('/api/fetch/bulk', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ tickers, kinds })
+  })
+  const submitted = await response.json()
+  if (!submitted.success) throw new Error(submitted.error || `Request failed (${response.status})`)
+
+  let job = submitted.job
+  while (true) {
+    if (onProgress) onProgress(job)
+    if (job.status === 'done') return job
+    await sleep(POLL_INTERVAL_MS)
+    const res = await fetch(`/api/fetch_jobs/${submitted.job_id}`)
+    const json = await res.json()
+    if (!json.success) throw new Error(json.error || `Request failed (${res.status})`)
+    job = json
+  }
+}
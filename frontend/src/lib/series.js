@@ -0,0 +1,39 @@
+// Decoder for the columnar P/E chart encoding (see chart_encoding.py): dates are
+// sent once as whole days since `start`, each series as one value array, and the
+// bars a P/E series has no value on as [first index, length] gap runs.
+const DAY_MS = 24 * 60 * 60 * 1000
+
+export function isColumnar(chart) {
+  return Boolean(chart && chart.encoding === 'columnar')
+}
+
+// A {values, gaps} series spread back over `length` bars, null inside gaps
+export function expandSeries(series, length) {
+  if (!series) return null
+  const out = new Array(length)
+  let next = 0
+  let v = 0
+  for (const [start, count] of series.gaps) {
+    for (; next < start; next++) out[next] = series.values[v++]
+    for (const end = start + count; next < end; next++) out[next] = null
+  }
+  for (; next < length; next++) out[next] = series.values[v++]
+  return out
+}
+
+// PERatioChart rows ({ date: 'YYYY-MM-DD', price, peTtm?, peForward? }), oldest first
+export function decodeChartRows(chart) {
+  const start = Date.parse(chart.start) // date-only strings parse as UTC midnight
+  const length = chart.days.length
+  const peTtm = expandSeries(chart.pe_ttm, length)
+  const peForward = expandSeries(chart.pe_forward, length)
+
+  const rows = new Array(length)
+  for (let i = 0; i < length; i++) {
+    const row = { date: new Date(start + chart.days[i] * DAY_MS).toISOString().slice(0, 10), price: chart.price[i] }
+    if (peTtm && peTtm[i] !== null) row.peTtm = peTtm[i]
+    if (peForward && peForward[i] !== null) row.peForward = peForward[i]
+    rows[i] = row
+  }
+  return rows
+}
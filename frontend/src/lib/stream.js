@@ -0,0 +1,31 @@
+import { withVersions, resolveResult } from './batchCache'
+
+// POST a batch request in streaming mode and call onResult for every ticker's
+// result as the server finishes it (completion order, one JSON object per line).
+// Tickers unchanged since the last call are filled in from batchCache.
+export async function streamBatch(url, body, onResult) {
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+    body: JSON.stringify(withVersions(url, body))
+  })
+  if (!response.ok) throw new Error(`Request failed (${response.status})`)
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    buffered += decoder.decode(value || new Uint8Array(), { stream: !done })
+
+    const lines = buffered.split('\n')
+    buffered = lines.pop()
+    for (const line of lines) {
+      if (line.trim()) onResult(resolveResult(url, body, JSON.parse(line)))
+    }
+
+    if (done) break
+  }
+  if (buffered.trim()) onResult(resolveResult(url, body, JSON.parse(buffered)))
+}
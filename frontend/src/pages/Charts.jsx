@@ -3,6 +3,7 @@ import PERatioChart from '../components/PERatioChart'
 import SetFilterModal from '../components/SetFilterModal'
 import LoadingBar from '../components/LoadingBar'
 import { DEFAULT_TICKERS } from '../constants'
+import { postBatch } from '../lib/batchCache'
 
 function Charts() {
   const [chartYears, setChartYears] = useState('5')
@@ -46,22 +47,15 @@ function Charts() {
     setLoading(true)
     setError('')
     try {
-      const response = await fetch('/api/batch/pe_ratios', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({
-          tickers: fetchList,
-          years: parseInt(chartYears),
-          source: 'manual',
-          include_forward: true,
-          smoothing: 0,
-          filename: 'DATA/EPS_manual.txt'
-        })
+      const data = await postBatch('/api/batch/pe_ratios', {
+        tickers: fetchList,
+        years: parseInt(chartYears),
+        source: 'manual',
+        include_forward: true,
+        smoothing: 0,
+        filename: 'DATA/EPS_manual.txt',
+        format: 'columnar'
       })
-
-      const data = await response.json()
       
       if (loadId !== currentLoadId.current) return;
 
@@ -143,9 +137,7 @@ function Charts() {
               )}
               <PERatioChart
                 ticker={item.ticker}
-                peTtm={item.pe_ttm}
-                peForward={item.pe_forward}
-                price={item.price}
+                series={item}
               />
             </div>
           ))}
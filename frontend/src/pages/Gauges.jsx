@@ -4,6 +4,8 @@ import SetFilterModal from '../components/SetFilterModal'
 import LoadingBar from '../components/LoadingBar'
 import './Gauges.css'
 import { DEFAULT_TICKERS } from '../constants'
+import { postBatch } from '../lib/batchCache'
+import { runFetchJob } from '../lib/fetchJobs'
 
 function Gauges() {
   const [tickers, setTickers] = useState(DEFAULT_TICKERS)
@@ -65,39 +67,24 @@ function Gauges() {
       // If on DE tab, bake in the fetch
       if (activeTab === 'debt-equity') {
         setFetchingBalance(true)
-        for (const ticker of fetchList) {
-          try {
-            await fetch(`/api/fetch_balance/${ticker}`, { method: 'POST' })
-          } catch (e) {
-            console.error(`Failed to fetch balance for ${ticker}`, e)
-          }
+        try {
+          await runFetchJob(fetchList, ['balance'])
+        } catch (e) {
+          console.error('Failed to fetch balance sheets', e)
         }
         setFetchingBalance(false)
       }
 
-      const peRes = await fetch('/api/batch/value_pe_avg', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ tickers: fetchList, years: parseInt(years), filename: 'DATA/EPS_manual.txt' })
-      })
-      const peJson = await peRes.json()
+      const peJson = await postBatch('/api/batch/value_pe_avg',
+        { tickers: fetchList, years: parseInt(years), filename: 'DATA/EPS_manual.txt' })
       
-      const [debtResponse, pegResponse] = await Promise.all([
-        fetch('/api/batch/debt_to_equity', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ tickers: fetchList, years: parseInt(years), filename: 'DATA/Balance_manual.txt' })
-        }),
-        fetch('/api/batch/peg_ratio', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ tickers: fetchList, years: parseInt(years), filename: 'DATA/EPS_manual.txt' })
-        })
+      const [debtJson, pegJson] = await Promise.all([
+        postBatch('/api/batch/debt_to_equity',
+          { tickers: fetchList, years: parseInt(years), filename: 'DATA/Balance_manual.txt' }),
+        postBatch('/api/batch/peg_ratio',
+          { tickers: fetchList, years: parseInt(years), filename: 'DATA/EPS_manual.txt' })
       ])
 
-      const debtJson = await debtResponse.json()
-      const pegJson = await pegResponse.json()
-
       if (loadId !== currentLoadId.current) return;
 
       let successAny = false
@@ -135,20 +122,14 @@ function Gauges() {
     const tickerList = activeTickers;
     
     let successCount = 0
-    let failCount = 0
+    let failCount = tickerList.length
 
-    for (const ticker of tickerList) {
-      try {
-        const res = await fetch(`/api/fetch_balance/${ticker}`, { method: 'POST' })
-        const data = await res.json()
-        if (data.success) {
-          successCount++
-        } else {
-          failCount++
-        }
-      } catch (err) {
-        failCount++
-      }
+    try {
+      const job = await runFetchJob(tickerList, ['balance'])
+      successCount = job.completed - job.failed
+      failCount = job.failed
+    } catch (err) {
+      console.error('Failed to fetch balance sheets', err)
     }
 
     alert(`Balance Sheet Fetch Results:\nSuccess: ${successCount}\nFailed: ${failCount}`)
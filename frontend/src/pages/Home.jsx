@@ -4,6 +4,8 @@ import ValueGaugeCompact from '../components/ValueGaugeCompact'
 import PERatioChart from '../components/PERatioChart'
 import SetFilterModal from '../components/SetFilterModal'
 import LoadingBar from '../components/LoadingBar'
+import { streamBatch } from '../lib/stream'
+import { runFetchJob } from '../lib/fetchJobs'
 import './Home.css'
 import { DEFAULT_TICKERS } from '../constants'
 
@@ -74,9 +76,7 @@ const StockCard = memo(({ item, index, expanded, onToggle, getCompanyName }) =>
             <div className="chart-thumbnail">
               <PERatioChart
                 ticker={item.ticker}
-                peTtm={item.chartData.pe_ttm}
-                peForward={item.chartData.pe_forward}
-                price={item.chartData.price}
+                series={item.chartData}
                 compact={true}
               />
             </div>
@@ -100,9 +100,7 @@ const StockCard = memo(({ item, index, expanded, onToggle, getCompanyName }) =>
             <div className="expanded-chart">
               <PERatioChart
                 ticker={item.ticker}
-                peTtm={item.chartData.pe_ttm}
-                peForward={item.chartData.pe_forward}
-                price={item.chartData.price}
+                series={item.chartData}
               />
             </div>
           )}
@@ -243,15 +241,10 @@ function Home() {
     setMissingTickers([])
     setCurrentPage(0)
     try {
-      const chunks = []
-      for (let i = 0; i < fetchList.length; i += ITEMS_PER_PAGE) {
-        chunks.push(fetchList.slice(i, i + ITEMS_PER_PAGE))
-      }
-      
-      setLoadingProgress({ current: 0, total: chunks.length })
+      setLoadingProgress({ current: 0, total: fetchList.length })
 
-      const dataMap = new Map()
       const newMissing = new Set()
+      let received = 0
 
       // Fetch live prices for new tickers up-front (non-blocking)
       const livePriceMap = new Map()
@@ -271,98 +264,63 @@ function Home() {
         console.warn('Live price fetch failed:', e)
       }
 
-      for (let i = 0; i < chunks.length; i++) {
-        const chunk = chunks[i]
-
-        const [gaugeResponse, debtResponse, pegResponse, chartResponse] = await Promise.all([
-          fetch('/api/batch/value_pe_avg', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ tickers: chunk, years: parseInt(years), filename: 'DATA/EPS_manual.txt' })
-          }),
-          fetch('/api/batch/debt_to_equity', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ tickers: chunk, years: parseInt(years), filename: 'DATA/Balance_manual.txt' })
-          }),
-          fetch('/api/batch/peg_ratio', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ tickers: chunk, years: parseInt(years), filename: 'DATA/EPS_manual.txt' })
-          }),
-          fetch('/api/batch/pe_ratios', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ tickers: chunk, years: parseInt(chartYears), source: 'manual', include_forward: true, smoothing: 0, filename: 'DATA/EPS_manual.txt' })
-          })
-        ])
-
-        const gaugeData = await gaugeResponse.json()
-        const debtData = await debtResponse.json()
-        const pegData = await pegResponse.json()
-        const chartData = await chartResponse.json()
-
-        if (gaugeData.success && debtData.success && pegData.success && chartData.success) {
-          // 1. Base Gauges (P/E)
-          gaugeData.results.forEach(item => {
-            if (item.success) {
-              const live = livePriceMap.get(item.ticker)
-              dataMap.set(item.ticker, {
-                ticker: item.ticker,
-                score: item.score_100,
-                details: item.details,
-                gaugeData: item,
-                livePrice: live?.price || null,
-                liveChange: live?.change || 0,
-                liveChangePct: live?.change_pct || 0
-              })
-            } else if (item.error_code === 'MISSING_DATA') {
-              newMissing.add(item.ticker)
-            }
-          })
+      // One streamed call returns the P/E, D/E, PEG and chart results, one ticker at a
+      // time as the server finishes them, so cards appear without waiting for a whole page
+      await streamBatch('/api/batch/dashboard', {
+        tickers: fetchList,
+        years: parseInt(years),
+        chart_years: parseInt(chartYears),
+        include_forward: true,
+        smoothing: 0,
+        eps_filename: 'DATA/EPS_manual.txt',
+        balance_filename: 'DATA/Balance_manual.txt',
+        format: 'columnar',
+        max_points: 250 // thumbnails and the expanded chart are a few hundred pixels wide
+      }, ({ ticker, value_pe_avg: gauge, debt_to_equity: debt, peg_ratio: peg, pe_ratios: chart }) => {
+        if (loadId !== currentLoadId.current) return
+
+        // 1. Base Gauges (P/E)
+        if (gauge.success) {
+          const live = livePriceMap.get(ticker)
+          const entry = {
+            ticker,
+            score: gauge.score_100,
+            details: gauge.details,
+            gaugeData: gauge,
+            livePrice: live?.price || null,
+            liveChange: live?.change || 0,
+            liveChangePct: live?.change_pct || 0
+          }
 
           // 2. Debt
-          debtData.results.forEach(item => {
-            if (item.success && dataMap.has(item.ticker)) {
-              dataMap.get(item.ticker).debtScore = item.score_100
-              dataMap.get(item.ticker).debtDetails = item.details
-            }
-          })
+          if (debt.success) {
+            entry.debtScore = debt.score_100
+            entry.debtDetails = debt.details
+          }
 
           // 3. PEG
-          pegData.results.forEach(item => {
-            if (item.success && dataMap.has(item.ticker)) {
-              dataMap.get(item.ticker).pegScore = item.score_100
-              dataMap.get(item.ticker).pegDetails = item.details
-            }
-          })
+          if (peg.success) {
+            entry.pegScore = peg.score_100
+            entry.pegDetails = peg.details
+          }
 
           // 4. Charts
-          chartData.results.forEach(item => {
-            if (item.success && dataMap.has(item.ticker)) {
-              dataMap.get(item.ticker).chartData = item
-            }
-          })
+          if (chart.success) {
+            entry.chartData = chart
+          }
 
-          if (loadId !== currentLoadId.current) return;
-
-          const chunkFinalData = Array.from(dataMap.values()).filter(item => item.score !== undefined)
-          setAllData(prev => {
-            // Safety measure: Ensure we only add tickers that are STILL requested in activeTickers
-            // (If the activeTickers changed right after this fetch, another loadAllData is handling it, but just in case)
-            const filtered = prev.filter(d => !dataMap.has(d.ticker))
-            return [...filtered, ...chunkFinalData]
-          })
+          setAllData(prev => [...prev.filter(d => d.ticker !== ticker), entry])
+        } else if (gauge.error_code === 'MISSING_DATA') {
+          newMissing.add(ticker)
           setMissingTickers(Array.from(newMissing))
-        } else {
-          setError('Failed to load segment of data')
         }
-        
-        setLoadingProgress(prev => ({ ...prev, current: i + 1 }))
 
-        // Unlock the submit button loading state after first chunk so user sees data immediately
-        if (i === 0 && loadId === currentLoadId.current) setLoading(false)
-      }
+        received += 1
+        setLoadingProgress(prev => ({ ...prev, current: received }))
+
+        // Unlock the submit button loading state after the first ticker so user sees data immediately
+        if (received === 1) setLoading(false)
+      })
     } catch (err) {
       if (loadId === currentLoadId.current) setError(`Error: ${err.message}`)
     } finally {
@@ -376,15 +334,11 @@ function Home() {
   const handleFetchData = async (ticker) => {
     setFetchingTicker(ticker)
     try {
-      const [epsRes, balRes] = await Promise.all([
-        fetch(`/api/fetch_eps/${ticker}`, { method: 'POST' }),
-        fetch(`/api/fetch_balance/${ticker}`, { method: 'POST' })
-      ])
-
-      const epsData = await epsRes.json()
-      const balData = await balRes.json()
+      const job = await runFetchJob([ticker], ['eps', 'balance'])
+      const epsData = job.items.find(item => item.kind === 'eps') || {}
+      const balData = job.items.find(item => item.kind === 'balance') || {}
 
-      if (epsData.success && balData.success) {
+      if (job.failed === 0) {
         let message = `Data fetched for ${ticker} (EPS & Balance Sheet).`
         if (epsData.warning) message += `\n\n⚠️ EPS: ${epsData.warning}`
         alert(message)
@@ -601,6 +555,7 @@ function Home() {
         isLoading={isBackgroundLoading} 
         currentChunk={loadingProgress.current} 
         totalChunks={loadingProgress.total} 
+        unit="tickers"
       />
     </div>
   )
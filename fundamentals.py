@@ -0,0 +1,166 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+import sqlite_store
+from manual_parser import TickerFrames, empty_table, load_balance_frames, load_eps_frames, replace_tickers
+
+EPS_FILE = "DATA/EPS_manual.txt"
+BALANCE_FILE = "DATA/Balance_manual.txt"
+
+
+def db_kind(filename: str):
+    """The kind ("eps" or "balance") of a file whose data the SQLite backend holds, else None."""
+    if sqlite_store.enabled():
+        path = os.path.abspath(filename)
+        for kind, default in (("eps", EPS_FILE), ("balance", BALANCE_FILE)):
+            if path == os.path.abspath(default):
+                return kind
+    return None
+
+
+class FundamentalsStore:
+    """
+    Process-wide cache of the parsed manual fundamentals files.
+
+    Each file is parsed once and re-parsed only when its mtime or size changes.
+    Cold processes load the memory-mapped .npz snapshot next to the text file
+    instead of re-parsing it (see manual_parser.load_table).
+    Callers get read-only per-ticker frames; `.copy()` before adding columns.
+
+    With the SQLite backend enabled (sqlite_store.DB_FILE), the default files'
+    data comes from the database instead. When its write counter for that kind
+    changes, only the tickers written since are re-read (sqlite_store.changed_tickers).
+    Single-ticker reads (ticker_frame) fetch just that ticker's rows and never
+    load the whole table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (kind, abspath) -> (signature, frames)
+        self._tickers = {}  # kind -> (signature, {ticker: frame or None}), database only
+        self._tickers_lock = threading.Lock()  # So single-ticker reads don't wait on a table load
+
+    @staticmethod
+    def _signature(path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, kind: str, filename: str):
+        path = os.path.abspath(filename)
+        in_db = db_kind(path) == kind
+        sig = sqlite_store.data_version(kind) if in_db else self._signature(path)
+        key = (kind, path)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == sig:
+            return entry[1]
+
+        with self._lock:
+            # Another thread may have reparsed while we waited
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                return entry[1]
+
+            if in_db:
+                changed = sqlite_store.changed_tickers(kind, entry[0]) if entry is not None else None
+                if changed is None:
+                    frames = TickerFrames(sqlite_store.load_table(kind))
+                else:
+                    update = sqlite_store.load_table(kind, tickers=changed)
+                    frames = TickerFrames(replace_tickers(entry[1].table, changed, update))
+            elif sig is None:
+                if kind == "eps":
+                    raise FileNotFoundError(filename)
+                frames = TickerFrames(empty_table(("Debt", "Equity")))
+            elif kind == "eps":
+                frames = load_eps_frames(path)
+            else:
+                frames = load_balance_frames(path)
+
+            self._entries[key] = (sig, frames)
+            return frames
+
+    def ticker_frame(self, kind: str, filename: str, ticker: str):
+        """One ticker's frame, or None if the ticker has no data."""
+        if db_kind(filename) != kind:
+            return self._load(kind, filename).get(ticker)
+        sig = sqlite_store.data_version(kind)
+        with self._tickers_lock:
+            seen, frames = self._tickers.get(kind, (None, {}))
+            if seen != sig:
+                changed = sqlite_store.changed_tickers(kind, seen) if seen is not None else None
+                if changed is None:
+                    frames = {}
+                else:
+                    frames = {t: frame for t, frame in frames.items() if t not in changed}
+                self._tickers[kind] = (sig, frames)
+            if ticker not in frames:
+                frames[ticker] = sqlite_store.ticker_rows(kind, ticker)
+            return frames[ticker]
+
+    def digest(self, kind: str, filename: str, ticker: str) -> str:
+        """Content hash of one ticker's data, or "" if it has none (see TickerFrames.digest)."""
+        if db_kind(filename) != kind:
+            return self._load(kind, filename).digest(ticker)
+        frame = self.ticker_frame(kind, filename, ticker)
+        if frame is None:
+            return ""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.ascontiguousarray(frame.index.values).tobytes())
+        h.update(np.ascontiguousarray(frame.values).tobytes())
+        return h.hexdigest()
+
+    def eps_data(self, filename: str = EPS_FILE):
+        return self._load("eps", filename)
+
+    def balance_data(self, filename: str = BALANCE_FILE):
+        return self._load("balance", filename)
+
+    def version(self, filename: str):
+        """
+        (mtime_ns, size) of the file as last seen, or None if it doesn't exist.
+        The database's write counter instead when the database serves the file.
+        """
+        kind = db_kind(filename)
+        if kind is not None:
+            return sqlite_store.data_version(kind)
+        return self._signature(os.path.abspath(filename))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with self._tickers_lock:
+            self._tickers.clear()
+
+
+_store = FundamentalsStore()
+
+
+def get_store() -> FundamentalsStore:
+    return _store
+
+
+def get_eps_data(filename: str = EPS_FILE):
+    """Read-only mapping of {ticker: DataFrame(index=Date, columns=[EPS])}."""
+    return _store.eps_data(filename)
+
+
+def get_balance_data(filename: str = BALANCE_FILE):
+    """Read-only mapping of {ticker: DataFrame(index=Date, columns=[Debt, Equity])}."""
+    return _store.balance_data(filename)
+
+
+def get_eps(ticker: str, filename: str = EPS_FILE):
+    """EPS frame for one ticker, or None if the ticker isn't in the file."""
+    return _store.ticker_frame("eps", filename, ticker)
+
+
+def get_balance(ticker: str, filename: str = BALANCE_FILE):
+    """Balance frame for one ticker, or None if the ticker isn't in the file."""
+    return _store.ticker_frame("balance", filename, ticker)
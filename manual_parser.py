@@ -0,0 +1,458 @@
+"""
+Single-pass parser for the manual fundamentals text format shared by
+EPS_manual.txt and Balance_manual.txt:
+
+    TICKER
+    2025-12-31	$0.92                      (EPS file)
+    2025-12-31	Debt:16976	Equity:26615    (Balance file)
+    END
+
+The whole file is tokenized at once into flat columnar arrays (ticker codes,
+datetime64 dates, float values) and split per ticker with one sort, instead of
+building a DataFrame per block.
+
+Parsed tables are also compiled to a sidecar snapshot next to the text file
+(EPS_manual.txt -> EPS_manual.npz) that is memory-mapped on load. The text
+file stays the source of truth; the snapshot is rebuilt whenever the text
+file's mtime or size no longer matches the one recorded in it.
+"""
+import csv
+import hashlib
+import io
+import os
+import struct
+import zipfile
+from collections.abc import Mapping
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Tokens kept per line (date + value tokens); any further tokens are dropped.
+_MAX_TOKENS = 8
+
+# Bump when the snapshot layout changes so old sidecars get rebuilt.
+SNAPSHOT_FORMAT = 2
+
+
+class ManualTable(NamedTuple):
+    """
+    Columnar view of a parsed manual file.
+
+    Rows are sorted by (ticker code, date) with one row per date.
+    Rows for tickers[i] are values[offsets[i]:offsets[i + 1]].
+    """
+    tickers: np.ndarray   # str, one per ticker
+    offsets: np.ndarray   # int64, len(tickers) + 1
+    dates: np.ndarray     # datetime64[ns]
+    values: np.ndarray    # float64, shape (n,) for EPS or (n, 2) for Debt/Equity
+    columns: tuple
+
+    def __len__(self):
+        return len(self.tickers)
+
+
+def _read_tokens(source, options: dict) -> pd.DataFrame:
+    try:
+        return pd.read_csv(
+            source,
+            sep=r"\s+",
+            header=None,
+            names=range(_MAX_TOKENS),
+            quoting=csv.QUOTE_NONE,
+            skip_blank_lines=True,
+            engine="c",
+            **options,
+        )
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame(columns=range(_MAX_TOKENS), dtype=object)
+
+
+def _tokenize(filename: str, replace=(), **options) -> pd.DataFrame:
+    """
+    Split every non-blank line of the file into whitespace tokens with the C reader,
+    after the given (old, new) text replacements. `options` go to read_csv.
+    """
+    text = None
+    if replace:
+        with open(filename) as f:
+            text = f.read()
+        for old, new in replace:
+            text = text.replace(old, new)
+    try:
+        return _read_tokens(filename if text is None else io.StringIO(text), options)
+    except pd.errors.ParserError:
+        # Some line has more than _MAX_TOKENS tokens: keep the first ones of every line
+        if text is None:
+            with open(filename) as f:
+                text = f.read()
+        text = "\n".join(" ".join(line.split()[:_MAX_TOKENS]) for line in text.splitlines())
+        return _read_tokens(io.StringIO(text), options)
+
+
+def _rows_by_ticker(first: np.ndarray, single: np.ndarray):
+    """
+    Assign every data row to the ticker block it sits in.
+
+    A block starts at an alphabetic ticker line and ends at END, the next
+    ticker line or EOF. When a ticker appears in several blocks, the last
+    block with data wins, matching the old "later block replaces earlier"
+    behaviour.
+
+    `first` is every line's first token (object array), `single` marks lines
+    with no other token. Returns (row mask, ticker names, integer code per
+    selected row).
+    """
+    is_end = first == "END"
+    # Only the handful of one-token lines can be ticker headers
+    candidates = np.flatnonzero(single & ~is_end)
+    is_ticker = np.zeros(len(first), dtype=bool)
+    is_ticker[candidates] = np.fromiter((first[i].isalpha() for i in candidates), dtype=bool, count=len(candidates))
+    is_marker = is_ticker | is_end
+
+    block = np.cumsum(is_marker) - 1
+    block_is_ticker = is_ticker[is_marker]
+    block_name = first[is_marker]
+
+    in_block = (block >= 0) & ~is_marker
+    in_block[in_block] = block_is_ticker[block[in_block]]
+    rows = in_block & ~single
+
+    names = block_name[block[rows]]
+    codes, tickers = pd.factorize(names)
+
+    # Keep only each ticker's last block
+    row_block = block[rows]
+    last_block = np.full(len(tickers), -1, dtype=np.int64)
+    np.maximum.at(last_block, codes, row_block)
+    keep = row_block == last_block[codes]
+
+    sel = np.flatnonzero(rows)[keep]
+    mask = np.zeros(len(first), dtype=bool)
+    mask[sel] = True
+    return mask, np.asarray(tickers, dtype=str), codes[keep]
+
+
+def _group(tickers, codes, dates, values, columns) -> ManualTable:
+    """Sort rows by (code, date), drop duplicate dates keeping the last, build offsets."""
+    order = np.lexsort((np.arange(len(codes)), dates, codes))
+    codes, dates, values = codes[order], dates[order], values[order]
+
+    if len(codes):
+        # Within a run of equal (code, date) the original file order is preserved,
+        # so the last row of the run is the one that appeared last in the file.
+        last = np.ones(len(codes), dtype=bool)
+        last[:-1] = (codes[1:] != codes[:-1]) | (dates[1:] != dates[:-1])
+        codes, dates, values = codes[last], dates[last], values[last]
+
+    offsets = np.searchsorted(codes, np.arange(len(tickers) + 1)).astype(np.int64)
+    for arr in (offsets, dates, values):
+        arr.flags.writeable = False
+    return ManualTable(tickers, offsets, dates, values, columns)
+
+
+def _column(tokens: pd.DataFrame, col: int, mask: np.ndarray) -> np.ndarray:
+    """Selected rows of one token column as a fixed-width str array for np.strings ops."""
+    return tokens[col].to_numpy(dtype=object)[mask].astype(str)
+
+
+def _to_float(raw: np.ndarray, strip: tuple) -> np.ndarray:
+    if not len(raw):
+        return np.zeros(0, dtype=np.float64)  # np.strings.replace fails on empty arrays
+    for chars in strip:
+        raw = np.strings.replace(raw, chars, "")
+    return raw.astype(np.float64)
+
+
+def _parse_dates(raw: np.ndarray) -> np.ndarray:
+    return pd.to_datetime(raw, format="ISO8601").to_numpy(dtype="datetime64[ns]")
+
+
+def parse_eps_file(filename: str) -> ManualTable:
+    """Parse an EPS_manual.txt-format file into a ManualTable with an EPS column."""
+    tokens = _tokenize(filename, dtype=str, na_filter=False)
+    mask, tickers, codes = _rows_by_ticker(tokens[0].to_numpy(dtype=object), tokens[1].to_numpy(dtype=object) == "")
+
+    dates = _parse_dates(_column(tokens, 0, mask))
+    values = _to_float(_column(tokens, 1, mask), ("$", ","))
+    return _group(tickers, codes, dates, values, ("EPS",))
+
+
+def parse_balance_file(filename: str) -> ManualTable:
+    """Parse a Balance_manual.txt-format file into a ManualTable with Debt/Equity columns."""
+    # "Debt:" / "Equity:" become label tokens followed by their value, so the
+    # C reader parses the values as floats instead of building a string per token.
+    tokens = _tokenize(filename, (("Debt:", " Debt "), ("Equity:", " Equity ")),
+                       thousands=",", keep_default_na=False, na_values=[""])
+    first = tokens[0].to_numpy(dtype=object)
+    mask, tickers, codes = _rows_by_ticker(first, tokens[1].isna().to_numpy())
+
+    values = np.zeros((int(mask.sum()), 2), dtype=np.float64)   # A missing Debt/Equity is 0
+    for col in range(1, _MAX_TOKENS - 1):
+        if tokens[col].dtype != object:
+            continue  # Only numbers in this column, so no labels
+        label = tokens[col].to_numpy()[mask]
+        number = tokens[col + 1].to_numpy()[mask]
+        # Columns left to right, so a repeated label's last value wins
+        for j, name in enumerate(("Debt", "Equity")):
+            hit = label == name
+            if hit.any():
+                # A value column that also holds labels comes back as strings
+                values[hit, j] = number[hit] if number.dtype != object else _to_float(number[hit].astype(str), (",",))
+
+    dates = _parse_dates(first[mask])
+    return _group(tickers, codes, dates, values, ("Debt", "Equity"))
+
+
+class TickerFrames(Mapping):
+    """
+    Read-only {ticker: DataFrame(index=Date, columns=table.columns)} over a ManualTable.
+
+    Frames are zero-copy views over the table's read-only arrays and are built on
+    first access, so callers that only touch a few tickers never pay for the rest.
+    """
+
+    def __init__(self, table: ManualTable):
+        self.table = table
+        self._codes = {str(t): i for i, t in enumerate(table.tickers)}
+        self._frames = {}
+        self._derived = {}
+
+    def _build(self, code: int) -> pd.DataFrame:
+        table = self.table
+        start, end = table.offsets[code], table.offsets[code + 1]
+        index = pd.DatetimeIndex(table.dates[start:end], name="Date")
+        values = table.values[start:end]
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        return pd.DataFrame(values, index=index, columns=list(table.columns), copy=False)
+
+    def __getitem__(self, ticker: str) -> pd.DataFrame:
+        frame = self._frames.get(ticker)
+        if frame is None:
+            frame = self._build(self._codes[ticker])
+            self._frames[ticker] = frame
+        return frame
+
+    def __iter__(self):
+        return iter(self._codes)
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __contains__(self, ticker):
+        return ticker in self._codes
+
+    def code(self, ticker: str) -> int:
+        """Position of a ticker in the table, or -1 if it isn't in it."""
+        return self._codes.get(ticker, -1)
+
+    def digest(self, ticker: str) -> str:
+        """
+        Content hash of one ticker's block (its dates and values), or "" if the
+        ticker isn't in the table. Unchanged when only other tickers are edited.
+        """
+        digests = self.derived("digests", lambda frames: {})
+        digest = digests.get(ticker)
+        if digest is None:
+            code = self.code(ticker)
+            if code < 0:
+                digest = ""
+            else:
+                table = self.table
+                start, end = table.offsets[code], table.offsets[code + 1]
+                h = hashlib.blake2b(digest_size=16)
+                h.update(np.ascontiguousarray(table.dates[start:end]).tobytes())
+                h.update(np.ascontiguousarray(table.values[start:end]).tobytes())
+                digest = h.hexdigest()
+            digests[ticker] = digest
+        return digest
+
+    def row_index(self, tickers):
+        """
+        (offsets, rows) selecting the table rows of the given tickers, in the order
+        given: ticker i's rows are table rows rows[offsets[i]:offsets[i + 1]].
+        Tickers not in the table get an empty range.
+        """
+        table = self.table
+        codes = np.array([self.code(t) for t in tickers], dtype=np.int64)
+        known = codes >= 0
+        starts = np.zeros(len(codes), dtype=np.int64)
+        sizes = np.zeros(len(codes), dtype=np.int64)
+        starts[known] = table.offsets[codes[known]]
+        sizes[known] = table.offsets[codes[known] + 1] - starts[known]
+
+        offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        rows = np.repeat(starts - offsets[:-1], sizes) + np.arange(offsets[-1])
+        return offsets, rows
+
+    def rows_for(self, tickers) -> ManualTable:
+        """
+        Columnar rows of the given tickers, in the order given, as one ManualTable.
+        Tickers not in the table get an empty row range (offsets[i] == offsets[i + 1]).
+        """
+        tickers = list(tickers)
+        offsets, rows = self.row_index(tickers)
+        table = self.table
+        return ManualTable(np.asarray(tickers, dtype=str), offsets, table.dates[rows], table.values[rows], table.columns)
+
+    def derived(self, name: str, build):
+        """
+        build(self), computed on first use and kept as long as this mapping.
+        The fundamentals store replaces the mapping when the file changes, so
+        values derived from the whole table are computed once per file version.
+        """
+        value = self._derived.get(name)
+        if value is None:
+            value = self._derived.setdefault(name, build(self))
+        return value
+
+
+def group_ids(offsets: np.ndarray) -> np.ndarray:
+    """Ticker position of every row of a table with the given offsets."""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def empty_table(columns: tuple) -> ManualTable:
+    """A ManualTable with no tickers, for a fundamentals file that doesn't exist."""
+    values = np.zeros((0, len(columns)) if len(columns) > 1 else 0, dtype=np.float64)
+    return _group(np.array([], dtype=str), np.array([], dtype=np.int64),
+                  np.array([], dtype="datetime64[ns]"), values, columns)
+
+
+def table_from_rows(row_tickers, dates, values, columns) -> ManualTable:
+    """A ManualTable from flat per-row arrays (e.g. a database query), same rules as the file parsers."""
+    tickers, codes = np.unique(np.asarray(row_tickers, dtype=str), return_inverse=True)
+    return _group(tickers, codes.astype(np.int64), np.asarray(dates, dtype="datetime64[ns]"),
+                  np.asarray(values, dtype=np.float64), columns)
+
+
+def replace_tickers(table: ManualTable, tickers, update: ManualTable) -> ManualTable:
+    """
+    `table` with the rows of `tickers` dropped and the rows of `update` added
+    in their place, without touching the other tickers' rows.
+    """
+    drop = np.isin(table.tickers, np.asarray(list(tickers), dtype=str))
+    keep_rows = np.repeat(~drop, np.diff(table.offsets))
+    merged = np.unique(np.concatenate([np.asarray(table.tickers, dtype=str)[~drop],
+                                       np.asarray(update.tickers, dtype=str)]))
+    codes = np.concatenate([
+        np.repeat(np.searchsorted(merged, table.tickers), np.diff(table.offsets))[keep_rows],
+        np.repeat(np.searchsorted(merged, update.tickers), np.diff(update.offsets)),
+    ]).astype(np.int64)
+    return _group(merged, codes, np.concatenate([table.dates[keep_rows], update.dates]),
+                  np.concatenate([table.values[keep_rows], update.values]), table.columns)
+
+
+def to_frames(table: ManualTable) -> dict:
+    """Eagerly split a ManualTable into a plain {ticker: DataFrame} dict."""
+    frames = TickerFrames(table)
+    return {ticker: frames[ticker] for ticker in frames}
+
+
+def snapshot_path(filename: str) -> str:
+    """Sidecar snapshot path for a manual text file."""
+    return os.path.splitext(filename)[0] + ".npz"
+
+
+def _source_signature(filename: str):
+    st = os.stat(filename)
+    return np.array([SNAPSHOT_FORMAT, st.st_mtime_ns, st.st_size], dtype=np.int64)
+
+
+def save_snapshot(table: ManualTable, path: str, source) -> None:
+    """Write the table as an uncompressed .npz (so members can be mmapped), atomically."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            source=np.asarray(source, dtype=np.int64),
+            tickers=np.asarray(table.tickers, dtype=str),
+            offsets=table.offsets,
+            dates=table.dates.view(np.int64),
+            values=table.values,
+            columns=np.asarray(table.columns, dtype=str),
+        )
+    os.replace(tmp, path)
+
+
+def _mmap_npz(path: str) -> dict:
+    """
+    Map every member of an uncompressed .npz straight from the file.
+    np.load ignores mmap_mode for .npz archives, so locate each stored .npy
+    payload inside the zip and wrap it in an ndarray over one shared memmap.
+    """
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+
+    arrays = {}
+    for info in infos:
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{path}: member {info.filename} is compressed")
+        name_len, extra_len = struct.unpack("<HH", bytes(buf[info.header_offset + 26:info.header_offset + 30]))
+        start = info.header_offset + 30 + name_len + extra_len
+
+        header = io.BytesIO(bytes(buf[start:start + min(info.file_size, 4096)]))
+        version = np.lib.format.read_magic(header)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+        arrays[info.filename[:-4]] = np.ndarray(
+            shape, dtype=dtype, buffer=buf, offset=start + header.tell(),
+            order="F" if fortran_order else "C",
+        )
+    return arrays
+
+
+def load_snapshot(path: str, source=None):
+    """
+    Load a snapshot written by save_snapshot as a read-only, memory-mapped ManualTable.
+    Returns None if the file is missing, unreadable or recorded for a different source.
+    """
+    try:
+        arrays = _mmap_npz(path)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    if source is not None and not np.array_equal(arrays.get("source"), source):
+        return None
+    return ManualTable(
+        tickers=arrays["tickers"],
+        offsets=arrays["offsets"],
+        dates=arrays["dates"].view("datetime64[ns]"),
+        values=arrays["values"],
+        columns=tuple(str(c) for c in arrays["columns"]),
+    )
+
+
+def load_table(filename: str, parse) -> ManualTable:
+    """
+    ManualTable for a text file, served from its snapshot when that is current.
+    Otherwise parse the text with `parse` and rebuild the snapshot.
+    """
+    source = _source_signature(filename)
+    path = snapshot_path(filename)
+
+    table = load_snapshot(path, source)
+    if table is not None:
+        return table
+
+    table = parse(filename)
+    try:
+        save_snapshot(table, path, source)
+    except OSError as e:
+        # Read-only data dir, or (on Windows) the old snapshot is still mapped
+        print(f"Could not write fundamentals snapshot {path}: {e}")
+    return table
+
+
+def load_eps_frames(filename: str) -> TickerFrames:
+    """{ticker: DataFrame(index=Date, columns=[EPS])} for an EPS_manual.txt-format file."""
+    return TickerFrames(load_table(filename, parse_eps_file))
+
+
+def load_balance_frames(filename: str) -> TickerFrames:
+    """{ticker: DataFrame(index=Date, columns=[Debt, Equity])} for a Balance_manual.txt-format file."""
+    return TickerFrames(load_table(filename, parse_balance_file))
@@ -0,0 +1,204 @@
+"""
+Upserts into the manual fundamentals files (EPS_manual.txt, Balance_manual.txt).
+
+Fetches used to append a new TICKER ... END block every time, so a ticker
+fetched ten times had ten blocks that every parse read and then discarded all
+but the last of. Here a write replaces the ticker's block instead (or merges
+into it, newest value per date winning) and drops its older blocks, so the
+file grows with unique data rather than with fetch count.
+
+A byte-offset index of the blocks ({ticker: [(start, end), ...]}), cached per
+file mtime/size, lets a write splice the new blocks in while copying every
+other byte of the file unchanged. Writes hold the file's cross-process lock and
+go through atomic_files.write_bytes (temp file + os.replace), so readers see
+either the old or the new file, never a half-written one.
+
+compact() rewrites a file keeping only the block each ticker's data is read
+from (see manual_parser._rows_by_ticker), for files that already piled up:
+
+    python manual_writer.py DATA/EPS_manual.txt DATA/Balance_manual.txt
+"""
+import os
+import re
+import sys
+
+import atomic_files
+
+# A ticker header: one alphabetic token alone on its line (END closes a block)
+_HEADER = re.compile(rb"^[ \t]*([A-Za-z]+)[ \t]*\r?$", re.MULTILINE)
+
+_index_cache = {}  # abspath -> ((mtime_ns, size), index)
+
+
+def _signature(path: str):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _scan(data: bytes) -> dict:
+    """{ticker: [(start, end), ...]} byte spans of every block, in file order."""
+    index = {}
+    headers = [m for m in _HEADER.finditer(data) if m.group(1) != b"END"]
+    for n, m in enumerate(headers):
+        limit = headers[n + 1].start() if n + 1 < len(headers) else len(data)
+        end = data.find(b"\nEND", m.end(), limit)
+        if end == -1:
+            end = limit
+        else:
+            # Through the END line and its newline
+            newline = data.find(b"\n", end + 4, limit)
+            end = limit if newline == -1 else newline + 1
+        index.setdefault(m.group(1).decode(), []).append((m.start(), end))
+    return index
+
+
+def block_index(filename: str, data: bytes = None) -> dict:
+    """
+    Byte spans of every ticker block in filename, {ticker: [(start, end), ...]}.
+    Rescanned only when the file's mtime or size changed; pass `data` when the
+    file's bytes are already in hand.
+    """
+    path = os.path.abspath(filename)
+    sig = _signature(path)
+    cached = _index_cache.get(path)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    index = _scan(data)
+    _index_cache[path] = (sig, index)
+    return index
+
+
+def _data_lines(block: bytes) -> list:
+    """Data lines of a block (no header, END or blank lines)."""
+    lines = block.decode().splitlines()[1:]
+    return [line.strip() for line in lines if line.strip() and line.strip() != "END"]
+
+
+def _live_span(data: bytes, spans: list):
+    """The span the parser reads a ticker from: its last block with data (else its last block)."""
+    for span in reversed(spans):
+        if _data_lines(data[span[0]:span[1]]):
+            return span
+    return spans[-1]
+
+
+def _merged(old_lines: list, new_lines: list) -> list:
+    """Union of two blocks' lines by date (first token), new lines winning, newest date first."""
+    by_date = {}
+    for line in old_lines + list(new_lines):
+        by_date[line.split()[0]] = line
+    return [by_date[date] for date in sorted(by_date, reverse=True)]
+
+
+def _block_text(ticker: str, lines) -> bytes:
+    return (f"{ticker}\n" + "".join(f"{line}\n" for line in lines) + "END\n").encode()
+
+
+def _skip_blank(data: bytes, pos: int) -> int:
+    while pos < len(data) and data[pos:pos + 1] in b"\r\n \t":
+        pos += 1
+    return pos
+
+
+def _rewrite(path: str, data: bytes, index: dict, replacements: dict) -> None:
+    """
+    Write data with each ticker in `replacements` ({ticker: block bytes})
+    written where its first block was (appended if new) and its other blocks
+    dropped. Everything else is copied byte for byte.
+    """
+    cuts = []  # (start, end, bytes to put there)
+    for ticker, block in replacements.items():
+        spans = index.get(ticker)
+        if spans:
+            cuts.append((spans[0][0], spans[0][1], block))
+            # Dropped blocks take the blank lines after them along
+            cuts.extend((start, _skip_blank(data, end), b"") for start, end in spans[1:])
+    cuts.sort()
+
+    pieces, pos = [], 0
+    for start, end, block in cuts:
+        pieces.append(data[pos:start])
+        pieces.append(block)
+        pos = end
+    pieces.append(data[pos:])
+
+    new = [block for ticker, block in replacements.items() if not index.get(ticker)]
+    if new:
+        if data and not data.endswith(b"\n"):
+            pieces.append(b"\n")
+        for block in new:
+            pieces.append(b"\n" + block)
+    atomic_files.write_bytes(path, pieces)
+
+
+def upsert_blocks(blocks: dict, filename: str, merge: bool = False, delete_empty: bool = False):
+    """
+    Write {ticker: data_lines} into filename, one block per ticker, replacing
+    the ticker's existing blocks (merge=True keeps existing dates the new lines
+    don't cover). Tickers with no data lines are left as they are, as the
+    parser ignored the empty blocks appends used to add; delete_empty=True
+    replaces their blocks with an empty one instead. Creates the file if
+    needed. Returns (success, error) like scraper.append_to_file.
+    """
+    path = os.path.abspath(filename)
+    try:
+        with atomic_files.file_lock(path):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                index = block_index(path, data)
+            except FileNotFoundError:
+                data, index = b"", {}
+
+            replacements = {}
+            for ticker, lines in blocks.items():
+                ticker = ticker.upper()
+                lines = [line.strip() for line in lines if line.strip()]
+                if not lines and not delete_empty:
+                    continue
+                if merge and index.get(ticker):
+                    start, end = _live_span(data, index[ticker])
+                    lines = _merged(_data_lines(data[start:end]), lines)
+                replacements[ticker] = _block_text(ticker, lines)
+            if replacements:
+                _rewrite(path, data, index, replacements)
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
+
+def compact(filename: str) -> dict:
+    """
+    Rewrite filename with one block per ticker: the one its data is read from,
+    without repeated dates (the last line for a date wins, as in the parser).
+    Returns {"tickers", "blocks_before", "bytes_before", "bytes_after"}.
+    """
+    path = os.path.abspath(filename)
+    with atomic_files.file_lock(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        index = block_index(path, data)
+        replacements = {}
+        for ticker, spans in index.items():
+            start, end = _live_span(data, spans)
+            by_date = {}
+            for line in _data_lines(data[start:end]):
+                by_date[line.split()[0]] = line
+            replacements[ticker] = _block_text(ticker, by_date.values())
+        _rewrite(path, data, index, replacements)
+    return {
+        "tickers": len(index),
+        "blocks_before": sum(len(spans) for spans in index.values()),
+        "bytes_before": len(data),
+        "bytes_after": os.path.getsize(path),
+    }
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or ["DATA/EPS_manual.txt", "DATA/Balance_manual.txt"]:
+        stats = compact(name)
+        print(f"{name}: {stats['blocks_before']} blocks -> {stats['tickers']}, "
+              f"{stats['bytes_before']} -> {stats['bytes_after']} bytes")
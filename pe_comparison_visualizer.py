@@ -7,41 +7,17 @@ from typing import Dict, List, Tuple, Optional
 import urllib.request
 import io
 import warnings
+from fundamentals import get_eps_data
+from eps_series import series_for
 warnings.filterwarnings('ignore')
 
 
 def load_manual_eps(filename: str = "EPS_manual.txt") -> Dict[str, pd.DataFrame]:
     """
     Parse EPS_manual.txt into a dict of {ticker: DataFrame(index=Date, columns=[EPS])}.
+    Backed by the shared fundamentals store; frames are read-only.
     """
-    eps_data = {}
-    current_ticker = None
-    rows = []
-
-    with open(filename, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line == "END":
-                if current_ticker and rows:
-                    df = pd.DataFrame(rows, columns=["Date", "EPS"])
-                    df["Date"] = pd.to_datetime(df["Date"])
-                    df["EPS"] = df["EPS"].replace(r"[\$,]", "", regex=True).astype(float)
-                    df = df.set_index("Date").sort_index()
-                    eps_data[current_ticker] = df
-                current_ticker, rows = None, []
-                continue
-            if line.isalpha():
-                current_ticker = line.strip()
-                rows = []
-            else:
-                parts = line.split()
-                if len(parts) >= 2:
-                    date = parts[0]
-                    eps = parts[1]
-                    rows.append([date, eps])
-    return eps_data
+    return get_eps_data(filename)
 
 
 def get_stock_price_history(ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
@@ -118,12 +94,9 @@ def calculate_pe_series(ticker: str, start_date: str, end_date: str,
     if price_hist.empty:
         return pd.Series()
     
-    # Get EPS data and calculate TTM EPS
-    eps_df = eps_data[ticker].copy()
-    eps_df['TTM_EPS'] = eps_df['EPS'].rolling(4, min_periods=1).sum()
-    
-    # Align EPS data with price data
-    aligned_eps = eps_df['TTM_EPS'].reindex(price_hist.index, method='ffill')
+    # TTM EPS in effect on each trading day
+    aligned_eps = pd.Series(series_for(eps_data).align(ticker, price_hist.index.to_numpy(dtype='datetime64[ns]')),
+                            index=price_hist.index)
     
     # Calculate P/E ratios
     pe_series = price_hist['Close'] / aligned_eps
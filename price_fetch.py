@@ -0,0 +1,137 @@
+"""
+Concurrent price acquisition for batch endpoints.
+
+All Yahoo requests share one pooled keep-alive requests.Session, and a
+per-host semaphore caps how many run against the same host at once.
+prefetch_prices() warms the price cache for every ticker of a batch that is
+missing or stale, using a bounded thread pool, so the per-ticker scoring loop
+that follows runs entirely against warm data.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+YAHOO_CHART_URL = "https://query2.finance.yahoo.com/v8/finance/chart/{ticker}"
+
+MAX_WORKERS = 8      # Threads shared by all batch prefetches in the process
+MAX_PER_HOST = 6     # Requests in flight against any single host
+HTTP_TIMEOUT = 10
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+_host_slots = {}
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session with a connection pool sized for the worker pool."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(MAX_WORKERS, MAX_PER_HOST))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="price-fetch")
+        return _executor
+
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc
+    with _lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+        return slot
+
+
+def get_json(url: str, timeout: float = HTTP_TIMEOUT):
+    """GET a JSON document over the shared session, respecting the per-host limit."""
+    with _host_slot(url):
+        response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def yahoo_chart(ticker: str, query: str):
+    """Yahoo Finance chart API response for a ticker, e.g. query="range=5d&interval=1d"."""
+    return get_json(f"{YAHOO_CHART_URL.format(ticker=ticker)}?{query}")
+
+
+def map_concurrent(fn, items) -> list:
+    """
+    Apply fn to every item on the shared pool and return results in input order.
+    fn should catch its own per-item errors; an exception here aborts the batch.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    return list(_get_executor().map(fn, items))
+
+
+def imap_completed(fn, items, max_in_flight: int = None):
+    """
+    Apply fn to every item on the shared pool, yielding results as they finish
+    (completion order, not input order). At most max_in_flight items (default
+    2 * MAX_WORKERS) are submitted at a time, so memory stays bounded for long inputs.
+    fn should catch its own per-item errors, as with map_concurrent.
+    """
+    executor = _get_executor()
+    limit = max_in_flight or 2 * MAX_WORKERS
+    pending = set()
+    try:
+        for item in items:
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(fn, item))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # Consumer went away (e.g. client disconnected): drop work not yet started
+        for future in pending:
+            future.cancel()
+
+
+def _is_warm(ticker: str, years=None, start_date=None, end_date=None) -> bool:
+    from cache_utils import get_fresh_prices, cache_covers_range
+
+    df = get_fresh_prices(ticker)
+    return df is not None and cache_covers_range(ticker, years=years, start_date=start_date, end_date=end_date, df=df)
+
+
+def prefetch_prices(tickers, years: int = None, start_date: str = None, end_date: str = None) -> dict:
+    """
+    Make sure every ticker's cached prices are fresh and cover the requested range,
+    downloading the cold ones concurrently. Returns {'requested', 'warm', 'fetched'} counts.
+    Failures are left for the per-ticker code to report.
+    """
+    from finance_plots import _get_price_data_yahoo
+
+    unique = list(dict.fromkeys(t for t in tickers if t))
+    cold = [t for t in unique if not _is_warm(t, years, start_date, end_date)]
+
+    def fetch(ticker):
+        try:
+            _get_price_data_yahoo(ticker, years=years, start_date=start_date, end_date=end_date)
+        except Exception as e:
+            print(f"Prefetch failed for {ticker}: {e}")
+
+    map_concurrent(fetch, cold)
+    return {'requested': len(unique), 'warm': len(unique) - len(cold), 'fetched': len(cold)}
@@ -0,0 +1,296 @@
+"""
+Binary price store backing cache_utils.
+
+Each ticker's close series is one .npy file of (Date, Close) records in
+cache/<TICKER>.npy. Reads memory-map the file, so loading a ticker is a
+header parse plus a page-in instead of a CSV parse; writes go to a temp file
+that is renamed over the old one. Legacy cache/<TICKER>.csv files are
+imported on first read.
+
+Sync state (when the series was last brought up to date with the source) is
+kept in cache/<TICKER>.meta.json, separately from the data file's mtime.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from atomic_files import update_json
+
+RECORD_DTYPE = np.dtype([("Date", "<M8[ns]"), ("Close", "<f8")])
+
+# Windows can't rename over a file that is still mapped, so read into memory there.
+MMAP_READS = os.name != "nt"
+
+
+def records_to_frame(records: np.ndarray) -> pd.DataFrame:
+    """Wrap a (Date, Close) record array as a Close frame without copying the prices."""
+    index = pd.DatetimeIndex(records["Date"], name="Date")
+    return pd.DataFrame({"Close": records["Close"]}, index=index, copy=False)
+
+
+def frame_to_records(df: pd.DataFrame) -> np.ndarray:
+    """Pack a frame's Close column into a sorted, de-duplicated record array."""
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    records = np.empty(len(df), dtype=RECORD_DTYPE)
+    records["Date"] = index.to_numpy(dtype="datetime64[ns]")
+    records["Close"] = df["Close"].to_numpy(dtype=np.float64)
+    records = records[~np.isnan(records["Close"])]
+
+    # Sort by date; on duplicate dates the later row wins
+    order = np.argsort(records["Date"], kind="stable")
+    records = records[order]
+    if len(records) > 1:
+        last = np.ones(len(records), dtype=bool)
+        last[:-1] = records["Date"][1:] != records["Date"][:-1]
+        records = records[last]
+    return records
+
+
+class PriceStore:
+    """One memory-mapped (Date, Close) record file per ticker under `root`."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, ticker: str) -> Path:
+        self.root.mkdir(exist_ok=True)
+        return self.root / f"{ticker.upper()}.npy"
+
+    def _legacy_csv(self, ticker: str) -> Path:
+        return self.root / f"{ticker.upper()}.csv"
+
+    def _import_legacy(self, ticker: str) -> bool:
+        """Convert an old cache/<TICKER>.csv into the binary format, keeping its mtime."""
+        csv_path = self._legacy_csv(ticker)
+        if not csv_path.exists():
+            return False
+        try:
+            df = pd.read_csv(csv_path, index_col="Date", parse_dates=True)
+            mtime = csv_path.stat().st_mtime
+            self.write(ticker, df)
+            os.utime(self.path(ticker), (mtime, mtime))
+            csv_path.unlink()
+            return True
+        except Exception as e:
+            print(f"Error importing legacy cache for {ticker}: {e}")
+            return False
+
+    def meta_path(self, ticker: str) -> Path:
+        self.root.mkdir(exist_ok=True)
+        return self.root / f"{ticker.upper()}.meta.json"
+
+    def read_meta(self, ticker: str) -> dict:
+        """Sync metadata for a ticker ({} if none has been recorded)."""
+        try:
+            with open(self.meta_path(ticker), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_meta(self, ticker: str, **fields):
+        """
+        Merge fields into the ticker's sync metadata and write it atomically, under
+        the file's lock so concurrent refreshes don't drop each other's fields.
+        """
+        update_json(str(self.meta_path(ticker)), lambda meta: meta.update(fields), {})
+
+    def last_synced(self, ticker: str):
+        """
+        Epoch seconds when the series was last synced with the source, or None.
+        Falls back to the data file's mtime for entries written before sync metadata existed.
+        """
+        synced = self.read_meta(ticker).get("last_synced")
+        if synced is not None:
+            return float(synced)
+        return self.mtime(ticker)
+
+    def exists(self, ticker: str) -> bool:
+        return self.path(ticker).exists() or self._import_legacy(ticker)
+
+    def mtime(self, ticker: str):
+        """File modification time (epoch seconds), or None if the ticker isn't stored."""
+        if not self.exists(ticker):
+            return None
+        return self.path(ticker).stat().st_mtime
+
+    def read_records(self, ticker: str):
+        """Read-only (Date, Close) records for a ticker, or None if not stored."""
+        if not self.exists(ticker):
+            return None
+        records = np.load(self.path(ticker), mmap_mode="r" if MMAP_READS else None)
+        if records.dtype != RECORD_DTYPE:
+            raise ValueError(f"Unexpected record layout in {self.path(ticker)}")
+        records.flags.writeable = False
+        return records
+
+    def read(self, ticker: str) -> pd.DataFrame:
+        """Close frame for a ticker; empty frame if not stored or unreadable."""
+        try:
+            records = self.read_records(ticker)
+        except Exception as e:
+            print(f"Error loading cache for {ticker}: {e}")
+            return pd.DataFrame()
+        if records is None:
+            return pd.DataFrame()
+        return records_to_frame(records)
+
+    def date_range(self, ticker: str):
+        """(first_date, last_date) of the stored series, or None."""
+        records = self.read_records(ticker)
+        if records is None or len(records) == 0:
+            return None
+        return pd.Timestamp(records["Date"][0]), pd.Timestamp(records["Date"][-1])
+
+    def write(self, ticker: str, df: pd.DataFrame):
+        """Replace the stored series for a ticker with df['Close']."""
+        self.write_records(ticker, frame_to_records(df))
+
+    def merge(self, ticker: str, df: pd.DataFrame) -> int:
+        """
+        Fold newly fetched bars into the stored series.
+        Stored bars dated on/after the first new bar are replaced (so revised bars
+        in an overlap window win); earlier history is kept. Returns the number of
+        bars added beyond the previous last date.
+        """
+        new = frame_to_records(df)
+        old = self.read_records(ticker)
+        if old is None or len(old) == 0:
+            self.write_records(ticker, new)
+            return len(new)
+        if len(new) == 0:
+            return 0
+        prev_last = old["Date"][-1]
+        keep = old[old["Date"] < new["Date"][0]]
+        self.write_records(ticker, np.concatenate([keep, new]))
+        return int(np.count_nonzero(new["Date"] > prev_last))
+
+    def write_records(self, ticker: str, records: np.ndarray):
+        path = self.path(ticker)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(records, dtype=RECORD_DTYPE))
+        os.replace(tmp, path)
+
+    def delete(self, ticker: str):
+        for path in (self.path(ticker), self.meta_path(ticker), self._legacy_csv(ticker)):
+            if path.exists():
+                path.unlink()
+
+    def tickers(self) -> list:
+        self.root.mkdir(exist_ok=True)
+        names = {p.stem for p in self.root.glob("*.npy")}
+        names.update(p.stem for p in self.root.glob("*.csv"))
+        return sorted(names)
+
+
+class PriceFrameCache:
+    """
+    Bounded, thread-safe in-memory LRU of price frames keyed by ticker.
+
+    Entries remember the store file's mtime and expire once that is older than
+    `ttl_seconds`, the same rule cache_utils.is_cache_valid applies to the file,
+    so a hit needs neither a stat nor a read. Size is bounded by the bytes held
+    by the cached frames.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # ticker -> (frame, nbytes, synced_at)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _nbytes(df: pd.DataFrame) -> int:
+        return int(df.memory_usage(index=True, deep=False).sum())
+
+    def get(self, ticker: str):
+        """Cached frame for a ticker, or None on a miss or expired entry."""
+        key = ticker.upper()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            frame, nbytes, synced_at = entry
+            if time.time() - synced_at >= self.ttl_seconds:
+                del self._entries[key]
+                self._bytes -= nbytes
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, ticker: str, df: pd.DataFrame, synced_at: float):
+        """Insert or replace a ticker's frame; `synced_at` is the epoch time the data was stored."""
+        key = ticker.upper()
+        nbytes = self._nbytes(df)
+        if nbytes > self.max_bytes:
+            self.invalidate(key)
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (df, nbytes, synced_at)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def invalidate(self, ticker: str = None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            old = self._entries.pop(ticker.upper(), None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def slice_frame(df: pd.DataFrame, years: int = None, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    Restrict a date-sorted frame to a years lookback or a start/end window.
+    Uses positional slicing, so the result is a view over df's data, not a copy.
+    """
+    if df.empty:
+        return df.iloc[0:0]
+    index = df.index
+    start, stop = 0, len(df)
+    if start_date is not None or end_date is not None:
+        if start_date:
+            start = index.searchsorted(pd.to_datetime(start_date), side="left")
+        if end_date:
+            stop = index.searchsorted(pd.to_datetime(end_date), side="right")
+    elif years is not None:
+        cutoff = index[-1] - pd.DateOffset(years=years)
+        start = index.searchsorted(cutoff, side="left")
+    return df.iloc[start:stop]
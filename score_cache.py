@@ -0,0 +1,291 @@
+"""
+Memoized score results.
+
+A score only changes when the ticker's fundamentals or its price history do,
+so results of value_PE_avg, score_debt_to_equity, score_peg and the P/E chart
+series are kept under a key of
+
+    (kind, ticker, parameters, content digest of the ticker's block in every
+     fundamentals file the scorer reads, last cached price date, bar count and
+     digest of the closes an incremental refresh can rewrite)
+
+Editing one ticker's EPS block leaves every other ticker's entries valid, and a
+new price bar or a revised close moves the key on by itself, so entries never
+need invalidating.
+Results live in a bounded in-memory LRU, optionally backed by pickle files under
+SCORE_DISK_DIR so they survive restarts. Only successful results are cached.
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import INCREMENTAL_OVERLAP_DAYS, get_fresh_prices
+from fundamentals import BALANCE_FILE, EPS_FILE, get_store
+from valuation import (value_PE_avg, score_debt_to_equity, score_peg,
+                       value_PE_avg_batch, score_debt_to_equity_batch, score_peg_batch)
+
+SCORE_CACHE_MAX_ENTRIES = 4096
+SCORE_DISK_DIR = None  # e.g. Path("cache/scores") to keep results across restarts
+SCORE_DISK_MAX_ENTRIES = 50000
+
+_MISSING = object()
+
+
+class ScoreCache:
+    """
+    Bounded, thread-safe LRU of results keyed by tuples, with an optional
+    on-disk tier (one pickle file per key) consulted on a memory miss.
+    """
+
+    def __init__(self, max_entries: int, disk_dir=None, disk_max_entries: int = SCORE_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.disk_max_entries = disk_max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key) -> Path:
+        return self.disk_dir / (hashlib.sha1(repr(key).encode()).hexdigest() + ".pkl")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key):
+        """Cached value for key, or _MISSING."""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.disk_dir is not None:
+            try:
+                with open(self._path(key), "rb") as f:
+                    stored_key, value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                stored_key = None
+            if stored_key == key:
+                self._remember(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return _MISSING
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir is None:
+            return
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"Error writing score cache entry: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % 256 == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Drop the least recently written disk entries beyond disk_max_entries."""
+        if self.disk_dir is None or not self.disk_dir.exists():
+            return
+        files = sorted(self.disk_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+        for path in files[:max(0, len(files) - self.disk_max_entries)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def clear(self):
+        """Empty the memory tier (the disk tier is left alone; its keys stay valid)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_dir": str(self.disk_dir) if self.disk_dir is not None else None,
+            }
+
+
+_cache = ScoreCache(SCORE_CACHE_MAX_ENTRIES, SCORE_DISK_DIR)
+
+
+def get_score_cache() -> ScoreCache:
+    """The process-wide score cache."""
+    return _cache
+
+
+def price_token(ticker: str):
+    """
+    (last date, bar count, digest of the closes in the last
+    INCREMENTAL_OVERLAP_DAYS) of a ticker's cached prices, or None if they are
+    stale or missing. An incremental refresh re-downloads that window and
+    updates today's bar in place, neither of which moves the date or count.
+    """
+    df = get_fresh_prices(ticker)
+    if df is None or df.empty:
+        return None
+    index = df.index
+    start = index.searchsorted(index[-1] - pd.Timedelta(days=INCREMENTAL_OVERLAP_DAYS))
+    closes = np.ascontiguousarray(df["Close"].to_numpy(dtype=np.float64)[start:])
+    return (index[-1].isoformat(), len(df), hashlib.blake2b(closes.tobytes(), digest_size=8).hexdigest())
+
+
+def fundamentals_token(ticker: str, eps_filename: str = None, balance_filename: str = None) -> tuple:
+    """Content digests of a ticker's block in each given fundamentals file."""
+    store = get_store()
+    token = ()
+    if eps_filename is not None:
+        token += (eps_filename, store.digest("eps", eps_filename, ticker))
+    if balance_filename is not None:
+        token += (balance_filename, store.digest("balance", balance_filename, ticker))
+    return token
+
+
+def _key(kind, ticker, params, files, uses_prices):
+    price = price_token(ticker) if uses_prices else ()
+    if price is None:
+        return None
+    try:
+        fundamentals = fundamentals_token(ticker, *files)
+    except OSError:
+        return None  # missing EPS file: let the scorer report it
+    return (kind, ticker, params, fundamentals, price)
+
+
+def version(kind: str, ticker: str, params: tuple, files: tuple, uses_prices: bool = True):
+    """
+    Version token of the result cached() would return for these arguments: a
+    hash of its key, or None while the ticker's prices are stale (only a
+    refresh can tell what the result will be keyed under).
+    """
+    key = _key(kind, ticker, params, files, uses_prices)
+    if key is None:
+        return None
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def cached(kind: str, compute, ticker: str, params: tuple, files: tuple, uses_prices: bool = True):
+    """
+    compute() for one ticker, memoized under the key described in the module
+    docstring. `files` is (eps_filename, balance_filename), either may be None.
+    When the ticker's prices are stale, compute() refreshes them and the result
+    is stored under the refreshed price date.
+    """
+    key = _key(kind, ticker, params, files, uses_prices)
+    if key is not None:
+        value = _cache.get(key)
+        if value is not _MISSING:
+            return value
+    value = compute()
+    if key is None:
+        key = _key(kind, ticker, params, files, uses_prices)
+    if key is not None and value is not None:
+        _cache.put(key, value)
+    return value
+
+
+def cached_batch(kind: str, compute_batch, tickers, params: tuple, files: tuple, uses_prices: bool = True) -> dict:
+    """
+    {ticker: result} for every ticker; cached results are reused and only the
+    misses are passed to compute_batch(tickers) -> {ticker: result or exception}.
+    """
+    results, keys, misses = {}, {}, []
+    for ticker in dict.fromkeys(tickers):
+        key = _key(kind, ticker, params, files, uses_prices)
+        value = _cache.get(key) if key is not None else _MISSING
+        if value is _MISSING:
+            keys[ticker] = key
+            misses.append(ticker)
+        else:
+            results[ticker] = value
+
+    if misses:
+        computed = compute_batch(misses)
+        for ticker in misses:
+            value = computed[ticker]
+            results[ticker] = value
+            if isinstance(value, Exception):
+                continue
+            key = keys[ticker] or _key(kind, ticker, params, files, uses_prices)
+            if key is not None:
+                _cache.put(key, value)
+    return results
+
+
+# --- Memoized scorers (same signatures as valuation's) ---
+
+def cached_value_PE_avg(ticker, years=1, filename=EPS_FILE):
+    return cached("value_PE_avg", lambda: value_PE_avg(ticker, years=years, filename=filename),
+                  ticker, (years,), (filename, BALANCE_FILE))
+
+
+def cached_score_debt_to_equity(ticker, years=2, filename=BALANCE_FILE):
+    return cached("score_debt_to_equity", lambda: score_debt_to_equity(ticker, years=years, filename=filename),
+                  ticker, (years,), (EPS_FILE, filename), uses_prices=False)
+
+
+def cached_score_peg(ticker, years=3, filename=EPS_FILE):
+    return cached("score_peg", lambda: score_peg(ticker, years=years, filename=filename),
+                  ticker, (years,), (filename, BALANCE_FILE))
+
+
+def cached_value_PE_avg_batch(tickers, years=1, filename=EPS_FILE):
+    return cached_batch("value_PE_avg", lambda misses: value_PE_avg_batch(misses, years=years, filename=filename),
+                        tickers, (years,), (filename, BALANCE_FILE))
+
+
+def cached_score_debt_to_equity_batch(tickers, years=2, filename=BALANCE_FILE):
+    return cached_batch("score_debt_to_equity",
+                        lambda misses: score_debt_to_equity_batch(misses, years=years, filename=filename),
+                        tickers, (years,), (EPS_FILE, filename), uses_prices=False)
+
+
+def cached_score_peg_batch(tickers, years=3, filename=EPS_FILE):
+    return cached_batch("score_peg", lambda misses: score_peg_batch(misses, years=years, filename=filename),
+                        tickers, (years,), (filename, BALANCE_FILE))
+
+
+def value_PE_avg_version(ticker, years=1, filename=EPS_FILE):
+    return version("value_PE_avg", ticker, (years,), (filename, BALANCE_FILE))
+
+
+def score_debt_to_equity_version(ticker, years=2, filename=BALANCE_FILE):
+    return version("score_debt_to_equity", ticker, (years,), (EPS_FILE, filename), uses_prices=False)
+
+
+def score_peg_version(ticker, years=3, filename=EPS_FILE):
+    return version("score_peg", ticker, (years,), (filename, BALANCE_FILE))
@@ -1,63 +1,180 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
 import pandas as pd
 from datetime import datetime
+import os
 import time
 import re
+import threading
+from urllib.parse import urlsplit
 
-def fetch_eps_data(ticker):
+import manual_writer
+import sqlite_store
+from fundamentals import db_kind
+
+# Point at a local copy of the site (e.g. fixtures served by bulk_scrape.serve_fixtures) for testing
+BASE_URL = os.environ.get("SCRAPER_BASE_URL", "https://stockanalysis.com")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
+}
+HTTP_TIMEOUT = 15
+MIN_REQUEST_INTERVAL = 1.0  # Seconds between requests to the same host, across all threads
+POOL_SIZE = 8               # Keep-alive connections kept per host
+
+_lock = threading.Lock()
+_session = None
+_next_slot = {}
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session carrying the browser headers."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def get_page(url, min_interval=None, timeout=HTTP_TIMEOUT):
+    """
+    GET a page over the shared session, spaced at least min_interval
+    (default MIN_REQUEST_INTERVAL) seconds after the previous request to the same host.
+    """
+    interval = MIN_REQUEST_INTERVAL if min_interval is None else min_interval
+    host = urlsplit(url).netloc
+    with _lock:
+        now = time.monotonic()
+        slot = max(now, _next_slot.get(host, now))
+        _next_slot[host] = slot + interval
+    if slot > now:
+        time.sleep(slot - now)
+    return get_session().get(url, timeout=timeout)
+
+
+def eps_page_urls(ticker, base_url=None):
+    """Quarterly income statement page, then the annual one as a fallback."""
+    root = f"{base_url or BASE_URL}/stocks/{ticker.lower()}/financials"
+    return [f"{root}/quarterly/", f"{root}/"]
+
+
+def balance_page_url(ticker, base_url=None):
+    return f"{base_url or BASE_URL}/stocks/{ticker.lower()}/financials/balance-sheet/quarterly/"
+
+
+def _lxml_tables(html):
+    """Per table: (header rows, body rows, cells of a row, text of a cell, is header cell), via lxml."""
+    root = lxml.html.fromstring(html)
+    cells = lambda tr: [c for c in tr if c.tag in ("td", "th")]
+    for table in root.iter("table"):
+        yield (table.xpath("./thead/tr"), table.xpath("./tbody/tr | ./tr"),
+               cells, lambda c: c.text_content(), lambda c: c.tag == "th")
+
+
+def _soup_tables(html):
+    """The same as _lxml_tables, via BeautifulSoup when lxml is not installed."""
+    soup = BeautifulSoup(html, "html.parser")
+    cells = lambda tr: tr.find_all(["td", "th"], recursive=False)
+    for table in soup.find_all("table"):
+        thead = table.find("thead", recursive=False)
+        head = thead.find_all("tr", recursive=False) if thead else []
+        body = [tr for tr in table.find_all("tr") if tr.find_parent("table") is table and tr.parent is not thead]
+        yield head, body, cells, lambda c: c.get_text(), lambda c: c.name == "th"
+
+
+def find_rows(html, *matchers):
+    """
+    Column headers and rows (as cell texts) of the first table in html that has
+    a row for every matcher: a function of the row's lower-cased first cell.
+    Each matcher gets the last matching row seen by the time all have matched.
+    Multi-row headers are joined with spaces, as pandas.read_html columns were.
+    Returns (headers, [row per matcher]) or None.
+
+    The page is parsed once, without building DataFrames, and only the
+    matching rows are read past their first cell.
+    """
+    tables = _lxml_tables(html) if lxml is not None else _soup_tables(html)
+    for head, body, cells_of, text_of, is_header_cell in tables:
+        text = lambda cell: " ".join(text_of(cell).split())
+
+        def row_texts(tr):
+            # Colspans repeated, like pandas.read_html
+            texts = []
+            for cell in cells_of(tr):
+                span = cell.get("colspan") or "1"
+                texts.extend([text(cell)] * (int(span) if span.isdigit() else 1))
+            return texts
+
+        found = [None] * len(matchers)
+        for tr in body:
+            cells = cells_of(tr)
+            if not cells:
+                continue
+            label = text(cells[0]).lower()
+            for n, matches in enumerate(matchers):
+                if matches(label):
+                    found[n] = tr
+            if all(row is not None for row in found):
+                break
+        else:
+            continue
+
+        if not head:
+            # No <thead>: the leading rows made only of header cells are the header
+            head = []
+            for tr in body:
+                if not all(is_header_cell(cell) for cell in cells_of(tr)):
+                    break
+                head.append(tr)
+        header_rows = [row_texts(tr) for tr in head]
+        width = max((len(r) for r in header_rows), default=0)
+        headers = [" ".join(r[i] if i < len(r) else "" for r in header_rows).strip() for i in range(width)]
+        return headers, [row_texts(tr) for tr in found]
+    return None
+
+
+def fetch_eps_data(ticker, base_url=None, get=get_page):
     """
     Scrapes EPS data - tries quarterly first, falls back to annual.
     Returns (data_lines, warning_message) where warning indicates if annual data was used.
+    get(url) downloads a page (bulk_scrape passes one that retries).
     """
-    url = f"https://stockanalysis.com/stocks/{ticker.lower()}/financials/quarterly/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
-    }
-
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        url, url_alt = eps_page_urls(ticker, base_url)
+        response = get(url)
         if response.status_code != 200:
-            url_alt = f"https://stockanalysis.com/stocks/{ticker.lower()}/financials/"
-            response = requests.get(url_alt, headers=headers, timeout=15)
+            response = get(url_alt)
             if response.status_code != 200:
                 return None, f"Failed to fetch data: HTTP {response.status_code}"
+        return parse_eps_page(response.text)
+    except Exception as e:
+        return None, f"Scraper Error: {str(e)}"
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        dfs = pd.read_html(str(soup))
-        if not dfs:
-            return None, "Could not parse table from HTML"
-            
-        eps_row = None
-        target_df = None
-        
-        # Find table with EPS
-        for df in dfs:
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = [' '.join(col).strip() for col in df.columns.values]
-            df = df.reset_index(drop=True)
-            
-            for i, row in df.iterrows():
-                label = str(row.iloc[0]).lower()
-                if "eps (diluted)" in label or "earnings per share" in label:
-                    eps_row = row
-                    target_df = df
-                    break
-            if eps_row is not None:
-                break
-        
-        if eps_row is None:
+def parse_eps_page(html):
+    """(data_lines, warning_message) from an income statement page, as fetch_eps_data returns."""
+    try:
+        found = find_rows(html, lambda label: "eps (diluted)" in label or "earnings per share" in label)
+        if found is None:
             return None, "EPS row not found in any table"
+        cols, (eps_row,) = found
 
-        cols = target_df.columns.tolist()
         quarterly_results = []
         annual_results = []
         
         # Try to extract both quarterly and annual data
         for i in range(1, len(cols)):
-            col_header = str(cols[i])
-            val = eps_row.iloc[i]
+            col_header = cols[i]
+            val = eps_row[i] if i < len(eps_row) else ''
             
             # Skip TTM columns to avoid mixing annual totals into quarterly lists
             if "TTM" in col_header.upper():
@@ -81,7 +198,7 @@ def fetch_eps_data(ticker):
                 continue
                 
             # Parse Value
-            val_str = str(val).strip()
+            val_str = val.strip()
             if val_str == '-' or val_str == '' or "nan" in val_str.lower():
                 continue
                 
@@ -109,58 +226,34 @@ def fetch_eps_data(ticker):
     except Exception as e:
         return None, f"Scraper Error: {str(e)}"
 
-def fetch_balance_sheet(ticker):
+def fetch_balance_sheet(ticker, base_url=None, get=get_page):
     """
     Scrapes balance sheet data (Debt/Equity).
     """
-    url = f"https://stockanalysis.com/stocks/{ticker.lower()}/financials/balance-sheet/quarterly/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
-    }
-
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = get(balance_page_url(ticker, base_url))
         if response.status_code != 200:
             return None, f"Failed to fetch balance sheet: HTTP {response.status_code}"
+        return parse_balance_page(response.text)
+    except Exception as e:
+        return None, f"Balance Scraper Error: {str(e)}"
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        dfs = pd.read_html(str(soup))
-        if not dfs:
-            return None, "No tables found on balance sheet page"
-
-        # Look for Debt and Equity
-        debt_row = None
-        equity_row = None
-        target_df = None
-
-        for df in dfs:
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = [' '.join(col).strip() for col in df.columns.values]
-            df = df.reset_index(drop=True)
-            
-            for i, row in df.iterrows():
-                label = str(row.iloc[0]).lower().strip()
-                if "total debt" in label:
-                    debt_row = row
-                if "shareholders' equity" in label or label == "total equity":
-                    equity_row = row
-                
-                if debt_row is not None and equity_row is not None:
-                    target_df = df
-                    break
-            if target_df is not None:
-                break
-
-        if debt_row is None or equity_row is None:
-            return None, f"Could not find both Debt and Equity rows ({'Debt found' if debt_row else 'Debt missing'}, {'Equity found' if equity_row else 'Equity missing'})"
+def parse_balance_page(html):
+    """(data_lines, error) from a balance sheet page, as fetch_balance_sheet returns."""
+    try:
+        # Look for Debt and Equity: the last matching rows of the first table holding both
+        is_debt = lambda label: "total debt" in label
+        is_equity = lambda label: "shareholders' equity" in label or label == "total equity"
+        found = find_rows(html, is_debt, is_equity)
+        if found is None:
+            return None, "Could not find both Debt and Equity rows"
+        cols, (debt_row, equity_row) = found
 
-        cols = target_df.columns.tolist()
         results = []
         for i in range(1, len(cols)):
-            col_header = str(cols[i])
-            debt_val = str(debt_row.iloc[i]).strip().replace('$', '').replace(',', '')
-            equity_val = str(equity_row.iloc[i]).strip().replace('$', '').replace(',', '')
+            col_header = cols[i]
+            debt_val = (debt_row[i] if i < len(debt_row) else '').strip().replace('$', '').replace(',', '')
+            equity_val = (equity_row[i] if i < len(equity_row) else '').strip().replace('$', '').replace(',', '')
 
             match = re.search(r'([A-Za-z]{3}\s+\d{1,2},\s+\d{4})', col_header)
             if match:
@@ -172,7 +265,7 @@ def fetch_balance_sheet(ticker):
                 except:
                     continue
             
-            if debt_val != '-' and equity_val != '-':
+            if debt_val not in ('-', '') and equity_val not in ('-', ''):
                 results.append(f"{date_str}\tDebt:{debt_val}\tEquity:{equity_val}")
 
         return results, None
@@ -181,14 +274,20 @@ def fetch_balance_sheet(ticker):
 
 def append_to_file(ticker, data_lines, filename="DATA/EPS_manual.txt"):
     """
-    Appends data (EPS or Balance) to specified file.
+    Writes data (EPS or Balance) for one ticker to specified file, replacing
+    the ticker's existing block (see manual_writer).
     """
-    try:
-        with open(filename, "a") as f:
-            f.write(f"\n{ticker.upper()}\n")
-            for line in data_lines:
-                f.write(f"{line}\n")
-            f.write("END\n")
-        return True, None
-    except Exception as e:
-        return False, str(e)
+    return write_blocks({ticker: data_lines}, filename=filename)
+
+def write_blocks(blocks, filename="DATA/EPS_manual.txt", merge=False, delete_empty=False):
+    """
+    Writes one TICKER ... END block per {ticker: data_lines} entry in a single
+    atomic rewrite, replacing (or with merge=True, merging into) each ticker's
+    existing blocks. Entries with no data lines leave the ticker's data alone
+    unless delete_empty=True. Goes to the database instead when it holds the
+    file's data.
+    """
+    kind = db_kind(filename)
+    if kind is not None:
+        return sqlite_store.write_blocks(kind, blocks, merge=merge, delete_empty=delete_empty)
+    return manual_writer.upsert_blocks(blocks, filename, merge=merge, delete_empty=delete_empty)
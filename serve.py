@@ -0,0 +1,282 @@
+"""
+Production launcher for the Flask API.
+
+    python -m serve                                  # waitress, 8 threads
+    python -m serve --threads 16 --port 5000
+    python -m serve --server gunicorn --workers 4    # POSIX only
+
+app.py's `app.run(debug=True)` is Flask's single-process dev server; here the
+app runs under waitress (a thread pool, works on Windows) or gunicorn
+(`gthread` worker processes, each with --threads threads).
+
+Caches are shared through files rather than rebuilt per worker:
+- Fundamentals are parsed once, before any worker starts, into the .npz
+  snapshots next to the text files; every process memory-maps those.
+- Prices live in the memory-mapped per-ticker .npy store under cache/.
+- With more than one worker process the score cache gets a disk tier under
+  cache/scores, so a result computed by one worker is reused by the others.
+
+Every process reports worker utilization (share of thread time spent inside
+requests), requests in flight and latency every --metrics-interval seconds,
+and serves the same numbers plus cache stats at GET /api/metrics.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import sqlite_store
+
+DEFAULT_THREADS = 8
+DEFAULT_METRICS_INTERVAL = 60
+SHARED_SCORE_CACHE_DIR = Path("cache/scores")
+METRICS_PATH = "/api/metrics"
+
+
+class WorkerMetrics:
+    """
+    WSGI middleware measuring how busy a process's request threads are.
+
+    A request counts as busy from the call until its response iterable is
+    closed, so streamed responses are counted for as long as they stream.
+    Utilization is busy thread-seconds over (wall seconds x threads) since
+    the previous report.
+    """
+
+    def __init__(self, app, threads: int):
+        self.app = app
+        self.threads = threads
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self._reset_window(time.perf_counter())
+
+    def _reset_window(self, now):
+        self._window_start = now
+        self._window_busy = 0.0
+        self._window_requests = 0
+        self._window_max = 0.0
+        self._window_peak = self.in_flight
+        self._busy_since = {}  # request id -> perf_counter at start (or window start)
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") == METRICS_PATH:
+            return self._serve_metrics(start_response)
+
+        token = object()
+        with self._lock:
+            self.in_flight += 1
+            self._window_peak = max(self._window_peak, self.in_flight)
+            self._busy_since[token] = time.perf_counter()
+        started = time.perf_counter()
+
+        def status_spy(status, headers, exc_info=None):
+            if status[:1] == "5":
+                with self._lock:
+                    self.errors += 1
+            return start_response(status, headers, exc_info)
+
+        def done():
+            now = time.perf_counter()
+            with self._lock:
+                self.in_flight -= 1
+                self.requests += 1
+                self._window_requests += 1
+                self._window_busy += now - self._busy_since.pop(token)
+                self._window_max = max(self._window_max, now - started)
+
+        try:
+            body = self.app(environ, status_spy)
+        except Exception:
+            done()
+            raise
+        return _ClosingIterable(body, done)
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """Counters since start plus utilization over the current window."""
+        now = time.perf_counter()
+        with self._lock:
+            elapsed = max(now - self._window_start, 1e-9)
+            # Requests still running count up to now, and carry over into the next window
+            busy = self._window_busy + sum(now - t for t in self._busy_since.values())
+            stats = {
+                "pid": os.getpid(),
+                "threads": self.threads,
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "window_seconds": round(elapsed, 1),
+                "window_requests": self._window_requests,
+                "window_peak_in_flight": self._window_peak,
+                "window_max_ms": round(self._window_max * 1000, 1),
+                "utilization": round(busy / (elapsed * self.threads), 4),
+            }
+            if reset:
+                running = {t: now for t in self._busy_since}
+                self._reset_window(now)
+                self._busy_since = running
+        return stats
+
+    def _serve_metrics(self, start_response):
+        from cache_utils import get_memory_cache_stats
+        from score_cache import get_score_cache
+
+        body = json.dumps({
+            "worker": self.snapshot(),
+            "price_cache": get_memory_cache_stats(),
+            "score_cache": get_score_cache().stats(),
+        }).encode()
+        start_response("200 OK", [("Content-Type", "application/json"),
+                                  ("Content-Length", str(len(body))),
+                                  ("Cache-Control", "no-cache")])
+        return [body]
+
+
+class _ClosingIterable:
+    """A WSGI response iterable that calls `on_close` once after the wrapped one is closed."""
+
+    def __init__(self, body, on_close):
+        self._body = body
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        return iter(self._body)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._on_close()
+
+
+def start_reporter(metrics: WorkerMetrics, interval: float):
+    """Print a utilization line every `interval` seconds from a daemon thread."""
+    if not interval:
+        return
+
+    def report():
+        while True:
+            time.sleep(interval)
+            s = metrics.snapshot(reset=True)
+            print(f"[serve pid {s['pid']}] {s['window_requests']} req in {s['window_seconds']:.0f}s, "
+                  f"utilization {s['utilization']:.0%} of {s['threads']} threads, "
+                  f"in flight {s['in_flight']} (peak {s['window_peak_in_flight']}), "
+                  f"slowest {s['window_max_ms']:.0f} ms", flush=True)
+
+    threading.Thread(target=report, name="serve-metrics", daemon=True).start()
+
+
+def warm_caches():
+    """
+    Parse the fundamentals files (writing their mmap snapshots) and derive the
+    TTM EPS series once, before any worker starts.
+    """
+    from eps_series import get_eps_series
+    from fundamentals import get_balance_data
+
+    try:
+        get_eps_series()
+        get_balance_data()
+    except Exception as e:
+        print(f"Could not preload fundamentals: {e}")
+
+
+def share_score_cache(directory: Path):
+    """Give this process's score cache a disk tier other workers also read."""
+    from score_cache import get_score_cache
+
+    get_score_cache().disk_dir = Path(directory)
+
+
+def run_waitress(wsgi, host, port, threads, trusted_proxy=None):
+    from waitress import serve
+
+    options = {"host": host, "port": port, "threads": threads, "channel_timeout": 300}
+    if trusted_proxy:
+        options.update(trusted_proxy=trusted_proxy,
+                       trusted_proxy_headers={"x-forwarded-for", "x-forwarded-proto"})
+    serve(wsgi, **options)
+
+
+def run_gunicorn(app, host, port, workers, threads, metrics_interval):
+    from gunicorn.app.base import BaseApplication
+
+    def post_fork(server, worker):
+        # Threads don't survive fork: start each worker's reporter in the worker
+        start_reporter(app.wsgi_app, metrics_interval)
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("timeout", 300)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("post_fork", post_fork)
+
+        def load(self):
+            return app
+
+    Application().run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m serve", description="Serve the finance API in production.")
+    parser.add_argument("--server", choices=("waitress", "gunicorn"), default="waitress")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="request threads per process")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (gunicorn only)")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_INTERVAL,
+                        help="seconds between utilization reports, 0 to disable")
+    parser.add_argument("--score-cache-dir", default=None,
+                        help=f"disk tier for the score cache (default {SHARED_SCORE_CACHE_DIR} with several workers)")
+    parser.add_argument("--db", default=sqlite_store.DB_FILE,
+                        help="SQLite database for sets, snapshots and fundamentals (default $FINANCE_DB; "
+                             "files under DATA/ if unset)")
+    parser.add_argument("--trusted-proxy", default=None,
+                        help="address of the reverse proxy (e.g. 127.0.0.1 for nginx), waitress only")
+    args = parser.parse_args(argv)
+
+    if args.server == "waitress" and args.workers != 1:
+        parser.error("waitress runs one process; use --threads, or --server gunicorn for --workers")
+    if args.server == "gunicorn" and os.name == "nt":
+        parser.error("gunicorn does not run on Windows; use --server waitress")
+
+    # Before app is imported: it picks its storage backends at import time
+    sqlite_store.DB_FILE = args.db or None
+
+    score_cache_dir = args.score_cache_dir or (SHARED_SCORE_CACHE_DIR if args.workers > 1 else None)
+    if score_cache_dir:
+        share_score_cache(score_cache_dir)
+    warm_caches()
+
+    from app import app
+    metrics = WorkerMetrics(app.wsgi_app, args.threads)
+    app.wsgi_app = metrics
+
+    print(f"Serving on http://{args.host}:{args.port} with {args.server}: "
+          f"{args.workers} process(es) x {args.threads} threads"
+          + (f", score cache shared in {score_cache_dir}" if score_cache_dir else "")
+          + (f", data in {args.db}" if args.db else ""), flush=True)
+
+    if args.server == "gunicorn":
+        run_gunicorn(app, args.host, args.port, args.workers, args.threads, args.metrics_interval)
+    else:
+        start_reporter(metrics, args.metrics_interval)
+        run_waitress(app, args.host, args.port, args.threads, args.trusted_proxy)
+
+
+if __name__ == "__main__":
+    main()
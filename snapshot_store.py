@@ -0,0 +1,146 @@
+"""
+Saved backtest snapshots.
+
+A snapshot is a small metadata record (METADATA_FIELDS) plus its payload
+(PAYLOAD_FIELDS: the per-ticker results and per-weight-set summary, which is
+where nearly all of its size is). The two are stored apart so listing
+snapshots never reads a payload, and payloads are kept gzipped.
+
+FileSnapshots keeps DATA/backtest_snapshots/index.json (the metadata, one
+entry per snapshot) and one <id>.json.gz payload per snapshot. The old single
+DATA/backtest_snapshots.json is split into that layout the first time the
+store is used. sqlite_store.Snapshots has the same interface:
+
+    list(limit, cursor)  (metadata page newest first, cursor for the next page or None)
+    count()              number of snapshots
+    get(id)              one full snapshot, or None
+    add(snapshot)        store a full snapshot, returns its metadata
+    delete(id)           remove one, returns its metadata (None if it didn't exist)
+
+Cursors are opaque strings; each snapshot gets an increasing sequence number
+and a page continues below the last one returned, so adding or deleting
+snapshots between requests never repeats or skips one.
+"""
+import gzip
+import json
+import os
+
+from atomic_files import file_lock, read_json, safe_name, write_bytes, write_json
+
+SNAPSHOTS_FILE = 'DATA/backtest_snapshots.json'   # Legacy single file, split on first use
+SNAPSHOTS_DIR = 'DATA/backtest_snapshots'         # index.json + <id>.json.gz per snapshot
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+GZIP_LEVEL = 6
+
+METADATA_FIELDS = ('id', 'name', 'created_at', 'as_of_date', 'lookback_years', 'forward_months',
+                   'tickers', 'weight_sets')
+PAYLOAD_FIELDS = ('results', 'summary')
+
+
+def metadata(snapshot: dict) -> dict:
+    """The snapshot without its payload."""
+    return {field: snapshot.get(field) for field in METADATA_FIELDS}
+
+
+def encode_payload(snapshot: dict) -> bytes:
+    """A snapshot's results and summary as gzipped JSON."""
+    payload = {field: snapshot.get(field) or [] for field in PAYLOAD_FIELDS}
+    return gzip.compress(json.dumps(payload).encode(), compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def decode_payload(data) -> dict:
+    return json.loads(gzip.decompress(data))
+
+
+def parse_cursor(cursor):
+    """The sequence number a page starts below, or None for the first page. Raises ValueError."""
+    if cursor in (None, ''):
+        return None
+    seq = int(cursor)
+    if seq < 1:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return seq
+
+
+class FileSnapshots:
+    """Snapshots as a metadata index plus one gzipped payload file each, under atomic_files' lock."""
+
+    def __init__(self, directory: str = SNAPSHOTS_DIR, legacy_file: str = SNAPSHOTS_FILE):
+        self.directory = directory
+        self.legacy_file = legacy_file
+        self.index_file = os.path.join(directory, 'index.json')
+
+    def _payload_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.directory, safe_name(snapshot_id) + '.json.gz')
+
+    def _index(self) -> list:
+        index = read_json(self.index_file, None)
+        return index if index is not None else self._split_legacy()
+
+    def _split_legacy(self) -> list:
+        """Build the index and payload files from the legacy single file (or an empty index)."""
+        with file_lock(self.index_file):
+            index = read_json(self.index_file, None)
+            if index is not None:
+                return index
+            legacy = read_json(self.legacy_file, []) if self.legacy_file else []
+            index = []
+            for seq, snapshot in enumerate(legacy or [], start=1):
+                write_bytes(self._payload_path(snapshot['id']), [encode_payload(snapshot)])
+                index.append({**metadata(snapshot), 'seq': seq})
+            write_json(self.index_file, index, indent=2)
+            return index
+
+    def list(self, limit: int = PAGE_SIZE, cursor=None) -> tuple:
+        below = parse_cursor(cursor)
+        entries = [e for e in self._index() if below is None or e['seq'] < below]
+        entries.sort(key=lambda e: e['seq'], reverse=True)
+        page = entries[:limit]
+        next_cursor = str(page[-1]['seq']) if len(entries) > limit else None
+        return [metadata(e) for e in page], next_cursor
+
+    def count(self) -> int:
+        return len(self._index())
+
+    def get(self, snapshot_id: str):
+        entry = next((e for e in self._index() if e['id'] == snapshot_id), None)
+        if entry is None:
+            return None
+        try:
+            with open(self._payload_path(snapshot_id), 'rb') as f:
+                payload = decode_payload(f.read())
+        except FileNotFoundError:
+            payload = {field: [] for field in PAYLOAD_FIELDS}
+        return {**metadata(entry), **payload}
+
+    def add(self, snapshot: dict) -> dict:
+        self._index()
+        # Payload first: an index entry must never point at a missing payload
+        write_bytes(self._payload_path(snapshot['id']), [encode_payload(snapshot)])
+        with file_lock(self.index_file):
+            index = read_json(self.index_file, [])
+            seq = max((e['seq'] for e in index), default=0) + 1
+            index.append({**metadata(snapshot), 'seq': seq})
+            write_json(self.index_file, index, indent=2)
+        return metadata(snapshot)
+
+    def delete(self, snapshot_id: str):
+        self._index()
+        with file_lock(self.index_file):
+            index = read_json(self.index_file, [])
+            removed = next((e for e in index if e['id'] == snapshot_id), None)
+            if removed is None:
+                return None
+            write_json(self.index_file, [e for e in index if e['id'] != snapshot_id], indent=2)
+        try:
+            os.remove(self._payload_path(snapshot_id))
+        except OSError:
+            pass
+        return metadata(removed)
+
+    def snapshots(self):
+        """Every full snapshot, oldest first."""
+        for entry in sorted(self._index(), key=lambda e: e['seq']):
+            yield self.get(entry['id'])
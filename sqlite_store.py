@@ -0,0 +1,478 @@
+"""
+Optional SQLite storage for saved sets, backtest snapshots and the manual
+fundamentals, instead of the JSON and text files under DATA/.
+
+Enabled by pointing FINANCE_DB at a database file (python -m serve --db ...
+does this). The file backends stay the default; build the database from them
+once with:
+
+    python sqlite_store.py migrate [DB_FILE]
+
+The database runs in WAL mode, so readers never wait on a writer and a write
+touches only the rows it changes:
+
+- sets(user_id, name): one row per saved set
+- snapshots: snapshot metadata only, so listing never reads results;
+  snapshot_payloads holds each snapshot's results and summary, gzipped
+- eps(ticker, date), balance(ticker, date): one row per data line, keyed
+  (and clustered) by ticker and date, so a ticker's rows are one index seek
+- versions: a counter per fundamentals kind, bumped by every write, which
+  the fundamentals store uses in place of a file's mtime/size
+- changes(kind, ticker): the version that last wrote each ticker, so a
+  process holding the data reloads only the tickers written since it read
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from manual_parser import empty_table, parse_balance_file, parse_eps_file, table_from_rows
+from snapshot_store import PAGE_SIZE, FileSnapshots, decode_payload, encode_payload, metadata, parse_cursor
+
+DB_FILE = os.environ.get("FINANCE_DB") or None
+BUSY_TIMEOUT = 30.0   # Seconds a write waits for another process's write to finish
+
+SCHEMA_VERSION = 2    # Kept in PRAGMA user_version; see _upgrade
+
+COLUMNS = {"eps": ("EPS",), "balance": ("Debt", "Equity")}
+
+_PAYLOADS_TABLE = """CREATE TABLE IF NOT EXISTS snapshot_payloads (
+    id      TEXT PRIMARY KEY REFERENCES snapshots(id) ON DELETE CASCADE,
+    payload BLOB NOT NULL
+)"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sets (
+    user_id  TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    tickers  TEXT NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    seq            INTEGER PRIMARY KEY AUTOINCREMENT,
+    id             TEXT NOT NULL UNIQUE,
+    name           TEXT,
+    created_at     TEXT,
+    as_of_date     TEXT,
+    lookback_years INTEGER,
+    forward_months INTEGER,
+    tickers        TEXT NOT NULL,
+    weight_sets    TEXT NOT NULL
+);
+""" + _PAYLOADS_TABLE + """;
+CREATE TABLE IF NOT EXISTS eps (
+    ticker TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    eps    REAL NOT NULL,
+    PRIMARY KEY (ticker, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS balance (
+    ticker TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    debt   REAL NOT NULL,
+    equity REAL NOT NULL,
+    PRIMARY KEY (ticker, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    kind    TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    kind    TEXT NOT NULL,
+    ticker  TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (kind, ticker)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS changes_by_version ON changes (kind, version);
+"""
+
+ALL_TICKERS = "*"     # A changes row meaning the whole kind was rewritten
+
+_VALUE_COLUMNS = {"eps": ("eps",), "balance": ("debt", "equity")}
+
+_local = threading.local()
+
+
+def _forget_connections():
+    # A forked worker must not share its parent's connections
+    global _local
+    _local = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_connections)
+
+
+def enabled() -> bool:
+    return DB_FILE is not None
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """This thread's connection to the database (FINANCE_DB unless `path` is given)."""
+    path = os.path.abspath(path or DB_FILE)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Autocommit; writes open their own transactions (see _write)
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_SCHEMA)
+        _upgrade(conn)
+        connections[path] = conn
+    return conn
+
+
+def _upgrade(conn: sqlite3.Connection):
+    """Bring a database made by an older version of this module up to SCHEMA_VERSION."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    with _write(conn):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(snapshot_payloads)")]
+        if "results" in columns:
+            # Version 1 kept results and summary as two JSON text columns
+            rows = conn.execute("SELECT id, results, summary FROM snapshot_payloads").fetchall()
+            conn.execute("DROP TABLE snapshot_payloads")
+            conn.execute(_PAYLOADS_TABLE)
+            conn.executemany("INSERT INTO snapshot_payloads (id, payload) VALUES (?, ?)",
+                             [(snapshot_id, encode_payload({"results": json.loads(results),
+                                                            "summary": json.loads(summary)}))
+                              for snapshot_id, results, summary in rows])
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+@contextmanager
+def _write(conn: sqlite3.Connection):
+    """A write transaction, taking the write lock up front so read-modify-write can't race."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Saved sets
+# ──────────────────────────────────────────────────────────────────────────────
+
+class UserSets:
+    """{user id: {set name: tickers}} in the sets table, with atomic_files.UserShards' interface."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+
+    def _load(self, conn, user_id: str) -> dict:
+        rows = conn.execute("SELECT name, tickers FROM sets WHERE user_id = ? ORDER BY position",
+                            (user_id,))
+        return {name: json.loads(tickers) for name, tickers in rows}
+
+    def load(self, user_id: str) -> dict:
+        return self._load(connect(self.path), user_id)
+
+    def update(self, user_id: str, mutate) -> tuple:
+        """Call mutate(sets) and save only the sets it changed. Returns (result, sets); nothing is saved if it raises."""
+        conn = connect(self.path)
+        with _write(conn):
+            before = self._load(conn, user_id)
+            data = json.loads(json.dumps(before))
+            result = mutate(data)
+
+            conn.executemany("DELETE FROM sets WHERE user_id = ? AND name = ?",
+                             [(user_id, name) for name in before if name not in data])
+            # Sets keep their position; new ones go last
+            positions = {name: n for n, name in enumerate(before)}
+            new_position = len(before)
+            rows = []
+            for name, tickers in data.items():
+                if name in before and before[name] == tickers:
+                    continue
+                if name not in positions:
+                    positions[name], new_position = new_position, new_position + 1
+                rows.append((user_id, name, positions[name], json.dumps(tickers)))
+            conn.executemany("INSERT OR REPLACE INTO sets (user_id, name, position, tickers) VALUES (?, ?, ?, ?)",
+                             rows)
+            return result, data
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Backtest snapshots
+# ──────────────────────────────────────────────────────────────────────────────
+
+_META_COLUMNS = "id, name, created_at, as_of_date, lookback_years, forward_months, tickers, weight_sets"
+
+
+def _metadata_row(row) -> dict:
+    snapshot_id, name, created_at, as_of_date, lookback_years, forward_months, tickers, weight_sets = row
+    return {
+        'id': snapshot_id,
+        'name': name,
+        'created_at': created_at,
+        'as_of_date': as_of_date,
+        'lookback_years': lookback_years,
+        'forward_months': forward_months,
+        'tickers': json.loads(tickers),
+        'weight_sets': json.loads(weight_sets),
+    }
+
+
+class Snapshots:
+    """Backtest snapshots with snapshot_store.FileSnapshots' interface."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+
+    def list(self, limit: int = PAGE_SIZE, cursor=None) -> tuple:
+        below = parse_cursor(cursor)
+        rows = connect(self.path).execute(
+            f"SELECT seq, {_META_COLUMNS} FROM snapshots WHERE seq < ? ORDER BY seq DESC LIMIT ?",
+            (below if below is not None else 2 ** 63 - 1, limit + 1),
+        ).fetchall()
+        page = rows[:limit]
+        next_cursor = str(page[-1][0]) if len(rows) > limit else None
+        return [_metadata_row(row[1:]) for row in page], next_cursor
+
+    def count(self) -> int:
+        return connect(self.path).execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+    def get(self, snapshot_id: str):
+        conn = connect(self.path)
+        row = conn.execute(f"SELECT {_META_COLUMNS} FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        if row is None:
+            return None
+        payload = conn.execute("SELECT payload FROM snapshot_payloads WHERE id = ?", (snapshot_id,)).fetchone()
+        return {**_metadata_row(row), **decode_payload(payload[0] if payload else encode_payload({}))}
+
+    def add(self, snapshot: dict) -> dict:
+        conn = connect(self.path)
+        with _write(conn):
+            _insert_snapshot(conn, snapshot)
+        return metadata(snapshot)
+
+    def delete(self, snapshot_id: str):
+        conn = connect(self.path)
+        with _write(conn):
+            row = conn.execute(f"SELECT {_META_COLUMNS} FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+            return _metadata_row(row)
+
+
+def _insert_snapshot(conn, snapshot: dict):
+    conn.execute(
+        f"INSERT OR REPLACE INTO snapshots ({_META_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (snapshot['id'], snapshot.get('name'), snapshot.get('created_at'), snapshot.get('as_of_date'),
+         snapshot.get('lookback_years'), snapshot.get('forward_months'),
+         json.dumps(snapshot.get('tickers') or []), json.dumps(snapshot.get('weight_sets') or [])),
+    )
+    conn.execute("INSERT OR REPLACE INTO snapshot_payloads (id, payload) VALUES (?, ?)",
+                 (snapshot['id'], encode_payload(snapshot)))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Manual fundamentals
+# ──────────────────────────────────────────────────────────────────────────────
+
+def data_version(kind: str, path: str = None):
+    """Write counter of one kind of fundamentals; changes whenever its rows do."""
+    row = connect(path).execute("SELECT version FROM versions WHERE kind = ?", (kind,)).fetchone()
+    return ("sqlite", row[0] if row else 0)
+
+
+def _bump_version(conn, kind: str, tickers=None):
+    """Bump a kind's write counter and record the tickers written (all of them if None)."""
+    conn.execute("INSERT INTO versions (kind, version) VALUES (?, 1) "
+                 "ON CONFLICT (kind) DO UPDATE SET version = version + 1", (kind,))
+    version = conn.execute("SELECT version FROM versions WHERE kind = ?", (kind,)).fetchone()[0]
+    if tickers is None:
+        conn.execute("DELETE FROM changes WHERE kind = ?", (kind,))
+        tickers = (ALL_TICKERS,)
+    conn.executemany("INSERT OR REPLACE INTO changes (kind, ticker, version) VALUES (?, ?, ?)",
+                     [(kind, ticker, version) for ticker in tickers])
+
+
+def changed_tickers(kind: str, since, path: str = None):
+    """
+    Tickers of one kind written after data_version `since`, or None if the
+    whole kind was rewritten since then (reload everything).
+    """
+    rows = connect(path).execute("SELECT ticker FROM changes WHERE kind = ? AND version > ?",
+                                 (kind, since[1])).fetchall()
+    tickers = {row[0] for row in rows}
+    return None if ALL_TICKERS in tickers else tickers
+
+
+def _table_rows(kind: str, table) -> list:
+    """(ticker, date, value...) rows of a ManualTable."""
+    tickers = np.repeat(np.asarray(table.tickers, dtype=str), np.diff(table.offsets))
+    dates = np.datetime_as_string(np.asarray(table.dates, dtype="datetime64[D]"))
+    values = np.asarray(table.values, dtype=np.float64).reshape(len(dates), len(table.columns))
+    return [(t, d, *v) for t, d, v in zip(tickers.tolist(), dates.tolist(), values.tolist())]
+
+
+def load_table(kind: str, path: str = None, tickers=None):
+    """
+    Every row of one kind as a ManualTable, in a single ordered scan of the
+    table; with `tickers`, only their rows, one index seek per ticker.
+    """
+    value_columns = _VALUE_COLUMNS[kind]
+    query = f"SELECT ticker, date, {', '.join(value_columns)} FROM {kind}"
+    conn = connect(path)
+    if tickers is None:
+        rows = conn.execute(query + " ORDER BY ticker, date").fetchall()
+    else:
+        tickers, rows = sorted(tickers), []
+        for start in range(0, len(tickers), 500):  # Under SQLite's bound-parameter limit
+            chunk = tickers[start:start + 500]
+            rows += conn.execute(query + f" WHERE ticker IN ({', '.join('?' for _ in chunk)}) ORDER BY ticker, date",
+                                 chunk).fetchall()
+    if not rows:
+        return empty_table(COLUMNS[kind])
+    columns = list(zip(*rows))
+    values = np.column_stack(columns[2:]) if len(value_columns) > 1 else np.asarray(columns[2])
+    return table_from_rows(columns[0], np.asarray(columns[1], dtype="datetime64[D]"), values, COLUMNS[kind])
+
+
+def ticker_rows(kind: str, ticker: str, path: str = None):
+    """One ticker's rows as a DataFrame(index=Date, columns=COLUMNS[kind]), or None if it has none."""
+    value_columns = _VALUE_COLUMNS[kind]
+    rows = connect(path).execute(
+        f"SELECT date, {', '.join(value_columns)} FROM {kind} WHERE ticker = ? ORDER BY date", (ticker,)
+    ).fetchall()
+    if not rows:
+        return None
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+    values.flags.writeable = False  # Cached and shared, like TickerFrames' frames
+    return pd.DataFrame(values, columns=list(COLUMNS[kind]), copy=False,
+                        index=pd.DatetimeIndex(np.array([row[0] for row in rows], dtype="datetime64[ns]"), name="Date"))
+
+
+def _parse_line(kind: str, line: str):
+    """(date, value...) of one scraped data line, in the manual file format."""
+    tokens = line.split()
+    date = pd.Timestamp(tokens[0]).strftime("%Y-%m-%d")
+    if kind == "eps":
+        return date, float(tokens[1].replace("$", "").replace(",", ""))
+    values = {"Debt": 0.0, "Equity": 0.0}
+    for token in tokens[1:]:
+        name, _, value = token.partition(":")
+        if name in values:
+            values[name] = float(value.replace(",", ""))
+    return date, values["Debt"], values["Equity"]
+
+
+def write_blocks(kind: str, blocks: dict, merge: bool = False, path: str = None, delete_empty: bool = False):
+    """
+    manual_writer.upsert_blocks for the database: replace each ticker's rows
+    with {ticker: data_lines} (merge=True keeps dates the new lines don't
+    cover), in one transaction. Tickers with no data lines keep their rows
+    unless delete_empty=True. Returns (success, error).
+    """
+    value_columns = _VALUE_COLUMNS[kind]
+    insert = (f"INSERT OR REPLACE INTO {kind} (ticker, date, {', '.join(value_columns)}) "
+              f"VALUES (?, ?, {', '.join('?' for _ in value_columns)})")
+    try:
+        conn = connect(path)
+        written = []
+        with _write(conn):
+            for ticker, lines in blocks.items():
+                ticker = ticker.upper()
+                lines = [line for line in lines if line.strip()]
+                if not lines and not delete_empty:
+                    continue
+                if not merge:
+                    conn.execute(f"DELETE FROM {kind} WHERE ticker = ?", (ticker,))
+                conn.executemany(insert, [(ticker, *_parse_line(kind, line)) for line in lines])
+                written.append(ticker)
+            if written:
+                _bump_version(conn, kind, written)
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Migration from the files
+# ──────────────────────────────────────────────────────────────────────────────
+
+def migrate(path: str, sets_file: str, sets_dir: str, snapshots_dir: str, snapshots_file: str, eps_file: str,
+            balance_file: str) -> dict:
+    """
+    Copy everything in the file backends into the database at `path`, in one
+    transaction. Running it again overwrites the rows with the files' current
+    contents. Returns the number of rows copied per table.
+
+    Raises ValueError, copying nothing, if a set shard is corrupt or named by a
+    hash of a user id that can't be recovered (see atomic_files.UserShards.users).
+    """
+    from atomic_files import UserShards, read_json
+
+    # Sets: the legacy single file, overridden by per-user shards
+    by_user = read_json(sets_file, {}) or {}
+    shard_users = UserShards(sets_dir, legacy_file=sets_file).users()
+    unknown = [name for name, user_id in shard_users.items() if user_id is None]
+    if unknown:
+        raise ValueError(f"Unknown user id for set shards {', '.join(unknown)} in {sets_dir}; "
+                         "their sets would be lost, so nothing was migrated")
+    for name, user_id in shard_users.items():
+        shard = os.path.join(sets_dir, name + ".json")
+        try:
+            by_user[user_id] = read_json(shard, {}, strict=True)
+        except ValueError as e:
+            raise ValueError(f"Corrupt set shard {shard} ({e}); nothing was migrated") from e
+
+    counts = {}
+    conn = connect(path)
+    with _write(conn):
+        rows = [(user_id, name, n, json.dumps(tickers))
+                for user_id, sets in by_user.items() for n, (name, tickers) in enumerate(sets.items())]
+        conn.executemany("DELETE FROM sets WHERE user_id = ?", [(user_id,) for user_id in by_user])
+        conn.executemany("INSERT INTO sets (user_id, name, position, tickers) VALUES (?, ?, ?, ?)", rows)
+        counts["sets"] = len(rows)
+
+        snapshots = FileSnapshots(snapshots_dir, legacy_file=snapshots_file).snapshots()
+        counts["snapshots"] = 0
+        for snapshot in snapshots:
+            _insert_snapshot(conn, snapshot)
+            counts["snapshots"] += 1
+
+        for kind, filename, parse in (("eps", eps_file, parse_eps_file),
+                                      ("balance", balance_file, parse_balance_file)):
+            if not os.path.exists(filename):
+                continue
+            rows = _table_rows(kind, parse(filename))
+            conn.execute(f"DELETE FROM {kind}")
+            value_columns = _VALUE_COLUMNS[kind]
+            conn.executemany(f"INSERT INTO {kind} (ticker, date, {', '.join(value_columns)}) "
+                             f"VALUES (?, ?, {', '.join('?' for _ in value_columns)})", rows)
+            _bump_version(conn, kind)
+            counts[kind] = len(rows)
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("usage: python sqlite_store.py migrate [DB_FILE]")
+        sys.exit(2)
+    target = sys.argv[2] if len(sys.argv) > 2 else (DB_FILE or "DATA/finance.db")
+    from atomic_files import SETS_DIR, SETS_FILE
+    from fundamentals import BALANCE_FILE, EPS_FILE
+    from snapshot_store import SNAPSHOTS_DIR, SNAPSHOTS_FILE
+    try:
+        copied = migrate(target, SETS_FILE, SETS_DIR, SNAPSHOTS_DIR, SNAPSHOTS_FILE, EPS_FILE, BALANCE_FILE)
+    except ValueError as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+    print(f"{target}: " + ", ".join(f"{count} {table}" for table, count in copied.items()))
@@ -1,10 +1,13 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-import os
 import urllib.request
 import io
 from datetime import datetime, timedelta
 import numpy as np
+from fundamentals import get_eps_data, get_eps, get_balance_data, get_balance
+from eps_series import get_eps_series
+from manual_parser import group_ids
+from price_fetch import map_concurrent
 
 def _get_price_data(ticker, years):
     """
@@ -16,38 +19,10 @@ def _get_price_data(ticker, years):
 
 def load_manual_eps(filename="DATA/EPS_manual.txt"):
     """
-    Parse EPS_manual.txt into a dict of {ticker: DataFrame(date, eps)}
-    """
-    eps_data = {}
-    current_ticker = None
-    rows = []
-
-    with open(filename, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line == "END":
-                if current_ticker and rows:
-                    df = pd.DataFrame(rows, columns=["Date", "EPS"])
-                    df["Date"] = pd.to_datetime(df["Date"])
-                    df["EPS"] = df["EPS"].replace(r"[\$,]", "", regex=True).astype(float)
-                    # Deduplicate by Date (keep latest/last)
-                    df = df.sort_values("Date").drop_duplicates("Date", keep="last")
-                    df = df.set_index("Date").sort_index()
-                    eps_data[current_ticker] = df
-                current_ticker, rows = None, []
-                continue
-            if line.isalpha():
-                current_ticker = line.strip()
-                rows = []
-            else:
-                parts = line.split()
-                if len(parts) >= 2:
-                    date = parts[0]
-                    eps = parts[1]
-                    rows.append([date, eps])
-    return eps_data
+    Parse EPS_manual.txt into a dict of {ticker: DataFrame(date, eps)}.
+    Served from the process-wide fundamentals store; frames are read-only.
+    """
+    return get_eps_data(filename)
 
 
 def value_PE_min_max(ticker, years=1, filename="DATA/EPS_manual.txt"):
@@ -74,42 +49,40 @@ def value_PE_min_max(ticker, years=1, filename="DATA/EPS_manual.txt"):
         Historical P/E ratios over the lookback window.
     """
 
-    eps_data = load_manual_eps(filename)
-
-    if ticker not in eps_data:
+    series = get_eps_series(filename)
+    if ticker not in series:
         raise ValueError(f"{ticker} not found in {filename}")
 
-    df_eps = eps_data[ticker].copy().sort_index()
-    df_eps["TTM_EPS"] = df_eps["EPS"].rolling(4).sum()
-
     # --- Get stock price history ---
     df_price = _get_price_data(ticker, years)
     
     if df_price.empty:
         raise ValueError(f"No price data found for {ticker}")
 
-    # Make indices tz-naive
-    if isinstance(df_price.index, pd.DatetimeIndex) and df_price.index.tz is not None:
-        df_price.index = df_price.index.tz_localize(None)
-    if isinstance(df_eps.index, pd.DatetimeIndex) and df_eps.index.tz is not None:
-        df_eps.index = df_eps.index.tz_localize(None)
+    # Make dates tz-naive
+    price_index = pd.DatetimeIndex(df_price.index)
+    if price_index.tz is not None:
+        price_index = price_index.tz_localize(None)
+    dates = price_index.to_numpy(dtype="datetime64[ns]")
 
     # Align and compute P/E
-    df = df_price.join(df_eps["TTM_EPS"], how="left").ffill()
-    df["PE"] = df["Close"] / df["TTM_EPS"]
+    ttm_eps = series.align(ticker, dates)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pe = df_price["Close"].to_numpy(dtype=np.float64) / ttm_eps
 
-    # Lookback window
-    cutoff = df.index.max() - pd.DateOffset(years=years)
-    df_window = df[df.index >= cutoff].dropna()
+    # Lookback window, on days with a TTM EPS
+    cutoff = np.datetime64(pd.Timestamp(dates[-1]) - pd.DateOffset(years=years), "ns")
+    start = np.searchsorted(dates, cutoff, side="left")
+    known = ~np.isnan(pe[start:])
+    pe_history = pd.Series(pe[start:][known], index=price_index[start:][known], name="PE")
 
-    if df_window.empty:
+    if pe_history.empty:
         raise ValueError(f"Not enough EPS/price data for {ticker} over {years} years")
 
     # Current P/E
-    current_pe = df_window["PE"].iloc[-1]
+    current_pe = pe_history.iloc[-1]
 
     # Historical P/E
-    pe_history = df_window["PE"]
     min_pe, max_pe = pe_history.min(), pe_history.max()
 
     # Score: normalize between min (best) and max (worst)
@@ -122,6 +95,13 @@ def value_PE_min_max(ticker, years=1, filename="DATA/EPS_manual.txt"):
     return score, current_pe, pe_history
 
 
+def _positive_pe(close, ttm_eps):
+    """Close / TTM EPS where TTM EPS is positive, NaN elsewhere (loss-making or unknown)."""
+    pe = np.full(len(close), np.nan)
+    np.divide(close, ttm_eps, out=pe, where=ttm_eps > 0)
+    return pe
+
+
 def value_PE_avg(ticker, years=1, filename="DATA/EPS_manual.txt"):
     """
     Calculate a valuation score for a stock based on how high/low the current P/E is
@@ -145,73 +125,52 @@ def value_PE_avg(ticker, years=1, filename="DATA/EPS_manual.txt"):
     pe_history : pd.Series
         Historical P/E ratios over the lookback window.
     """
-    eps_data = load_manual_eps(filename)
-    if ticker not in eps_data:
+    # TTM EPS (sum of the last 4 quarters, or the annual figure) comes from the
+    # derived-series layer, which classifies each ticker's reporting frequency
+    series = get_eps_series(filename)
+    if ticker not in series:
         raise ValueError(f"{ticker} not found in {filename}")
 
-    df_eps = eps_data[ticker].copy().sort_index()
-
-    # Calculate TTM EPS based on frequency
-    # We detect frequency by checking the median gap between dates
-    if len(df_eps) >= 2:
-        median_gap = pd.Series(df_eps.index).diff().median().days
-        if median_gap > 120: # 120 days is roughly > 1 quarter gap
-            # Data is ANNUAL/Sparse -> TTM = Current Value
-            df_eps["TTM_EPS"] = df_eps["EPS"]
-        else:
-            # Data is QUARTERLY -> TTM = Sum of last 4
-            df_eps["TTM_EPS"] = df_eps["EPS"].rolling(4).sum()
-    else:
-        df_eps["TTM_EPS"] = df_eps["EPS"]
-
-
     # --- Price data ---
     df_price = _get_price_data(ticker, years)
     
     if df_price.empty:
         raise ValueError(f"No price data found for {ticker}")
 
-    # Ensure tz-naive indices
-    if isinstance(df_price.index, pd.DatetimeIndex) and df_price.index.tz is not None:
-        df_price.index = df_price.index.tz_localize(None)
-    if isinstance(df_eps.index, pd.DatetimeIndex) and df_eps.index.tz is not None:
-        df_eps.index = df_eps.index.tz_localize(None)
+    # Ensure tz-naive dates
+    price_index = pd.DatetimeIndex(df_price.index)
+    if price_index.tz is not None:
+        price_index = price_index.tz_localize(None)
 
-    # Join and compute P/E
-    # We use an outer join so we don't lose EPS data that might be older than the price data (typical for new IPOs)
-    df = df_price.join(df_eps["TTM_EPS"], how="outer").ffill()
-    
-    # After ffilling historical EPS forward, we focus only on dates where we have price data
-    df = df.loc[df_price.index]
-    
-    # Compute true current P/E (allowing negatives)
-    valid_eps_rows = df.dropna(subset=["TTM_EPS", "Close"])
-    if valid_eps_rows.empty:
+    dates = price_index.to_numpy(dtype="datetime64[ns]")
+    close = df_price["Close"].to_numpy(dtype=np.float64)
+
+    # TTM EPS in effect on each trading day. Historical EPS carries forward from
+    # before the first price (typical for new IPOs).
+    ttm_eps = series.align(ticker, dates)
+
+    # Compute true current P/E (allowing negatives). Once some TTM EPS is in effect
+    # it stays in effect, so the latest valid row is the last one if any is valid.
+    if np.isnan(ttm_eps[-1]):
         raise ValueError(f"Not enough valid P/E data for {ticker}")
     
-    latest_eps = valid_eps_rows["TTM_EPS"].iloc[-1]
-    latest_price = valid_eps_rows["Close"].iloc[-1]
+    latest_eps = ttm_eps[-1]
+    latest_price = close[-1]
     true_current_pe = latest_price / latest_eps if latest_eps != 0 else 999.0
 
     # Compute P/E, ignoring negative or zero earnings strictly for historical averaging and min/max math
-    def calc_pe(row):
-        eps = row["TTM_EPS"]
-        price = row["Close"]
-        if pd.isna(eps) or eps <= 0:
-            return None # Return None internally for math
-        return price / eps
-
-    df["PE"] = df.apply(calc_pe, axis=1)
+    pe = _positive_pe(close, ttm_eps)
 
     # Restrict to lookback window
-    current_date = df.index.max()
-    cutoff = current_date - pd.DateOffset(years=years)
-    df_window = df[df.index >= cutoff].copy()
+    cutoff = np.datetime64(pd.Timestamp(dates[-1]) - pd.DateOffset(years=years), "ns")
+    start = np.searchsorted(dates, cutoff, side="left")
+    pe_window = pe[start:]
+    data_points = len(pe_window)
 
     # Filter for periods where P/E is valid (company was profitable)
-    valid_pe_window = df_window.dropna(subset=["PE"])
+    valid_pe_window = pe_window[~np.isnan(pe_window)]
     
-    if valid_pe_window.empty or latest_eps <= 0:
+    if len(valid_pe_window) == 0 or latest_eps <= 0:
         # Non-profitable companies get a Baseline Score of 0 (Highest Risk)
         details = {
             "current_pe": true_current_pe,
@@ -220,15 +179,15 @@ def value_PE_avg(ticker, years=1, filename="DATA/EPS_manual.txt"):
             "max_pe": 999.0,
             "score_avg": 0.0,
             "score_range": 0.0,
-            "data_points": len(df_window),
+            "data_points": data_points,
             "data_gaps": check_data_completeness(ticker, years, filename, "DATA/Balance_manual.txt"),
             "error": "Negative Earnings (Not Profitable)"
         }
         return 0.0, details
 
     # Stats based ONLY on profitable periods
-    min_pe, max_pe = valid_pe_window["PE"].min(), valid_pe_window["PE"].max()
-    avg_pe = valid_pe_window["PE"].mean()
+    min_pe, max_pe = valid_pe_window.min(), valid_pe_window.max()
+    avg_pe = valid_pe_window.mean()
 
     # --- Scoring ---
     # Range-based
@@ -255,7 +214,7 @@ def value_PE_avg(ticker, years=1, filename="DATA/EPS_manual.txt"):
         "max_pe": max_pe if not pd.isna(max_pe) else 999.0,
         "score_avg": score_avg,
         "score_range": score_range,
-        "data_points": len(df_window),
+        "data_points": data_points,
         "data_gaps": check_data_completeness(ticker, years, filename, "DATA/Balance_manual.txt")
     }
 
@@ -269,34 +228,14 @@ def load_manual_balance_sheet(filename="DATA/Balance_manual.txt"):
     TICKER
     2023-12-31	Debt:1000	Equity:500
     END
+    Kept for scripts; the scorers read the per-ticker frames from the fundamentals store.
     """
     data = {}
-    if not os.path.exists(filename):
-        return data
-        
-    current_ticker = None
-    with open(filename, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line: continue
-            if line == "END":
-                current_ticker = None
-                continue
-            if line.isalpha():
-                current_ticker = line
-                data[current_ticker] = {}
-            else:
-                parts = line.split()
-                if current_ticker and len(parts) >= 2:
-                    date = parts[0]
-                    debt = 0
-                    equity = 0
-                    for p in parts[1:]:
-                        if p.startswith("Debt:"):
-                            debt = float(p.replace("Debt:", "").replace(",", ""))
-                        if p.startswith("Equity:"):
-                            equity = float(p.replace("Equity:", "").replace(",", ""))
-                    data[current_ticker][date] = {"debt": debt, "equity": equity}
+    for ticker, df in get_balance_data(filename).items():
+        data[ticker] = {
+            date.strftime("%Y-%m-%d"): {"debt": debt, "equity": equity}
+            for date, debt, equity in zip(df.index, df["Debt"], df["Equity"])
+        }
     return data
 
 
@@ -309,9 +248,8 @@ def check_data_completeness(ticker, years, eps_filename="DATA/EPS_manual.txt", b
     
     # Check EPS
     try:
-        eps_data = load_manual_eps(eps_filename)
-        if ticker in eps_data:
-            df = eps_data[ticker].copy().sort_index()
+        df = get_eps(ticker, eps_filename)
+        if df is not None:
             if not df.empty:
                 max_date = df.index.max()
                 cutoff = max_date - pd.DateOffset(years=years)
@@ -342,9 +280,9 @@ def check_data_completeness(ticker, years, eps_filename="DATA/EPS_manual.txt", b
 
     # Check Balance Sheet
     try:
-        balance_data = load_manual_balance_sheet(balance_filename)
-        if ticker in balance_data:
-            dates = sorted([pd.to_datetime(d) for d in balance_data[ticker].keys()])
+        balance = get_balance(ticker, balance_filename)
+        if balance is not None:
+            dates = list(balance.index)
             if dates:
                 max_date = dates[-1]
                 cutoff = max_date - pd.DateOffset(years=years)
@@ -366,17 +304,16 @@ def score_debt_to_equity(ticker, years=2, filename="DATA/Balance_manual.txt"):
     Calculate Debt-to-Equity score.
     Lower is better.
     """
-    balance_data = load_manual_balance_sheet(filename)
-    if ticker not in balance_data:
+    balance = get_balance(ticker, filename)
+    if balance is None:
         raise ValueError(f"{ticker} not found in {filename}")
         
-    dates = sorted(balance_data[ticker].keys(), reverse=True)
-    if not dates:
+    if balance.empty:
         raise ValueError(f"No balance sheet data for {ticker}")
         
-    current_date = dates[0]
-    debt = balance_data[ticker][current_date]["debt"]
-    equity = balance_data[ticker][current_date]["equity"]
+    current_date = balance.index[-1].strftime("%Y-%m-%d")
+    debt = float(balance["Debt"].iloc[-1])
+    equity = float(balance["Equity"].iloc[-1])
     
     if equity <= 0:
         ratio = 999.0 # High cap instead of infinity for JSON safety
@@ -434,11 +371,9 @@ def calculate_growth_rate(ticker, years=3, filename="DATA/EPS_manual.txt"):
     data_points : int
         Number of data points used.
     """
-    eps_data = load_manual_eps(filename)
-    if ticker not in eps_data:
+    df = get_eps(ticker, filename)
+    if df is None:
         return None, 0, 0
-        
-    df = eps_data[ticker].copy().sort_index()
     
     # Filter for last N years
     cutoff = df.index.max() - pd.DateOffset(years=years)
@@ -506,25 +441,19 @@ def score_peg(ticker, years=3, filename="DATA/EPS_manual.txt"):
         current_price = df_price["Close"].iloc[-1]
         
         # Get EPS
-        eps_data = load_manual_eps(filename)
-        if ticker not in eps_data:
+        df_eps = get_eps(ticker, filename)
+        if df_eps is None:
             raise ValueError("No EPS data")
-            
-        df_eps = eps_data[ticker].copy().sort_index()
         
-        # Calculate recent TTM EPS
-        # Check frequency logic similiar to value_PE_avg
-        if len(df_eps) >= 2:
-            median_gap = pd.Series(df_eps.index).diff().median().days
-            if median_gap > 120:
-                ttm_eps = df_eps["EPS"].iloc[-1]
-            else:
-                if len(df_eps) >= 4:
-                    ttm_eps = df_eps["EPS"].iloc[-4:].sum()
-                else:
-                    ttm_eps = df_eps["EPS"].sum() # Fallback
-        else:
-            ttm_eps = df_eps["EPS"].iloc[-1]
+        # TTM EPS as of the latest report, same series value_PE_avg uses
+        ttm_eps = get_eps_series(filename).latest(ticker)
+        if np.isnan(ttm_eps):
+            return 0.0, {
+                "peg": 999.0, "pe": 999.0, "growth_rate": 0.0,
+                "data_points": len(df_eps),
+                "data_gaps": check_data_completeness(ticker, years, filename, "DATA/Balance_manual.txt"),
+                "error": "Fewer than 4 quarters of EPS"
+            }
             
         if ttm_eps <= 0:
             return 0.0, {
@@ -584,4 +513,447 @@ def score_peg(ticker, years=3, filename="DATA/EPS_manual.txt"):
         return score, details
         
     except Exception as e:
-        return 0.0, {"error": str(e), "score": 0.0}
\ No newline at end of file
+        return 0.0, {"error": str(e), "score": 0.0}
+
+# --- Batch scoring ---
+#
+# The *_batch functions score many tickers in one pass. Fundamentals come from
+# the store as ragged columnar rows (one run of rows per ticker), closes are
+# aligned onto one shared trading-day axis as a (days, tickers) matrix, and the
+# formulas of the single-ticker functions above run as array operations over
+# every ticker at once. They return {ticker: (score, details)} with the same
+# values the single-ticker functions produce, or {ticker: exception} where the
+# single-ticker function would raise.
+
+def _whole_days(deltas):
+    """Timedeltas floored to whole days, like Timedelta.days."""
+    return deltas // np.timedelta64(1, "D")
+
+
+def _cutoffs(last_dates, years):
+    """last_date - DateOffset(years) for every ticker."""
+    return (pd.DatetimeIndex(last_dates) - pd.DateOffset(years=years)).to_numpy(dtype="datetime64[ns]")
+
+
+def _ffill_columns(panel):
+    """Carry each column's last non-NaN value forward down the rows."""
+    rows = np.where(np.isnan(panel), -1, np.arange(len(panel))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = panel[np.maximum(rows, 0), np.arange(panel.shape[1])]
+    filled[rows < 0] = np.nan
+    return filled
+
+
+def _align_ttm_eps_panel(axis, rows, ttm_eps):
+    """
+    TTM EPS in effect on every day of `axis` for every ticker of `rows`, as a
+    (days, tickers) matrix: the batch form of EPSSeries.align.
+    """
+    group = group_ids(rows.offsets)
+    valid = ~np.isnan(ttm_eps)
+    group, ttm_eps = group[valid], ttm_eps[valid]
+    start = np.searchsorted(axis, rows.dates[valid], side="left")
+
+    # Several reports taking effect on the same day: the latest one wins
+    last = np.ones(len(start), dtype=bool)
+    last[:-1] = (group[1:] != group[:-1]) | (start[1:] != start[:-1])
+    keep = last & (start < len(axis))
+
+    panel = np.full((len(axis), len(rows.tickers)), np.nan)
+    panel[start[keep], group[keep]] = ttm_eps[keep]
+    return _ffill_columns(panel)
+
+
+def _price_panel(tickers, years, load=None):
+    """
+    Closes of every ticker on one shared, sorted trading-day axis.
+
+    Returns (axis, close, present, errors): close is a (days, tickers) matrix,
+    present marks the days each ticker actually has a bar, and errors maps
+    tickers whose price load raised to the exception. Prices come from
+    load(ticker) if given, else the last `years` years of _get_price_data,
+    loaded concurrently on price_fetch's shared pool.
+    """
+    def fetch(ticker):
+        try:
+            return load(ticker) if load is not None else _get_price_data(ticker, years)
+        except Exception as e:
+            return e
+
+    dates, closes, columns = [], [], []
+    errors = {}
+    for col, (ticker, df) in enumerate(zip(tickers, map_concurrent(fetch, tickers))):
+        if isinstance(df, Exception):
+            errors[ticker] = df
+            continue
+        if df.empty:
+            continue
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        dates.append(index.to_numpy(dtype="datetime64[ns]"))
+        closes.append(df["Close"].to_numpy(dtype=np.float64))
+        columns.append(np.full(len(df), col))
+
+    if not dates:
+        return np.array([], dtype="datetime64[ns]"), np.zeros((0, len(tickers))), np.zeros((0, len(tickers)), dtype=bool), errors
+
+    dates = np.concatenate(dates)
+    columns = np.concatenate(columns)
+    axis = np.unique(dates)
+    pos = np.searchsorted(axis, dates)
+
+    close = np.full((len(axis), len(tickers)), np.nan)
+    present = np.zeros((len(axis), len(tickers)), dtype=bool)
+    close[pos, columns] = np.concatenate(closes)
+    present[pos, columns] = True
+    return axis, close, present, errors
+
+
+def _last_rows(present):
+    """Row index of each column's last present day (0 for columns with none)."""
+    if len(present) == 0:
+        return np.zeros(present.shape[1], dtype=np.int64)
+    return len(present) - 1 - np.argmax(present[::-1], axis=0)
+
+
+def _data_gaps_batch(tickers, years, eps_filename="DATA/EPS_manual.txt", balance_filename="DATA/Balance_manual.txt"):
+    """check_data_completeness for many tickers: {ticker: [warning, ...]}."""
+    gaps = {ticker: [] for ticker in tickers}
+
+    # EPS: gaps of over 120 days between reports in the window (plus the report
+    # just before it), and fewer reports than the window should hold
+    rows = get_eps_data(eps_filename).rows_for(tickers)
+    sizes = np.diff(rows.offsets)
+    found = sizes > 0
+    group = group_ids(rows.offsets)
+    cutoff = _cutoffs(rows.dates[np.maximum(rows.offsets[1:] - 1, 0)] if len(group) else
+                      np.zeros(len(tickers), dtype="datetime64[ns]"), years)
+    n_earlier = np.bincount(group[rows.dates < cutoff[group]], minlength=len(tickers))
+    n_window = sizes - n_earlier
+    check_from = rows.offsets[:-1] + np.maximum(n_earlier - 1, 0)
+
+    later = np.arange(1, len(group))
+    gap_rows = later[(group[later] == group[later - 1])
+                     & (later - 1 >= check_from[group[later]])
+                     & (_whole_days(rows.dates[later] - rows.dates[later - 1]) > 120)]
+    eps_dates = pd.DatetimeIndex(rows.dates)
+    for row in gap_rows:
+        gaps[tickers[group[row]]].append(
+            f"EPS missing: {eps_dates[row - 1].strftime('%Y-%m')} to {eps_dates[row].strftime('%Y-%m')}")
+
+    for i, ticker in enumerate(tickers):
+        if not found[i]:
+            gaps[ticker].append("Missing EPS data entirely")
+        elif n_window[i] < years * 4 - 2:
+            gaps[ticker].append(f"Sparse EPS: Expect {years * 4} qtrs, found {n_window[i]}")
+
+    # Balance sheet: fewer yearly reports in the window than expected
+    rows = get_balance_data(balance_filename).rows_for(tickers)
+    sizes = np.diff(rows.offsets)
+    group = group_ids(rows.offsets)
+    cutoff = _cutoffs(rows.dates[np.maximum(rows.offsets[1:] - 1, 0)] if len(group) else
+                      np.zeros(len(tickers), dtype="datetime64[ns]"), years)
+    n_recent = np.bincount(group[rows.dates >= cutoff[group]], minlength=len(tickers))
+
+    for i, ticker in enumerate(tickers):
+        if sizes[i] == 0:
+            gaps[ticker].append("Missing Balance Sheet data entirely")
+        elif n_recent[i] < years - 1:
+            gaps[ticker].append(f"Sparse Balance Sheet: Expect {years} yrs, found {n_recent[i]}")
+
+    return gaps
+
+
+def _pe_avg_scores(axis, close, present, ttm_eps, years):
+    """
+    The value_PE_avg formulas over (days, tickers) close and TTM EPS panels,
+    as of each ticker's last present day. Returns a dict of per-ticker arrays:
+    latest_eps, current_pe, min_pe, max_pe, avg_pe, score_avg, score_range,
+    score, counts (valid P/E days in the window) and data_points (window days).
+    """
+    n = close.shape[1]
+    cols = np.arange(n)
+    last = _last_rows(present)
+    latest_eps = ttm_eps[last, cols] if len(axis) else np.full(n, np.nan)
+    latest_price = close[last, cols] if len(axis) else np.full(n, np.nan)
+
+    # True current P/E (allowing negatives)
+    current_pe = np.full(n, 999.0)
+    np.divide(latest_price, latest_eps, out=current_pe, where=latest_eps != 0)
+
+    # P/E only where earnings are positive, restricted to each ticker's lookback window
+    pe = np.full(close.shape, np.nan)
+    np.divide(close, ttm_eps, out=pe, where=present & (ttm_eps > 0))
+    window = present & (axis[:, None] >= _cutoffs(axis[last], years)) if len(axis) else present
+    data_points = window.sum(axis=0)
+    valid = window & ~np.isnan(pe)
+    counts = valid.sum(axis=0)
+
+    min_pe = np.where(valid, pe, np.inf).min(axis=0, initial=np.inf)
+    max_pe = np.where(valid, pe, -np.inf).max(axis=0, initial=-np.inf)
+    # Mean over each ticker's own contiguous values, so np.mean's pairwise
+    # summation (and with it every bit of the result) matches value_PE_avg
+    segments = np.split(pe.T[valid.T], np.cumsum(counts)[:-1])
+    avg_pe = np.array([seg.mean() if len(seg) else np.nan for seg in segments])
+
+    # --- Scoring ---
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score_range = np.where(max_pe == min_pe, 0.5,
+                               np.clip(1 - (current_pe - min_pe) / (max_pe - min_pe), 0, 1))
+        score_avg = np.clip(np.where(
+            current_pe <= avg_pe,
+            0.5 + 0.5 * (avg_pe - current_pe) / np.maximum(1e-9, avg_pe - min_pe),
+            0.5 - 0.5 * (current_pe - avg_pe) / np.maximum(1e-9, max_pe - avg_pe),
+        ), 0, 1)
+    score = 0.7 * score_avg + 0.3 * score_range
+
+    return {
+        "latest_eps": latest_eps, "current_pe": current_pe, "min_pe": min_pe, "max_pe": max_pe,
+        "avg_pe": avg_pe, "score_avg": score_avg, "score_range": score_range, "score": score,
+        "counts": counts, "data_points": data_points,
+    }
+
+
+def value_PE_avg_batch(tickers, years=1, filename="DATA/EPS_manual.txt"):
+    """
+    value_PE_avg for many tickers at once.
+
+    Parameters
+    ----------
+    tickers : list of str
+        Stock tickers; duplicates are scored once.
+    years : int
+        Lookback period.
+    filename : str
+        Path to EPS_manual.txt file.
+
+    Returns
+    -------
+    results : dict
+        {ticker: (score, details)}, or {ticker: exception} where value_PE_avg would raise.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    eps_data = get_eps_data(filename)
+    results = {t: ValueError(f"{t} not found in {filename}") for t in tickers if t not in eps_data}
+    names = [t for t in tickers if t in eps_data]
+    if not names:
+        return results
+
+    rows, row_ttm, _ = get_eps_series(filename).rows_for(names)
+    axis, close, present, errors = _price_panel(names, years)
+    loaded = present.any(axis=0)
+
+    ttm_eps = _align_ttm_eps_panel(axis, rows, row_ttm)
+    pe = _pe_avg_scores(axis, close, present, ttm_eps, years)
+    latest_eps, current_pe, counts, data_points = pe["latest_eps"], pe["current_pe"], pe["counts"], pe["data_points"]
+    min_pe, max_pe, avg_pe = pe["min_pe"], pe["max_pe"], pe["avg_pe"]
+    score_avg, score_range, score = pe["score_avg"], pe["score_range"], pe["score"]
+
+    gaps = _data_gaps_batch(names, years, filename, "DATA/Balance_manual.txt")
+    for i, ticker in enumerate(names):
+        if ticker in errors:
+            results[ticker] = errors[ticker]
+        elif not loaded[i]:
+            results[ticker] = ValueError(f"No price data found for {ticker}")
+        elif np.isnan(latest_eps[i]):
+            results[ticker] = ValueError(f"Not enough valid P/E data for {ticker}")
+        elif counts[i] == 0 or latest_eps[i] <= 0:
+            # Non-profitable companies get a Baseline Score of 0 (Highest Risk)
+            results[ticker] = (0.0, {
+                "current_pe": current_pe[i],
+                "avg_pe": 999.0,
+                "min_pe": 999.0,
+                "max_pe": 999.0,
+                "score_avg": 0.0,
+                "score_range": 0.0,
+                "data_points": int(data_points[i]),
+                "data_gaps": gaps[ticker],
+                "error": "Negative Earnings (Not Profitable)"
+            })
+        else:
+            results[ticker] = (score[i], {
+                "current_pe": current_pe[i],
+                "avg_pe": avg_pe[i],
+                "min_pe": min_pe[i],
+                "max_pe": max_pe[i],
+                "score_avg": score_avg[i],
+                "score_range": score_range[i],
+                "data_points": int(data_points[i]),
+                "data_gaps": gaps[ticker]
+            })
+    return {t: results[t] for t in tickers}
+
+
+def _debt_to_equity_scores(debt, equity):
+    """(ratio, score) arrays for arrays of debt and equity, as score_debt_to_equity computes them."""
+    ratio = np.full(len(debt), 999.0)  # High cap instead of infinity for JSON safety
+    np.divide(debt, equity, out=ratio, where=equity > 0)
+    ratio = np.minimum(999.0, ratio)
+
+    # Same piecewise scale as score_debt_to_equity
+    score = np.select(
+        [ratio <= 0.5, ratio <= 1.5, ratio <= 3.0],
+        [0.8 + (0.2 * (0.5 - ratio) / 0.5),
+         0.5 + (0.3 * (1.5 - ratio) / 1.0),
+         0.2 + (0.3 * (3.0 - ratio) / 1.5)],
+        np.maximum(0, 0.2 * (5.0 - ratio) / 2.0),
+    )
+    return ratio, score
+
+
+def score_debt_to_equity_batch(tickers, years=2, filename="DATA/Balance_manual.txt"):
+    """
+    score_debt_to_equity for many tickers at once.
+    Returns {ticker: (score, details)}, or {ticker: exception} where score_debt_to_equity would raise.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    rows = get_balance_data(filename).rows_for(tickers)
+    found = np.diff(rows.offsets) > 0
+    results = {t: ValueError(f"{t} not found in {filename}") for t, ok in zip(tickers, found) if not ok}
+    if not found.any():
+        return results
+
+    # Latest balance sheet of every ticker
+    last = np.maximum(rows.offsets[1:] - 1, 0)
+    debt = rows.values[last, 0]
+    equity = rows.values[last, 1]
+    dates = pd.DatetimeIndex(rows.dates[last]).strftime("%Y-%m-%d")
+
+    ratio, score = _debt_to_equity_scores(debt, equity)
+
+    names = [t for t, ok in zip(tickers, found) if ok]
+    gaps = _data_gaps_batch(names, years, "DATA/EPS_manual.txt", filename)
+    for i, ticker in enumerate(tickers):
+        if not found[i]:
+            continue
+        results[ticker] = (float(score[i]), {
+            "current_ratio": float(ratio[i]),
+            "total_debt": float(debt[i]),
+            "total_equity": float(equity[i]),
+            "date": dates[i],
+            "score": float(score[i]),
+            "data_gaps": gaps[ticker]
+        })
+    return {t: results[t] for t in tickers}
+
+
+def _growth_rates_batch(rows, years):
+    """
+    calculate_growth_rate for every ticker of a ragged EPS table.
+    Returns (growth_rates, r_squared, data_points) lists, with None growth where it is undefined.
+    """
+    n = len(rows.tickers)
+    group = group_ids(rows.offsets)
+    eps = np.asarray(rows.values, dtype=np.float64)
+    sizes = np.diff(rows.offsets)
+    cutoff = _cutoffs(rows.dates[np.maximum(rows.offsets[1:] - 1, 0)] if len(group) else
+                      np.zeros(n, dtype="datetime64[ns]"), years)
+
+    in_window = rows.dates >= cutoff[group]
+    positive = in_window & (eps > 0)
+    n_window = np.bincount(group[in_window], minlength=n)
+    n_positive = np.bincount(group[positive], minlength=n)
+
+    growth_rates, r_squared, data_points = [None] * n, [0] * n, list(n_positive)
+    # Need at least 4 quarters, at most 25% non-positive, and 3 positive points to fit
+    too_few = n_window < 4
+    too_negative = n_positive < n_window * 0.75
+    for i in np.flatnonzero(too_few | too_negative | (sizes == 0)):
+        data_points[i] = int(n_window[i])
+
+    fit = np.flatnonzero(~too_few & ~too_negative & (n_positive >= 3))
+    pos_rows = np.flatnonzero(positive)
+    pos_starts = np.searchsorted(group[pos_rows], fit, side="left")
+    for i, start in zip(fit, pos_starts):
+        sel = pos_rows[start:start + n_positive[i]]
+        dates = rows.dates[sel]
+        x = _whole_days(dates - dates[0]) / 365.25
+        y = np.log(eps[sel])
+        # The least-squares fit has no batch form in NumPy, so it runs per ticker
+        try:
+            slope, intercept = np.polyfit(x, y, 1)
+            y_pred = slope * x + intercept
+            ss_res = np.sum((y - y_pred) ** 2)
+            ss_tot = np.sum((y - np.mean(y)) ** 2)
+            growth_rates[i] = slope
+            r_squared[i] = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0
+        except Exception:
+            pass
+    return growth_rates, r_squared, [int(p) for p in data_points]
+
+
+def _peg_scores(peg):
+    """score_peg's scale for an array of PEG ratios: 1 up to 0.75, 0 from 3.0, linear between."""
+    return np.select([peg <= 0.75, peg >= 3.0], [1.0, 0.0], 1.0 - (peg - 0.75) / 2.25)
+
+
+def score_peg_batch(tickers, years=3, filename="DATA/EPS_manual.txt"):
+    """
+    score_peg for many tickers at once: {ticker: (score, details)}.
+    Like score_peg, failures are reported as a 0.0 score with an "error" detail.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    eps_data = get_eps_data(filename)
+    n = len(tickers)
+
+    # Only the latest close is needed
+    axis, close, present, errors = _price_panel(tickers, 1)
+    loaded = present.any(axis=0)
+    price = close[_last_rows(present), np.arange(n)] if len(axis) else np.full(n, np.nan)
+    has_eps = np.array([t in eps_data for t in tickers], dtype=bool)
+    ok = np.array([t not in errors for t in tickers], dtype=bool) & loaded & has_eps
+
+    # TTM EPS as of each ticker's latest report
+    rows, row_ttm, _ = get_eps_series(filename).rows_for(tickers)
+    sizes = np.diff(rows.offsets)
+    ttm_eps = np.full(n, np.nan)
+    ttm_eps[sizes > 0] = row_ttm[rows.offsets[1:][sizes > 0] - 1]
+    growth_rates, r_squared, data_points = _growth_rates_batch(rows, years)
+    growth = np.array([np.nan if g is None else g for g in growth_rates], dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pe_ratio = price / ttm_eps
+        peg = pe_ratio / (growth * 100)
+    # No TTM EPS yet, losses or negative/invalid growth score 0
+    scorable = (ttm_eps > 0) & (growth > 0)
+    score = np.where(scorable, _peg_scores(peg), 0.0)
+
+    gaps = _data_gaps_batch([tickers[i] for i in np.flatnonzero(ok)], years, filename, "DATA/Balance_manual.txt")
+    results = {}
+    for i, ticker in enumerate(tickers):
+        if ticker in errors:
+            results[ticker] = (0.0, {"error": str(errors[ticker]), "score": 0.0})
+        elif not loaded[i]:
+            results[ticker] = (0.0, {"error": "No price data", "score": 0.0})
+        elif not has_eps[i]:
+            results[ticker] = (0.0, {"error": "No EPS data", "score": 0.0})
+        elif not ttm_eps[i] > 0:
+            results[ticker] = (0.0, {
+                "peg": 999.0, "pe": 999.0, "growth_rate": 0.0,
+                "data_points": int(sizes[i]),
+                "data_gaps": gaps[ticker],
+                "error": "Fewer than 4 quarters of EPS" if np.isnan(ttm_eps[i]) else "Negative TTM EPS"
+            })
+        elif not scorable[i]:
+            # Negative or invalid growth -> High Risk -> Score 0
+            results[ticker] = (0.0, {
+                "peg": 999.0,
+                "pe": pe_ratio[i],
+                "growth_rate": growth_rates[i] if growth_rates[i] else 0.0,
+                "r_squared": r_squared[i],
+                "data_points": data_points[i],
+                "data_gaps": gaps[ticker],
+                "error": "Negative/Invalid Growth"
+            })
+        else:
+            results[ticker] = (score[i], {
+                "peg": peg[i],
+                "pe": pe_ratio[i],
+                "growth_rate": growth[i] * 100,
+                "r_squared": r_squared[i],
+                "data_points": data_points[i],
+                "score": score[i],
+                "data_gaps": gaps[ticker]
+            })
+    return results